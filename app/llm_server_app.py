@@ -7,11 +7,30 @@ from tools.db_tools import DBConnectTool
 # from tools.sensitive_tools import SensitiveAutomatonLoader
 # from config.settings import SENSITIVE_DICT_PATH, SENSITIVE_DICT
 from tools.data_tool import DataProvider, DataInitPromise
+from tools.data_tool.snapshot_tool import load_or_build, reload_data
+from tools.data_tool.reload_tool import DataReloader, ReloadSignal
 from tools.data_tool.data_loader_factory import DataLoaderFactory
+from tools.warmup_tools import Readiness, Warmup
+from tools.rule_engine_tools import InputRuleEngineTool, BatchRuleEngineTool, OutputRuleEngineTool
+from config import Config
 from config.data_source_config import get_data_source_config
 from utils.error_handler import setup_exception_handlers
+from utils.logging_config import restart_async_logging
+from utils import run_in_async
+from utils.metrics import (
+    metrics,
+    dump_snapshot,
+    load_worker_snapshots,
+    clear_worker_snapshots,
+    merge_snapshots,
+    render_prometheus,
+    summarize,
+)
 from .middleware import setup_audit_middleware
+import asyncio
+import gc
 import logging
+import os
 
 
 
@@ -29,7 +48,8 @@ def create_app() -> Sanic:
     audit_logger.setLevel(logging.INFO)
 
     setup_audit_middleware(app)
-    # setup_exception_handlers(app)
+    # 流程中抛出的异常（规则缺失、数据加载失败等）统一返回结构化错误响应
+    setup_exception_handlers(app)
 
     # # Load Config
     # app.config.update(
@@ -64,19 +84,121 @@ def create_app() -> Sanic:
     create_routers(app)
 
     # Use lifecycle event to load data after DB is connected
+    @app.main_process_start
+    async def preload_data(app, loop):
+        """预加载模式：主进程加载一次数据并冻结 GC，worker fork 后写时复制共享"""
+        if not Config.PRELOAD_DATA:
+            return
+        db_tool = app.ctx.db_tool
+        if db_tool:
+            # 主进程临时连接，fork 前释放，worker 在 after_server_start 中自建连接池
+            db_tool.connector.create_engine()
+        try:
+            await load_or_build(
+                data_provider,
+                data_source_config.snapshot_path,
+                data_source_config.snapshot_auto_write,
+            )
+            data_provider.preloaded = True
+        finally:
+            if db_tool:
+                await db_tool.connector.conn.dispose()
+                db_tool._session_factory = None
+        # 冻结后这些对象不再被 GC 扫描，避免引用计数之外的写入触发页复制
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Data preloaded in main process, frozen {gc.get_freeze_count()} objects")
+
+    # 本 worker 的就绪状态，/ready 据此返回 200 / 503
+    readiness = Readiness()
+    app.ctx.readiness = readiness
+
+    async def load_worker_data():
+        if data_provider.preloaded:
+            restart_async_logging()
+            # 继承的数据若已过期（如 worker 被重启时数据已变更），在本 worker 内重建并整体替换
+            data_version = await data_provider.data_loader.get_data_version()
+            if data_version != data_provider.data_version:
+                logger.info("Preloaded data stale, reloading in worker...")
+                await reload_data(data_provider, data_source_config.snapshot_path)
+            return
+        logger.info(f"Loading data from {data_source_config.mode}...")
+        # await app.ctx.db_tool.load_data_from_db()
+        # 优先加载预编译快照，快照缺失或过期时全量构建
+        await load_or_build(
+            data_provider,
+            data_source_config.snapshot_path,
+            data_source_config.snapshot_auto_write,
+        )
+        logger.info("Data loaded successfully.")
+
+    async def warm_up():
+        """预构建活跃租户并执行合成请求，首批真实流量不再承担懒加载与首次调度开销"""
+        if not Config.WARMUP_ENABLED:
+            return
+        readiness.enter(Readiness.WARMING)
+        readiness.warmup = Warmup(data_provider)
+        try:
+            await asyncio.wait_for(readiness.warmup.run(), Config.WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"warmup timeout after {Config.WARMUP_TIMEOUT}s: {readiness.warmup.stats()}"
+            )
+
     @app.after_server_start
     async def load_data(app, loop):
+        readiness.enter(Readiness.LOADING)
         try:
-            logger.info(f"Loading data from {data_source_config.mode}...")
-            # await app.ctx.db_tool.load_data_from_db()
-            data_promise = DataInitPromise()
-            data_promise.flow()
-            await data_promise.run(data_provider)
-
-            logger.info("Data loaded successfully.")
+            await load_worker_data()
         except Exception as e:
             logger.error(f"Failed to load data: {e}")
+            readiness.fail(e)
             raise
+        # 各工具的阶段图在此编译一次，请求处理时直接复用
+        InputRuleEngineTool()
+        BatchRuleEngineTool()
+        OutputRuleEngineTool()
+        await warm_up()
+        readiness.enter(Readiness.READY)
+
+    @app.after_server_start
+    async def start_data_reloader(app, loop):
+        """词典或规则变化时热更新，无需滚动重启；配置了轮询间隔时后台轮询数据版本"""
+        signal = ReloadSignal(Config.RELOAD_SIGNAL_FILE) if Config.RELOAD_SIGNAL_INTERVAL > 0 else None
+        app.ctx.data_reloader = DataReloader(
+            data_provider, data_source_config.reload_interval, signal
+        )
+        if data_source_config.reload_interval > 0:
+            app.add_task(app.ctx.data_reloader.run(), name="data_reloader")
+        if signal is not None:
+            # 手动触发经共享信号文件同步到所有 worker
+            app.add_task(
+                app.ctx.data_reloader.watch(Config.RELOAD_SIGNAL_INTERVAL), name="data_reload_watcher"
+            )
+
+    @app.main_process_start
+    async def clear_metrics(app, loop):
+        # 上次运行残留的 worker 快照不计入本次统计
+        await run_in_async(clear_worker_snapshots, Config.METRICS_DIR)
+
+    async def flush_metrics():
+        """定期将本 worker 的指标快照写入共享目录，供其他 worker 的 /metrics 合并"""
+        while True:
+            await asyncio.sleep(Config.METRICS_FLUSH_INTERVAL)
+            try:
+                await run_in_async(dump_snapshot, metrics.snapshot(), Config.METRICS_DIR)
+            except OSError as e:
+                logger.warning(f"dump metrics snapshot failed: {e}")
+
+    @app.after_server_start
+    async def start_metrics_flusher(app, loop):
+        if Config.METRICS_FLUSH_INTERVAL > 0:
+            app.add_task(flush_metrics(), name="metrics_flusher")
+
+    @app.on_request
+    async def pin_data_snapshot(request):
+        # 固定本请求读取的数据快照，处理期间热更新发布的新快照不影响本请求
+        data_provider.pin()
 
     logger.info("begin to load global sensitive words")
     # try:
@@ -91,12 +213,39 @@ def create_app() -> Sanic:
     async def health_check(request):
         return response.json({"status": "ok"})
 
+    @app.route("/ready")
+    async def readiness_check(request):
+        """就绪探针：数据加载与预热完成前返回 503，并给出加载进度与数据版本"""
+        return response.json(
+            readiness.stats(data_provider), 200 if readiness.ready else 503
+        )
+
+    @app.route("/metrics")
+    async def metrics_export(request):
+        """
+        各 worker 合并后的指标：本 worker 取实时数据，其他 worker 取最近一次快照（最多滞后 METRICS_FLUSH_INTERVAL 秒）。
+        默认输出 Prometheus 文本格式，?format=json 输出含 p50/p90/p99 估算的 JSON
+        """
+        others = await run_in_async(load_worker_snapshots, Config.METRICS_DIR, os.getpid())
+        merged = merge_snapshots([metrics.snapshot()] + others)
+        if request.args.get("format") == "json":
+            return response.json(summarize(merged))
+        return response.text(
+            render_prometheus(merged), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
     @app.main_process_start
     async def start(app, loop):
         logger.info(f"!!!!!!Server starting ")
 
     @app.before_server_stop
     async def cleanup(app, loop):
+        if data_source_config.reload_interval > 0:
+            await app.cancel_task("data_reloader", raise_exception=False)
+        if Config.RELOAD_SIGNAL_INTERVAL > 0:
+            await app.cancel_task("data_reload_watcher", raise_exception=False)
+        if Config.METRICS_FLUSH_INTERVAL > 0:
+            await app.cancel_task("metrics_flusher", raise_exception=False)
         logger.info("Stopping async logging...")
         stop_async_logging()
 
@@ -0,0 +1,56 @@
+"""
+快照编译工具
+按当前数据源配置（FILE / DB）全量构建自动机与规则，写出快照文件，
+服务启动时通过 DATA_SOURCE_SNAPSHOT_PATH 直接加载
+"""
+import asyncio
+import time
+from config.data_source_config import get_data_source_config
+from db import DBConnector
+from tools.db_tools import DBConnectTool
+from tools.data_tool import DataProvider
+from tools.data_tool.file_data_loader import FileDataLoader
+from tools.data_tool.snapshot_tool import compile_snapshot
+
+
+async def compile_all_data(output_path: str):
+    """构建并写出快照
+
+    Args:
+        output_path: 快照文件路径
+    """
+    config = get_data_source_config()
+    connector = None
+
+    if config.is_file_mode():
+        data_loader = FileDataLoader()
+        print(f"数据源: FILE ({config.file_base_path})")
+    else:
+        connector = DBConnector()
+        connector.create_engine()
+        data_loader = DBConnectTool(connector)
+        print("数据源: DB")
+
+    try:
+        start = time.perf_counter()
+        data_provider = DataProvider(data_loader)
+        data_version = await data_loader.get_data_version()
+        print(f"数据版本: {data_version}")
+        await compile_snapshot(data_provider, output_path, data_version)
+        print(f"  ✓ 通用词表: {'已构建' if data_provider.global_ac else '空'}")
+        print(f"  ✓ 自定义租户: {len(data_provider.custom_ac)}")
+        print(f"  ✓ 超黑超白租户: {len(data_provider.custom_vip)}")
+        print(f"\n✓ 快照已写出: {output_path} ({time.perf_counter() - start:.2f}s)")
+        print("\n下一步：")
+        print(f"1. 设置环境变量: export DATA_SOURCE_SNAPSHOT_PATH={output_path}")
+        print("2. 重启服务: bash start.sh")
+    finally:
+        if connector:
+            await connector.conn.dispose()
+
+
+if __name__ == "__main__":
+    import sys
+
+    output_path = sys.argv[1] if len(sys.argv) > 1 else "data/automaton.snapshot"
+    asyncio.run(compile_all_data(output_path))
@@ -15,6 +15,8 @@ class DataSourceConfig(BaseSettings):
         export DATA_SOURCE_MODE=FILE
         export DATA_SOURCE_FILE_BASE_PATH=/nas/llm_guard_data
         export DATA_SOURCE_FILE_USE_CACHE=true
+        export DATA_SOURCE_SNAPSHOT_PATH=/nas/llm_guard_data/automaton.snapshot
+        export DATA_SOURCE_RELOAD_INTERVAL=30
     """
 
     # 数据源模式：FILE 或 DB
@@ -29,12 +31,35 @@ class DataSourceConfig(BaseSettings):
         description="文件存储的基础路径"
     )
 
+    file_use_cache: bool = Field(
+        default=True,
+        description="是否缓存解析后的数据文件（按 scenario_id 建索引，mtime/size 变化时失效）"
+    )
+
     # 数据库模式配置（从现有配置读取）
     db_url: str = Field(
         default="",
         description="数据库连接URL"
     )
 
+    # 预编译快照配置
+    snapshot_path: str = Field(
+        default="",
+        description="自动机快照文件路径，为空则不使用快照"
+    )
+
+    snapshot_auto_write: bool = Field(
+        default=True,
+        description="快照缺失或过期时，全量构建后是否回写快照"
+    )
+
+    # 热更新配置
+    reload_interval: int = Field(
+        default=0,
+        description="数据版本轮询间隔（秒），版本变化时后台重建变化的租户并替换快照；"
+                    "默认 0 不轮询，仍可通过 /api/config/data-reload 手动触发"
+    )
+
     # Pydantic v2 配置
     model_config = SettingsConfigDict(
         env_prefix="DATA_SOURCE_",  # 环境变量前缀
@@ -7,7 +7,79 @@ class Config:
     PORT = int(os.getenv("PORT", 8000))
     DEBUG = False
     AUTO_RELOAD = True
-    WORKER = 1
+    WORKER = int(os.getenv("WORKER", 1))
+    # 主进程预加载词典后 fork 出 worker，各 worker 写时复制共享只读词典（仅 Linux）
+    PRELOAD_DATA = os.getenv("PRELOAD_DATA", "false").lower() == "true"
+
+    # 扫描/归一化内联执行阈值：不超过该字符数且预估耗时低于预算时不投递线程池
+    SCAN_INLINE_MAX_CHARS = int(os.getenv("SCAN_INLINE_MAX_CHARS", 2000))
+    SCAN_INLINE_BUDGET_US = int(os.getenv("SCAN_INLINE_BUDGET_US", 200))
+
+    # 批量接口：每次投递扫描的条数、guard 阶段并发上限
+    BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", 64))
+    BATCH_GUARD_CONCURRENCY = int(os.getenv("BATCH_GUARD_CONCURRENCY", 32))
+
+    # 启动期租户自动机构建：进程数（0 为可用核数）、总行数低于阈值时退回线程池逐个构建
+    BUILD_WORKERS = int(os.getenv("BUILD_WORKERS", 0))
+    BUILD_PARALLEL_MIN_ROWS = int(os.getenv("BUILD_PARALLEL_MIN_ROWS", 3000000))
+    BUILD_START_METHOD = os.getenv("BUILD_START_METHOD", "spawn")
+    # 启动与热更新取数时数据库服务端游标每批行数
+    DB_STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", 10000))
+
+    # 租户容器内存预算（MB，0 为不限制）；最近 MIN_IDLE 秒内访问过的租户不淘汰
+    TENANT_CACHE_BUDGET_MB = int(os.getenv("TENANT_CACHE_BUDGET_MB", 0))
+    TENANT_CACHE_MIN_IDLE = int(os.getenv("TENANT_CACHE_MIN_IDLE", 60))
+    # 按需加载（秒）：租户无数据后 NEGATIVE_TTL 内按无数据处理；加载失败后 ERROR_TTL 内直接报错，均不再访问数据源
+    TENANT_NEGATIVE_TTL = int(os.getenv("TENANT_NEGATIVE_TTL", 30))
+    TENANT_ERROR_TTL = int(os.getenv("TENANT_ERROR_TTL", 5))
+
+    # 冷启动预热：预构建配置的租户（逗号分隔）与审计日志末尾 TAIL_MB 中最活跃的 AUDIT_TENANTS 个租户，
+    # 并以合成请求执行完整审核流程；超时后不再等待，直接就绪
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_APP_IDS = os.getenv("WARMUP_APP_IDS", "")
+    WARMUP_AUDIT_TENANTS = int(os.getenv("WARMUP_AUDIT_TENANTS", 50))
+    WARMUP_AUDIT_TAIL_MB = int(os.getenv("WARMUP_AUDIT_TAIL_MB", 16))
+    WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", 4))
+    WARMUP_TIMEOUT = int(os.getenv("WARMUP_TIMEOUT", 60))
+
+    # 整体决策结果缓存：条目上限与 TTL（秒），任一为 0 时关闭
+    DECISION_CACHE_MAX_ENTRIES = int(os.getenv("DECISION_CACHE_MAX_ENTRIES", 10000))
+    DECISION_CACHE_TTL = int(os.getenv("DECISION_CACHE_TTL", 300))
+
+    # 改写执行器：同时改写数上限、等待队列长度、排队超时与改写超时（秒），
+    # 队列满或超时时按 FALLBACK 降级，均视为不安全：reject 不返回改写文本，mask 附带敏感词掩码文本
+    REWRITE_CONCURRENCY = int(os.getenv("REWRITE_CONCURRENCY", 32))
+    REWRITE_QUEUE_SIZE = int(os.getenv("REWRITE_QUEUE_SIZE", 128))
+    REWRITE_QUEUE_TIMEOUT = float(os.getenv("REWRITE_QUEUE_TIMEOUT", 2))
+    REWRITE_TIMEOUT = float(os.getenv("REWRITE_TIMEOUT", 20))
+    REWRITE_FALLBACK = os.getenv("REWRITE_FALLBACK", "reject")
+    # 改写合并：单批最多条数（1 为关闭合并）、合并窗口（ms）、参与合并的文本长度上限
+    REWRITE_BATCH_SIZE = int(os.getenv("REWRITE_BATCH_SIZE", 8))
+    REWRITE_BATCH_WAIT_MS = float(os.getenv("REWRITE_BATCH_WAIT_MS", 20))
+    REWRITE_BATCH_MAX_CHARS = int(os.getenv("REWRITE_BATCH_MAX_CHARS", 500))
+
+    # 改写结果近重复缓存：SimHash 汉明距离不超过 MAX_DISTANCE 的同租户、同命中词输入复用改写结果；
+    # 差异片段出现在缓存改写结果中的候选不复用；按条目数与估算内存（MB）淘汰，短于 MIN_CHARS 的输入不参与
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 5000))
+    SEMANTIC_CACHE_MAX_MB = int(os.getenv("SEMANTIC_CACHE_MAX_MB", 64))
+    SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+    SEMANTIC_CACHE_MAX_DISTANCE = int(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", 3))
+    SEMANTIC_CACHE_MIN_CHARS = int(os.getenv("SEMANTIC_CACHE_MIN_CHARS", 20))
+
+    # 指标：各 worker 每 FLUSH_INTERVAL 秒将快照写入 METRICS_DIR，/metrics 合并输出；
+    # 租户标签超过 MAX_TENANTS 个后其余租户合并统计。PERF_LOG_ENABLED 打开逐次耗时日志（默认关闭）
+    METRICS_DIR = os.getenv("METRICS_DIR", "logs/metrics")
+    METRICS_FLUSH_INTERVAL = int(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+    METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", 200))
+    PERF_LOG_ENABLED = os.getenv("PERF_LOG_ENABLED", "false").lower() == "true"
+
+    # 多 worker 热更新：手动触发时写入共享信号文件，各 worker 每 RELOAD_SIGNAL_INTERVAL 秒检查一次（0 关闭，仅作用于接收请求的 worker）
+    RELOAD_SIGNAL_FILE = os.getenv("RELOAD_SIGNAL_FILE", "logs/reload_signal.json")
+    RELOAD_SIGNAL_INTERVAL = float(os.getenv("RELOAD_SIGNAL_INTERVAL", 1))
+
+    # 流式输出审核：逐块判定不调用 guard 模型，规则按该安全标签取值；
+    # 默认取最严格的 UNSAFE，命中拦截级规则即截断（流式输出无法改写，SAFE 下规则多为 REWRITE，达不到截断）
+    STREAM_GUARD_SAFETY = os.getenv("STREAM_GUARD_SAFETY", "UNSAFE")
 
     # LLM 网关认证配置
     JWT_SALT = os.getenv("JWT_SALT", "")
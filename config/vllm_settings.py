@@ -1,10 +1,15 @@
+import os
+
 from models import VllmType
 
 MODEL_CONFIGS = {
     VllmType.SAFE_MODEL: {
-        "base_url": "https://api.deepseek.com",
-        "api_key": "",
-        "model_name": "deepseek-chat",
+        # 可通过环境变量指向本地 OpenAI 兼容服务（如 mock_api.mock_openai_server）
+        "base_url": os.getenv("SAFE_MODEL_BASE_URL", "https://api.deepseek.com"),
+        "api_key": os.getenv("SAFE_MODEL_API_KEY", ""),
+        "model_name": os.getenv("SAFE_MODEL_NAME", "deepseek-chat"),
         "temperature": 0.0,
+        # 服务端支持 response_format=json_object 时开启
+        "json_mode": os.getenv("SAFE_MODEL_JSON_MODE", "false").lower() == "true",
     }
 }
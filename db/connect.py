@@ -23,18 +23,22 @@ class DBConnector:
         except Exception as e:
             logger.error(f"mysql connect failed {str(e)} ")
 
+    def create_engine(self) -> AsyncEngine:
+        self.conn = create_async_engine(
+            self.db_url,
+            echo=False,
+            pool_size=10,
+            max_overflow=20,
+            pool_recycle=3600,
+        )
+        return self.conn
+
     def init_db(self, app: Sanic, **kwargs):
         self.app = app
 
         @app.after_server_start
         async def aio_mysql_start(_app: Sanic, _loop):
-            self.conn = create_async_engine(
-                self.db_url,
-                echo=False,
-                pool_size=10,
-                max_overflow=20,
-                pool_recycle=3600,
-            )
+            self.create_engine()
             await self.ping()
 
         @app.after_server_stop
@@ -1,4 +1,4 @@
-from typing import Any, List, Sequence
+from typing import Any, AsyncIterator, List, Sequence
 from sqlalchemy.engine import Row
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,7 +10,7 @@ from models import (
     MetaTags,
 )
 import asyncio
-from sqlalchemy import func
+from sqlalchemy import bindparam, func, text
 
 
 class RuleDataLoaderDAO:
@@ -21,40 +21,36 @@ class RuleDataLoaderDAO:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_all_global_keywords(self) -> Sequence[Row]:
-        """全量加载：通用敏感词"""
-        stmt = select(
+    async def _stream_rows(self, stmt, batch_size: int) -> AsyncIterator[List[tuple]]:
+        """
+        服务端游标流式读取：每批 batch_size 行，转为普通元组后产出，
+        驱动与 SQLAlchemy 都不缓存整张表
+        """
+        result = await self.session.stream(
+            stmt.execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions(batch_size):
+            yield [tuple(row) for row in partition]
+
+    @staticmethod
+    def _global_keywords_stmt():
+        return select(
             GlobalKeywords.keyword,
             GlobalKeywords.tag_code
             ).where(GlobalKeywords.is_active == True)
-        result = await self.session.execute(stmt)
-        return result.all()
 
-    async def get_all_scenario_keywords(self) -> Sequence[Row]:
-        """全量加载：场景自定义敏感词"""
-        stmt = select(
+    @staticmethod
+    def _scenario_keywords_stmt():
+        return select(
             ScenarioKeywords.scenario_id,
             ScenarioKeywords.keyword,
             ScenarioKeywords.tag_code,
             ScenarioKeywords.category,
             ScenarioKeywords.risk_level,
         ).where(ScenarioKeywords.is_active == True)
-        result = await self.session.execute(stmt)
-        return result.all()
-        # return list(result.scalars().all())
-        # return list(result.scalars().all())
-
-    async def get_scenario_keywords_by_appid(
-        self, app_id: str
-    ) -> List[ScenarioKeywords]:
-        """全量加载：场景自定义敏感词"""
-        stmt = select(ScenarioKeywords).where(
-            ScenarioKeywords.is_active == True, ScenarioKeywords.scenario_id == app_id
-        )
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
 
-    async def get_all_scenario_rules(self) -> Sequence[Row]:
+    @staticmethod
+    def _scenario_rules_stmt():
         # 定义拼接列
         rule = func.concat(
             RuleScenarioPolicy.match_value,
@@ -63,7 +59,7 @@ class RuleDataLoaderDAO:
         ).label(
             "rule_key"
         )  # 起个别名，方便后面引用
-        stmt = select(
+        return select(
             RuleScenarioPolicy.scenario_id,
             # RuleScenarioPolicy.match_value,
             # RuleScenarioPolicy.extra_condition,
@@ -74,11 +70,10 @@ class RuleDataLoaderDAO:
             RuleScenarioPolicy.rule_mode == 1,
             RuleScenarioPolicy.match_type == "TAG",
         )
-        result = await self.session.execute(stmt)
-        return result.all()
-    
-    async def load_all_vip(self):
-        stmt = select(
+
+    @staticmethod
+    def _all_vip_stmt():
+        return select(
             RuleScenarioPolicy.scenario_id,
             RuleScenarioPolicy.match_value,
             RuleScenarioPolicy.extra_condition,
@@ -88,9 +83,53 @@ class RuleDataLoaderDAO:
             RuleScenarioPolicy.is_active == True,
             RuleScenarioPolicy.rule_mode == 0,
         )
+
+    async def get_all_global_keywords(self) -> Sequence[Row]:
+        """全量加载：通用敏感词"""
+        result = await self.session.execute(self._global_keywords_stmt())
+        return result.all()
+
+    def stream_global_keywords(self, batch_size: int) -> AsyncIterator[List[tuple]]:
+        """流式加载：通用敏感词 (keyword, tag_code)"""
+        return self._stream_rows(self._global_keywords_stmt(), batch_size)
+
+    async def get_all_scenario_keywords(self) -> Sequence[Row]:
+        """全量加载：场景自定义敏感词"""
+        result = await self.session.execute(self._scenario_keywords_stmt())
+        return result.all()
+        # return list(result.scalars().all())
+        # return list(result.scalars().all())
+
+    def stream_scenario_keywords(self, batch_size: int) -> AsyncIterator[List[tuple]]:
+        """流式加载：场景自定义敏感词 (scenario_id, keyword, tag_code, category, risk_level)"""
+        return self._stream_rows(self._scenario_keywords_stmt(), batch_size)
+
+    async def get_scenario_keywords_by_appid(
+        self, app_id: str
+    ) -> List[ScenarioKeywords]:
+        """全量加载：场景自定义敏感词"""
+        stmt = select(ScenarioKeywords).where(
+            ScenarioKeywords.is_active == True, ScenarioKeywords.scenario_id == app_id
+        )
         result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def get_all_scenario_rules(self) -> Sequence[Row]:
+        result = await self.session.execute(self._scenario_rules_stmt())
         return result.all()
 
+    def stream_scenario_rules(self, batch_size: int) -> AsyncIterator[List[tuple]]:
+        """流式加载：场景自定义规则 (scenario_id, rule_key, strategy)"""
+        return self._stream_rows(self._scenario_rules_stmt(), batch_size)
+
+    async def load_all_vip(self):
+        result = await self.session.execute(self._all_vip_stmt())
+        return result.all()
+
+    def stream_all_vip(self, batch_size: int) -> AsyncIterator[List[tuple]]:
+        """流式加载：超黑超白 (scenario_id, match_value, extra_condition, strategy, match_type)"""
+        return self._stream_rows(self._all_vip_stmt(), batch_size)
+
     async def get_scenario_rule_by_appid(self, app_id: str):
         stmt = select(RuleScenarioPolicy).where(
             RuleScenarioPolicy.is_active == True,
@@ -127,6 +166,28 @@ class RuleDataLoaderDAO:
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
 
+    async def get_table_versions(self) -> List[tuple]:
+        """数据版本：各规则表的有效行数与 information_schema 中的最后更新时间"""
+        tables = [GlobalKeywords, ScenarioKeywords, RuleScenarioPolicy, RuleGlobalDefaults]
+        stmt = text(
+            "SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :names"
+        ).bindparams(bindparam("names", expanding=True))
+        result = await self.session.execute(
+            stmt, {"names": [t.__tablename__ for t in tables]}
+        )
+        update_times = {row[0]: row[1] for row in result.all()}
+
+        versions = []
+        for table in tables:
+            count = await self.session.scalar(
+                select(func.count()).select_from(table).where(table.is_active == True)
+            )
+            versions.append(
+                (table.__tablename__, count, str(update_times.get(table.__tablename__)))
+            )
+        return versions
+
     async def fetch_full_data_package(self) -> dict:
         """
         组合查询：一次性获取所有需要的数据
@@ -0,0 +1,128 @@
+"""
+本地 OpenAI 兼容改写服务（压测与联调用）
+提供 POST /v1/chat/completions，按请求内容返回单条或多条改写结果：
+- 多条合并请求（用户消息最后一行为 JSON 数组）按 id 逐条返回 {"results": [...]}；
+- 单条请求返回一条 SafetyRewriteResult；
+- 改写结果为将命中敏感词替换为 * 后的文本，延迟由 MOCK_LLM_LATENCY_MS 控制；
+- GET /stats 返回请求数与条目数，DELETE /stats 清零，用于观察合并与去重效果。
+启动：SAFE_MODEL_BASE_URL=http://127.0.0.1:9001/v1 配合 python -m mock_api.mock_openai_server
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+
+from sanic import Sanic, Request
+from sanic.response import json as sanic_json
+
+USER_INPUT_PATTERN = re.compile(r"【用户原始内容】: (.*)", re.S)
+KEYWORDS_PATTERN = re.compile(r"【系统检测到的敏感词】: (.*?)\n")
+
+
+def _mask(text: str, keywords: str) -> str:
+    words = [] if keywords in ("", "无") else [w.strip() for w in keywords.split(",")]
+    for word in sorted(set(words), key=len, reverse=True):
+        if word:
+            text = text.replace(word, "*" * len(word))
+    return text
+
+
+def _rewrite(text: str, keywords: str) -> dict:
+    return {
+        "user_intent": "mock",
+        "rewritten_text": _mask(text, keywords),
+        "is_safe_now": True,
+        "hit_rule": None,
+    }
+
+
+def _parse_batch(content: str) -> list | None:
+    """多条请求的条目数组位于用户消息最后一行"""
+    last_line = content.rstrip().rsplit("\n", 1)[-1]
+    if not last_line.startswith("["):
+        return None
+    try:
+        items = json.loads(last_line)
+    except ValueError:
+        return None
+    if not isinstance(items, list) or not all(isinstance(i, dict) and "id" in i for i in items):
+        return None
+    return items
+
+
+def _answer(content: str) -> tuple[dict, int]:
+    """返回 (模型输出 JSON, 条目数)"""
+    items = _parse_batch(content)
+    if items is not None:
+        results = [
+            {"id": i["id"], **_rewrite(i.get("user_input", ""), i.get("triggered_keywords", ""))}
+            for i in items
+        ]
+        return {"results": results}, len(items)
+    text_match = USER_INPUT_PATTERN.search(content)
+    keywords_match = KEYWORDS_PATTERN.search(content)
+    text = text_match.group(1) if text_match else content
+    keywords = keywords_match.group(1) if keywords_match else ""
+    return _rewrite(text, keywords), 1
+
+
+def create_mock_llm_app(latency_ms: float | None = None) -> Sanic:
+    app = Sanic("mock_openai_server")
+    app.ctx.latency = (
+        float(os.getenv("MOCK_LLM_LATENCY_MS", 200)) if latency_ms is None else latency_ms
+    ) / 1000
+    app.ctx.stats = {"requests": 0, "batch_requests": 0, "items": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = request.json or {}
+        messages = body.get("messages") or []
+        content = next(
+            (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        answer, count = _answer(content)
+        stats = app.ctx.stats
+        stats["requests"] += 1
+        stats["items"] += count
+        if "results" in answer:
+            stats["batch_requests"] += 1
+        await asyncio.sleep(app.ctx.latency)
+        return sanic_json(
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": json.dumps(answer, ensure_ascii=False),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        )
+
+    @app.get("/stats")
+    async def get_stats(request: Request):
+        return sanic_json(app.ctx.stats)
+
+    @app.delete("/stats")
+    async def reset_stats(request: Request):
+        for key in app.ctx.stats:
+            app.ctx.stats[key] = 0
+        return sanic_json(app.ctx.stats)
+
+    return app
+
+
+if __name__ == "__main__":
+    create_mock_llm_app().run(
+        host="127.0.0.1", port=int(os.getenv("MOCK_LLM_PORT", 9001)), single_process=True
+    )
@@ -1,4 +1,4 @@
-from .request_models import SensitiveContext
+from .request_models import SensitiveContext, SensitiveBatchInput, ScanMode
 from .llm_models import VllmType, DecisionClassifyEnum, DECISION_MAPPING
-from .response_modes import SafetyRewriteResult
+from .response_modes import SafetyRewriteResult, SafetyRewriteBatchItem, SafetyRewriteBatchResult
 from .db_meta import *
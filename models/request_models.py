@@ -1,18 +1,31 @@
-from typing import Dict, Any, List
-from pydantic import BaseModel, Field, ConfigDict
+from enum import StrEnum
+from typing import Annotated, Dict, Any, List
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
 
 
-class SensitivePromiseInput(BaseModel):
+class ScanMode(StrEnum):
+    ALL = "all"  # 全部重叠命中（默认）
+    ANY = "any"  # 每个标签只取首个命中，所有标签都命中后提前结束
+    FIRST = "first"  # 首个命中即结束
+    LONGEST = "longest"  # 最左最长匹配，去掉重叠噪声
+    COUNT = "count"  # 去重计数并返回命中位置
+
+
+class SensitiveOptions(BaseModel):
     request_id: str = Field(..., min_length=1, description="请求ID")
     app_id: str = Field(..., min_length=3, max_length=20)
     apikey: str = Field(..., description="密钥")
-    input_prompt: str = Field(..., min_length=1, description="用户输入")
     is_output: bool = False
     use_customize_white: bool = False
     use_customize_words: bool = False
     use_customize_rule: bool = False
     use_vip_black: bool = False
     use_vip_white: bool = False
+    scan_mode: ScanMode = ScanMode.ALL
+
+
+class SensitivePromiseInput(SensitiveOptions):
+    input_prompt: str = Field(..., min_length=1, description="用户输入")
 
     # @field_validator('apikey')
     # @classmethod
@@ -29,7 +42,29 @@ class SensitiveData(BaseModel):
     vip_white_words_result: Dict[str, List] = Field(default_factory=dict)
     global_result: Dict[str, List] = Field(default_factory=dict)
     final_result: Dict[str, List] = Field(default_factory=dict)
+    # scan_mode=count 时的 {source: {tag_code: {word: {"count", "spans"}}}}
+    hit_counts: Dict[str, Any] = Field(default_factory=dict)
     original_input_prompt: str | None = None
+    # 归一化文本到原文的位置映射（见 normalize_with_offsets），None 表示逐字对应
+    _input_offsets: List[int] | None = PrivateAttr(default=None)
+    # input_prompt 已归一化（私有属性，不接受请求体传入）
+    _normalized: bool = PrivateAttr(default=False)
+
+    @property
+    def normalized(self) -> bool:
+        return self._normalized
+
+    @normalized.setter
+    def normalized(self, value: bool):
+        self._normalized = value
+
+    @property
+    def input_offsets(self) -> List[int] | None:
+        return self._input_offsets
+
+    @input_offsets.setter
+    def input_offsets(self, offsets: List[int] | None):
+        self._input_offsets = offsets
 
 
 class GuardData(BaseModel):
@@ -42,7 +77,32 @@ class DecisionData(BaseModel):
     decision_dict: Dict[str, Any] = Field(default_factory=dict)
     all_decision_dict: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
     rewrite_result: Dict[str, Any] = Field(default_factory=dict)
+    # 决策已定案（如命中超黑词），Promise 据此取消同层阶段并跳过后续各层
+    _finalized: bool = PrivateAttr(default=False)
+
+    @property
+    def finalized(self) -> bool:
+        return self._finalized
+
+    def finalize(self):
+        self._finalized = True
 
 
 class SensitiveContext(SensitivePromiseInput, SensitiveData, GuardData, DecisionData):
     model_config = ConfigDict(extra="ignore")
+
+
+class SensitiveBatchInput(SensitiveOptions):
+    """批量请求：同一 app_id 与开关下的多条输入"""
+
+    input_prompts: List[Annotated[str, Field(min_length=1)]] = Field(
+        ..., min_length=1, max_length=1000, description="用户输入列表"
+    )
+
+    def to_contexts(self) -> List[SensitiveContext]:
+        # 整体已校验，逐条构建时跳过重复校验
+        options = self.model_dump(exclude={"input_prompts"})
+        return [
+            SensitiveContext.model_construct(**options, input_prompt=prompt)
+            for prompt in self.input_prompts
+        ]
@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
@@ -11,3 +13,13 @@ class SafetyRewriteResult(BaseModel):
         description="触发的TC260规则编号，如 A.2.20，无触发则为 null"
     )
     rewrite_decision: int = 50
+
+
+class SafetyRewriteBatchItem(SafetyRewriteResult):
+    id: int = Field(description="对应输入条目的 id")
+
+
+class SafetyRewriteBatchResult(BaseModel):
+    results: List[SafetyRewriteBatchItem] = Field(
+        description="逐条改写结果，每条输入对应一条，以 id 对应"
+    )
@@ -3,6 +3,7 @@ from .sensitive_view import create_sensitive_router
 from .guard_view import create_guard_router
 from .rule_engine_view import create_rule_engine_router
 from .config_view import create_config_router
+from .output_view import create_output_router
 # from .db_service import create_db_router
 
 
@@ -11,5 +12,8 @@ def create_routers(app: Sanic):
     guard_router = create_guard_router(app)
     rule_engine_router = create_rule_engine_router(app)
     config_router = create_config_router(app)
+    output_router = create_output_router(app)
     # db_router = create_db_router(app)
-    app.blueprint([sensitive_router, guard_router, rule_engine_router, config_router])
+    app.blueprint(
+        [sensitive_router, guard_router, rule_engine_router, config_router, output_router]
+    )
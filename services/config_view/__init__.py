@@ -2,7 +2,7 @@
 配置视图路由
 """
 from sanic import Blueprint
-from .view import ConfigDataSourceHandler
+from .view import ConfigDataSourceHandler, ScanDispatchStatsHandler, DataReloadHandler, TenantCacheStatsHandler, DecisionCacheStatsHandler, SemanticCacheStatsHandler, RewriteExecutorStatsHandler
 
 
 def create_config_router(app):
@@ -16,4 +16,46 @@ def create_config_router(app):
         name="data_source_config"
     )
 
+    # 注册扫描调度统计接口
+    config_bp.add_route(
+        ScanDispatchStatsHandler.as_view(),
+        "/scan-dispatch",
+        name="scan_dispatch_stats"
+    )
+
+    # 注册词典热更新接口
+    config_bp.add_route(
+        DataReloadHandler.as_view(),
+        "/data-reload",
+        name="data_reload"
+    )
+
+    # 注册租户容器内存统计接口
+    config_bp.add_route(
+        TenantCacheStatsHandler.as_view(),
+        "/tenant-cache",
+        name="tenant_cache_stats"
+    )
+
+    # 注册决策结果缓存统计接口
+    config_bp.add_route(
+        DecisionCacheStatsHandler.as_view(),
+        "/decision-cache",
+        name="decision_cache_stats"
+    )
+
+    # 注册改写结果近重复缓存统计接口
+    config_bp.add_route(
+        SemanticCacheStatsHandler.as_view(),
+        "/semantic-cache",
+        name="semantic_cache_stats"
+    )
+
+    # 注册改写执行器统计接口
+    config_bp.add_route(
+        RewriteExecutorStatsHandler.as_view(),
+        "/rewrite-executor",
+        name="rewrite_executor_stats"
+    )
+
     return config_bp
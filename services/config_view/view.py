@@ -6,6 +6,11 @@ from sanic import Request
 from sanic.response import json as json_response
 from sanic.views import HTTPMethodView
 from config.data_source_config import get_data_source_config
+from tools.sensitive_tools import scan_dispatcher
+from tools.data_tool import DataProvider
+from tools.rule_engine_tools import decision_cache
+from tools.semantic_cache_tools import SemanticCacheTool
+from tools.intent_tools import RewriteExecutor
 import os
 
 
@@ -72,3 +77,96 @@ class ConfigDataSourceHandler(HTTPMethodView):
             }
 
         return files_status
+
+
+class ScanDispatchStatsHandler(HTTPMethodView):
+    """扫描调度统计接口
+
+    GET /api/config/scan-dispatch
+    """
+
+    async def get(self, request: Request):
+        """获取内联/线程池执行次数与实测单字符耗时"""
+        return json_response(scan_dispatcher.stats(), 200)
+
+
+class DataReloadHandler(HTTPMethodView):
+    """词典热更新状态与手动触发接口
+
+    GET  /api/config/data-reload   查看轮询间隔、当前数据版本与最近一次热更新
+    POST /api/config/data-reload   立即检查数据版本，变化时热更新；经共享信号文件通知其他 worker，
+                                   各 worker 在 RELOAD_SIGNAL_INTERVAL 秒内各自热更新（返回值仅为本 worker 的结果）；
+                                   ?force=true 时不比较版本直接热更新，用于不维护 UPDATE_TIME 的数据库
+    """
+
+    async def get(self, request: Request):
+        reloader = getattr(request.app.ctx, "data_reloader", None)
+        if reloader is None:
+            return json_response({"enabled": False}, 200)
+        return json_response({"enabled": True, **reloader.stats()}, 200)
+
+    async def post(self, request: Request):
+        reloader = getattr(request.app.ctx, "data_reloader", None)
+        if reloader is None:
+            return json_response({"enabled": False}, 200)
+        force = request.args.get("force", "false").lower() == "true"
+        reloaded = await reloader.trigger(force)
+        return json_response(
+            {"enabled": True, "reloaded": reloaded, **reloader.stats()}, 200
+        )
+
+
+class TenantCacheStatsHandler(HTTPMethodView):
+    """租户容器内存预算统计接口
+
+    GET /api/config/tenant-cache   查看预算、已占用估算、租户数与命中/淘汰次数，
+                                   以及按需加载的合并/负缓存统计（仅处理该请求的 worker）
+    """
+
+    async def get(self, request: Request):
+        data_provider = DataProvider()
+        return json_response(
+            {**data_provider.tenant_cache.stats(), "loader": data_provider.tenant_loader.stats()},
+            200,
+        )
+
+
+class DecisionCacheStatsHandler(HTTPMethodView):
+    """整体决策结果缓存统计接口
+
+    GET /api/config/decision-cache      查看条目数、命中/合并/淘汰次数（仅处理该请求的 worker）
+    DELETE /api/config/decision-cache   清空本 worker 的缓存
+    """
+
+    async def get(self, request: Request):
+        return json_response(decision_cache.stats(), 200)
+
+    async def delete(self, request: Request):
+        decision_cache.clear()
+        return json_response(decision_cache.stats(), 200)
+
+
+class SemanticCacheStatsHandler(HTTPMethodView):
+    """改写结果近重复缓存统计接口
+
+    GET /api/config/semantic-cache      查看条目数、估算内存与命中/淘汰次数（仅处理该请求的 worker）
+    DELETE /api/config/semantic-cache   清空本 worker 的缓存
+    """
+
+    async def get(self, request: Request):
+        return json_response(SemanticCacheTool().stats(), 200)
+
+    async def delete(self, request: Request):
+        semantic_cache = SemanticCacheTool()
+        semantic_cache.clear()
+        return json_response(semantic_cache.stats(), 200)
+
+
+class RewriteExecutorStatsHandler(HTTPMethodView):
+    """改写执行器统计接口
+
+    GET /api/config/rewrite-executor   查看并发上限、进行中与排队数、各原因降级次数（仅处理该请求的 worker）
+    """
+
+    async def get(self, request: Request):
+        return json_response(RewriteExecutor().stats(), 200)
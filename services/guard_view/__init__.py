@@ -1,12 +1,13 @@
 
 from sanic import Blueprint, Sanic
-from .view import GuardHandler
+from .view import GuardHandler, GuardBatchHandler
 
 sensitive_router = Blueprint("guard_routes", url_prefix="/api/input/instance/guard")
 
 
 def create_guard_router(app:Sanic) -> Blueprint:
     sensitive_router.add_route(GuardHandler.as_view(),'/run')
+    sensitive_router.add_route(GuardBatchHandler.as_view(),'/batch')
     return sensitive_router
 
 
@@ -3,8 +3,10 @@ from sanic import HTTPResponse, json
 from sanic.views import HTTPMethodView
 from tools.guard_tools import GuardTool
 from sanic.request import Request
-from models import SensitiveContext
-from sanic.log import logger
+from models import SensitiveContext, SensitiveBatchInput
+from config import Config
+import asyncio
+from utils.metrics import record_request
 from sanic_ext import validate
 import time
 
@@ -14,8 +16,31 @@ class GuardHandler(HTTPMethodView):
     async def post(self, request: Request, body: SensitiveContext) -> HTTPResponse:
         start = time.perf_counter_ns()
         tool = GuardTool()
-        tool.flow()
         await tool.execute(body)
-        logger.info(f"【1】 {(time.perf_counter_ns() - start)/1e6} ms")
-        
+        record_request("guard", body.app_id, start)
+
         return json({"Safety": body.safety, "Category": body.category}, 200)
+
+
+class GuardBatchHandler(HTTPMethodView):
+    @validate(json=SensitiveBatchInput)
+    async def post(self, request: Request, body: SensitiveBatchInput) -> HTTPResponse:
+        start = time.perf_counter_ns()
+        ctxs = body.to_contexts()
+        tool = GuardTool()
+        semaphore = asyncio.Semaphore(Config.BATCH_GUARD_CONCURRENCY)
+
+        async def _guard(ctx: SensitiveContext):
+            async with semaphore:
+                await tool.execute(ctx)
+
+        outcomes = await asyncio.gather(*(_guard(ctx) for ctx in ctxs), return_exceptions=True)
+        results = [
+            {"index": i, "error": str(outcome)}
+            if isinstance(outcome, Exception)
+            else {"index": i, "Safety": ctx.safety, "Category": ctx.category}
+            for i, (ctx, outcome) in enumerate(zip(ctxs, outcomes))
+        ]
+        record_request("guard_batch", body.app_id, start, items=len(ctxs))
+
+        return json({"results": results}, 200)
@@ -0,0 +1,10 @@
+from sanic import Blueprint, Sanic
+from .view import OutputRuleEngineHandler, OutputStreamHandler
+
+output_router = Blueprint("output_routes", url_prefix="/api/output/instance/rule")
+
+
+def create_output_router(app:Sanic) -> Blueprint:
+    output_router.add_route(OutputRuleEngineHandler.as_view(),'/run')
+    output_router.add_route(OutputStreamHandler.as_view(),'/stream', stream=True)
+    return output_router
@@ -0,0 +1,100 @@
+"""
+输出审核API视图
+/run 对完整输出做一次审核；/stream 接收上游模型的流式输出并逐块返回决策（SSE）
+"""
+import json as jsonlib
+import time
+from pydantic import ValidationError
+from sanic import HTTPResponse, json
+from sanic.views import HTTPMethodView
+from sanic.log import logger
+from sanic.request import Request
+from utils.metrics import record_request
+from sanic_ext import validate
+from models import SensitiveContext
+from tools.rule_engine_tools import OutputRuleEngineTool, StreamOutputRuleEngineTool
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {jsonlib.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class OutputRuleEngineHandler(HTTPMethodView):
+    @validate(json=SensitiveContext)
+    async def post(self, request: Request, body: SensitiveContext) -> HTTPResponse:
+        start = time.perf_counter_ns()
+        tool = OutputRuleEngineTool()
+        await tool.execute(body)
+        record_request("output", body.app_id, start, body.final_decision.get("score"))
+
+        return json(
+            {
+                "final_decision": body.final_decision,
+                "all_decision_dict": body.all_decision_dict,
+            },
+            200,
+        )
+
+
+class OutputStreamHandler(HTTPMethodView):
+    """流式输出审核
+
+    请求体为 NDJSON 流：首行为请求参数（同 /run，input_prompt 可省略），
+    之后每行 {"chunk": "..."} 为上游模型的一段输出。
+    响应为 SSE：每个分块一个 decision 事件；决策达到 REJECT 及以上时发送 cut 事件并停止读取，
+    否则输入结束后发送 done 事件。
+    """
+
+    async def post(self, request: Request):
+        start = time.perf_counter_ns()
+        response = await request.respond(content_type="text/event-stream")
+        tool: StreamOutputRuleEngineTool | None = None
+        buffer = b""
+
+        async def _handle_line(line: bytes) -> bool:
+            """处理一行输入，返回 False 表示需要停止"""
+            nonlocal tool
+            if not line.strip():
+                return True
+            payload = jsonlib.loads(line)
+            if tool is None:
+                payload.setdefault("input_prompt", "-")
+                ctx = SensitiveContext.model_validate(payload)
+                tool = StreamOutputRuleEngineTool(ctx)
+                await tool.open()
+                return True
+            decision = await tool.feed(payload.get("chunk", ""))
+            await response.send(_sse("decision", decision))
+            return not decision["cut"]
+
+        try:
+            while True:
+                body = await request.stream.read()
+                if body is None:
+                    break
+                buffer += body
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if not await _handle_line(line):
+                        await response.send(_sse("cut", tool.summary()))
+                        return await response.eof()
+            if buffer and not await _handle_line(buffer):
+                await response.send(_sse("cut", tool.summary()))
+                return await response.eof()
+            await response.send(_sse("done", tool.summary() if tool else {}))
+        except (ValidationError, ValueError) as e:
+            await response.send(_sse("error", {"message": str(e)}))
+        except Exception as e:
+            # 响应头已发出，无法再改状态码，以 error 事件结束流
+            logger.exception(f"output stream failed: {e}")
+            await response.send(_sse("error", {"message": "internal error"}))
+        finally:
+            if tool is not None:
+                record_request(
+                    "output_stream",
+                    tool.ctx.app_id,
+                    start,
+                    tool.ctx.final_decision.get("score"),
+                    items=tool.seq,
+                )
+        await response.eof()
@@ -1,9 +1,9 @@
 from sanic import HTTPResponse, json
 from sanic.views import HTTPMethodView
-from tools.rule_engine_tools import InputRuleEngineTool
+from tools.rule_engine_tools import InputRuleEngineTool, BatchRuleEngineTool
 from sanic.request import Request
-from models import SensitiveContext
-from sanic.log import logger
+from models import SensitiveContext, SensitiveBatchInput
+from utils.metrics import record_request, record_decision
 from sanic_ext import validate
 import time
 
@@ -15,10 +15,9 @@ class RuleEngineInputHandler(HTTPMethodView):
         #     raise Exception("VIP_WHITE_AND_WORDS_ALL_TRUE_ERROR")
         start = time.perf_counter_ns()
         tool = InputRuleEngineTool()
-        tool.flow()
         await tool.execute(body)
-        logger.info(f"【final】 {(time.perf_counter_ns() - start)/1e6} ms")
-        
+        record_request("input", body.app_id, start, body.final_decision.get("score"))
+
         return json(
             {
                 # "senstive": body.final_result,
@@ -28,6 +27,39 @@ class RuleEngineInputHandler(HTTPMethodView):
             },
             200,
         )
-        
 
 
+class RuleEngineBatchHandler(HTTPMethodView):
+    @validate(json=SensitiveBatchInput)
+    async def post(self, request: Request, body: SensitiveBatchInput) -> HTTPResponse:
+        start = time.perf_counter_ns()
+        ctxs = body.to_contexts()
+        tool = BatchRuleEngineTool()
+        errors = await tool.execute(ctxs)
+        if errors is None:
+            errors = [Exception("RULE_ENGINE_ERROR")] * len(ctxs)
+
+        results = []
+        for i, (ctx, error) in enumerate(zip(ctxs, errors)):
+            if error is None:
+                record_decision("input_batch", ctx.app_id, ctx.final_decision.get("score"))
+                results.append(
+                    {
+                        "index": i,
+                        "final_decision": ctx.final_decision,
+                        "all_decision_dict": ctx.all_decision_dict,
+                    }
+                )
+            else:
+                results.append({"index": i, "error": str(error)})
+        failure_count = sum(1 for error in errors if error is not None)
+        record_request("input_batch", body.app_id, start, items=len(ctxs))
+
+        return json(
+            {
+                "results": results,
+                "success_count": len(ctxs) - failure_count,
+                "failure_count": failure_count,
+            },
+            200,
+        )
@@ -1,12 +1,13 @@
 
 from sanic import Blueprint, Sanic
-from .view import SensitiveHandler
+from .view import SensitiveHandler, SensitiveBatchHandler
 
 sensitive_router = Blueprint("sensitive_routes", url_prefix="/api/input/instance/sensitive")
 
 
 def create_sensitive_router(app:Sanic) -> Blueprint:
     sensitive_router.add_route(SensitiveHandler.as_view(),'/run')
+    sensitive_router.add_route(SensitiveBatchHandler.as_view(),'/batch')
     return sensitive_router
 
 
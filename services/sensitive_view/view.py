@@ -2,8 +2,8 @@ from sanic import HTTPResponse, json
 from sanic.views import HTTPMethodView
 from tools.sensitive_tools import SensitiveTool
 from sanic.request import Request
-from models import SensitiveContext
-from sanic.log import logger
+from models import SensitiveContext, SensitiveBatchInput, ScanMode
+from utils.metrics import record_request
 from sanic_ext import validate
 import time
 
@@ -12,8 +12,31 @@ class SensitiveHandler(HTTPMethodView):
     async def post(self, request: Request, body: SensitiveContext) -> HTTPResponse:
         start = time.perf_counter_ns()
         tool = SensitiveTool()
-        tool.flow()
         await tool.execute(body)
-        logger.info(f"【1】 {(time.perf_counter_ns() - start)/1e6} ms")
+        record_request("sensitive", body.app_id, start)
 
+        if body.scan_mode is ScanMode.COUNT:
+            return json(
+                {"final_result": body.final_result, "hit_counts": body.hit_counts}, 200
+            )
         return json(body.final_result, 200)
+
+
+class SensitiveBatchHandler(HTTPMethodView):
+    @validate(json=SensitiveBatchInput)
+    async def post(self, request: Request, body: SensitiveBatchInput) -> HTTPResponse:
+        start = time.perf_counter_ns()
+        ctxs = body.to_contexts()
+        tool = SensitiveTool()
+        await tool.execute_batch(ctxs)
+        record_request("sensitive_batch", body.app_id, start, items=len(ctxs))
+
+        if body.scan_mode is ScanMode.COUNT:
+            return json(
+                {
+                    "results": [ctx.final_result for ctx in ctxs],
+                    "hit_counts": [ctx.hit_counts for ctx in ctxs],
+                },
+                200,
+            )
+        return json({"results": [ctx.final_result for ctx in ctxs]}, 200)
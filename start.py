@@ -1,6 +1,11 @@
+from sanic import Sanic
 from app.llm_server_app import create_app
 from config import Config
 
+if Config.PRELOAD_DATA:
+    # fork 才能让 worker 继承主进程 main_process_start 中加载好的词典
+    Sanic.start_method = "fork"
+
 app = create_app()
 
 if __name__ == "__main__":
@@ -10,5 +15,5 @@ if __name__ == "__main__":
         port=Config.PORT,
         debug=Config.DEBUG,
         auto_reload=Config.AUTO_RELOAD,
-        # workers=1
+        workers=Config.WORKER,
     )
@@ -12,6 +12,11 @@ echo "LLM Guard Server Starting..."
 echo "========================================="
 echo "Data Source Mode: $DATA_SOURCE_MODE"
 
+if [ -n "$DATA_SOURCE_SNAPSHOT_PATH" ]; then
+    # 快照由 python compile_snapshot.py <path> 生成，过期时服务会自动重建
+    echo "Snapshot Path: $DATA_SOURCE_SNAPSHOT_PATH"
+fi
+
 if [ "$DATA_SOURCE_MODE" = "FILE" ]; then
     echo "File Base Path: $DATA_SOURCE_FILE_BASE_PATH"
 
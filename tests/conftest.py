@@ -0,0 +1,65 @@
+"""测试公用：以临时目录中的 JSON 文件为数据源初始化 DataProvider 单例"""
+import asyncio
+import json
+
+import pytest
+
+from tools.data_tool import DataProvider
+from tools.data_tool.file_data_loader import FileDataLoader
+from tools.data_tool.snapshot_tool import load_or_build
+from utils.public import SingleTon
+
+TAGS = ("A.1.2", "A.1.5", "A.2.12")
+
+GLOBAL_KEYWORDS = [
+    {"id": "1", "keyword": "坏人", "tag_code": "A.1.2", "risk_level": "High", "is_active": True},
+    {"id": "2", "keyword": "炸弹", "tag_code": "A.1.5", "risk_level": "High", "is_active": True},
+    {"id": "3", "keyword": "踏马的", "tag_code": "A.2.12", "risk_level": "High", "is_active": True},
+    # 标签 A.1 没有通用规则，用于规则缺失的错误路径
+    {"id": "4", "keyword": "天目湖", "tag_code": "A.1", "risk_level": "High", "is_active": True},
+]
+
+# 与样例数据口径一致：SAFE 改写，UNSAFE / CONTROVERSIAL 拦截
+GLOBAL_DEFAULTS = [
+    {"id": f"{tag}-{safety}", "tag_code": tag, "extra_condition": safety, "strategy": strategy, "is_active": True}
+    for tag in TAGS
+    for safety, strategy in (("SAFE", "REWRITE"), ("UNSAFE", "BLOCK"), ("CONTROVERSIAL", "BLOCK"))
+]
+
+SCENARIO_KEYWORDS = [
+    # test_001：自定义黑名单词与白名单词
+    {"id": "k1", "scenario_id": "test_001", "keyword": "暗号", "tag_code": "A.1.2", "risk_level": "High", "is_active": True, "category": 1},
+    {"id": "k2", "scenario_id": "test_001", "keyword": "坏人", "tag_code": None, "risk_level": "High", "is_active": True, "category": 0},
+]
+
+SCENARIO_POLICIES = [
+    # test_002：超黑词与自定义规则
+    {"id": "p1", "scenario_id": "test_002", "match_type": "KEYWORD", "match_value": "禁语", "rule_mode": 0, "extra_condition": "A.1.5", "strategy": "BLOCK", "is_active": True},
+    {"id": "p2", "scenario_id": "test_002", "match_type": "TAG", "match_value": "A.1.2", "rule_mode": 1, "extra_condition": "SAFE", "strategy": "PASS", "is_active": True},
+]
+
+
+def write_data(path, **files):
+    data = {
+        "global_keywords.json": GLOBAL_KEYWORDS,
+        "global_defaults.json": GLOBAL_DEFAULTS,
+        "meta_tags.json": [],
+        "scenario_keywords.json": SCENARIO_KEYWORDS,
+        "scenario_policies.json": SCENARIO_POLICIES,
+        **files,
+    }
+    for filename, rows in data.items():
+        (path / filename).write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def data_provider(tmp_path):
+    """全新的 DataProvider 单例，数据来自 tmp_path 下的数据文件"""
+    write_data(tmp_path)
+    loader = FileDataLoader()
+    loader.base_path = str(tmp_path)
+    SingleTon._instances.pop(DataProvider, None)
+    provider = DataProvider(loader)
+    asyncio.run(load_or_build(provider, "", False))
+    yield provider
+    SingleTon._instances.pop(DataProvider, None)
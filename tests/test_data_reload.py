@@ -0,0 +1,82 @@
+"""热更新：流式重建通用词典；手动触发经共享信号文件同步到其他 worker"""
+import asyncio
+import json
+
+from tools.data_tool import DataProvider
+from tools.data_tool.file_data_loader import FileDataLoader
+from tools.data_tool.ac_tool import CustomContainer, CustomVipContainer
+from tools.data_tool.data_provider import build_tenants
+from tools.data_tool.reload_tool import DataReloader, ReloadSignal
+from tools.data_tool.snapshot_tool import load_or_build
+
+from conftest import GLOBAL_KEYWORDS
+
+
+def worker(base_path) -> DataProvider:
+    """模拟另一个 worker：独立的数据提供者，读取同一份数据"""
+    loader = FileDataLoader()
+    loader.base_path = base_path
+    provider = DataProvider.staging(loader)
+    asyncio.run(load_or_build(provider, "", False))
+    return provider
+
+
+def add_global_word(data_provider, keyword):
+    path = f"{data_provider.data_loader.base_path}/global_keywords.json"
+    rows = GLOBAL_KEYWORDS + [
+        {"id": "new", "keyword": keyword, "tag_code": "A.1.2", "risk_level": "High", "is_active": True}
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+
+
+def test_reload_rebuilds_global_words(data_provider):
+    reloader = DataReloader(data_provider, 0)
+    add_global_word(data_provider, "新词")
+    assert asyncio.run(reloader.check(force=True))
+    assert "新词" in data_provider.export_snapshot().global_ac.automaton
+    # 数据未变化时复用已有的通用词典
+    global_ac = data_provider.export_snapshot().global_ac
+    assert asyncio.run(reloader.check(force=True))
+    assert data_provider.export_snapshot().global_ac is global_ac
+
+
+def test_trigger_reaches_other_workers(data_provider, tmp_path):
+    other = worker(data_provider.data_loader.base_path)
+    path = str(tmp_path / "signal" / "reload.json")
+    receiver = DataReloader(data_provider, 0, ReloadSignal(path))
+    sender = DataReloader(other, 0, ReloadSignal(path))
+    add_global_word(data_provider, "新词")
+
+    async def run():
+        watcher = asyncio.ensure_future(receiver.watch(0.01))
+        assert await sender.trigger()
+        for _ in range(100):
+            if receiver.reload_count:
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+    asyncio.run(run())
+    assert receiver.reload_count == 1
+    assert sender.reload_count == 1
+    assert data_provider.data_version == other.data_version
+    # 发送方不会因自己写入的信号重复热更新
+    assert sender.signal.poll() is None
+
+
+def test_build_tenants_publishes_new_snapshot(data_provider):
+    """租户构建结果整体发布，之前取到的快照不受影响"""
+    class Scheduler:
+        async def run(self):
+            return [("customize", "new_app", custom, 0.0), ("vip", "new_app", vip, 0.0)]
+
+    custom, vip = CustomContainer(white_ac={"好人"}), CustomVipContainer()
+    before = data_provider.current
+    data_provider.build_scheduler = Scheduler()
+    asyncio.run(build_tenants(data_provider))
+    assert "new_app" not in before.custom_ac and "new_app" not in before.custom_vip
+    assert data_provider.custom_ac["new_app"] is custom
+    assert data_provider.custom_vip["new_app"] is vip
+    assert set(before.custom_ac) <= set(data_provider.custom_ac)
@@ -0,0 +1,86 @@
+"""整体决策结果缓存：降级改写结果不缓存"""
+import asyncio
+
+from models import SensitiveContext
+from tools.intent_tools import RewriteExecutor
+from tools.intent_tools.intent_tools import REWRITE_ERROR_RULE
+from tools.intent_tools.rewrite_executor import FALLBACK_MASK, FALLBACK_REJECT
+from tools.rule_engine_tools import DecisionCache
+
+
+def make_ctx() -> SensitiveContext:
+    return SensitiveContext(
+        request_id="r1", app_id="app_test", apikey="k", input_prompt="帮我改写一下这段话"
+    )
+
+
+class FakeRewrite:
+    """模拟改写流程：按顺序返回给定的改写结果（或 hit_rule），记录大模型调用次数"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self, ctx: SensitiveContext):
+        result = self.results[min(self.calls, len(self.results) - 1)]
+        self.calls += 1
+        ctx.final_decision = {"score": 50}
+        if not isinstance(result, dict):
+            result = {"rewritten_text": "ok", "hit_rule": result}
+        ctx.rewrite_result = result
+
+
+def run_twice(compute: FakeRewrite) -> DecisionCache:
+    cache = DecisionCache(max_entries=10, ttl=60)
+
+    async def main():
+        await cache.run(make_ctx(), "v1", compute)
+        await cache.run(make_ctx(), "v1", compute)
+
+    asyncio.run(main())
+    return cache
+
+
+def test_failed_rewrite_not_cached():
+    compute = FakeRewrite(REWRITE_ERROR_RULE, None)
+    cache = run_twice(compute)
+    # 首次改写失败未缓存，第二次相同请求重新调用大模型
+    assert compute.calls == 2
+    assert cache.stats()["skipped_degraded"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_successful_rewrite_cached():
+    compute = FakeRewrite(None)
+    cache = run_twice(compute)
+    assert compute.calls == 1
+    assert cache.hits == 1
+
+
+def test_rewrite_unavailable_not_cached():
+    """执行器拥塞降级（reject 与 mask）同样不缓存，拥塞解除后重新改写"""
+    for policy in (FALLBACK_REJECT, FALLBACK_MASK):
+        executor = RewriteExecutor.__new__(RewriteExecutor)
+        executor.__init__(fallback=policy)
+        fallback = executor.fallback_result("帮我改写一下这段话", ["改写"], "queue_full")
+        assert not fallback.is_safe_now
+        compute = FakeRewrite(fallback.model_dump(), None)
+        cache = run_twice(compute)
+        assert compute.calls == 2
+        assert cache.stats()["skipped_degraded"] == 1
+
+
+def test_interleaved_versions_keep_entries():
+    """热更新期间新旧快照的请求交替到达，各自版本的条目都保留并命中"""
+    compute = FakeRewrite(None)
+    cache = DecisionCache(max_entries=10, ttl=60)
+
+    async def main():
+        for _ in range(3):
+            await cache.run(make_ctx(), "v1", compute)
+            await cache.run(make_ctx(), "v2", compute)
+
+    asyncio.run(main())
+    assert compute.calls == 2
+    assert cache.hits == 4
+    assert cache.stats()["entries"] == 2
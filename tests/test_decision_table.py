@@ -0,0 +1,75 @@
+"""决策表编译与按表排序"""
+from models import DecisionClassifyEnum, SensitiveContext
+from tools.data_tool.decision_table import compile_decision_table, missing_rules
+from tools.rule_engine_tools.decision_maker import rank_by_normal_rules
+
+PASS = DecisionClassifyEnum.PASS
+REWRITE = DecisionClassifyEnum.REWRITE
+REJECT = DecisionClassifyEnum.REJECT
+
+GLOBAL_RULES = {
+    "A.1.2-SAFE": REWRITE,
+    "A.1.2-UNSAFE": REJECT,
+    "A.1.5-SAFE": PASS,
+}
+
+
+def test_split_by_safety():
+    table = compile_decision_table(GLOBAL_RULES)
+    assert table == {
+        "SAFE": {"A.1.2": (50, "A.1.2-SAFE"), "A.1.5": (0, "A.1.5-SAFE")},
+        "UNSAFE": {"A.1.2": (100, "A.1.2-UNSAFE")},
+    }
+
+
+def test_custom_rule_overrides_global():
+    table = compile_decision_table(GLOBAL_RULES, {"A.1.2-UNSAFE": PASS})
+    assert table["UNSAFE"]["A.1.2"] == (0, "A.1.2-UNSAFE")
+    # 通用规则表不受租户规则影响
+    assert compile_decision_table(GLOBAL_RULES)["UNSAFE"]["A.1.2"][0] == 100
+
+
+def test_custom_only_label_accepted():
+    """与旧实现不同：通用规则中没有、仅租户定义的规则键同样生效，不再报 KEY_NOT_IN_RULE_ERROR"""
+    table = compile_decision_table(GLOBAL_RULES, {"B.9-SAFE": REJECT})
+    assert table["SAFE"]["B.9"] == (100, "B.9-SAFE")
+
+
+def test_malformed_label_ignored():
+    assert compile_decision_table({"nodash": REJECT}) == {}
+
+
+def test_missing_rules():
+    table = compile_decision_table(GLOBAL_RULES)
+    assert sorted(missing_rules(table, ["A.1.2", "A.1.5"])) == ["A.1.5-UNSAFE"]
+
+
+def make_ctx(app_id: str, use_customize_rule: bool) -> SensitiveContext:
+    ctx = SensitiveContext(
+        request_id="r1",
+        app_id=app_id,
+        apikey="k",
+        input_prompt="-",
+        use_customize_rule=use_customize_rule,
+    )
+    ctx.safety = "SAFE"
+    ctx.final_result = {"A.1.2": ["坏人"], "A.1.5": ["炸弹"]}
+    return ctx
+
+
+def test_rank_takes_max_decision(data_provider):
+    """与旧实现不同：返回各命中标签决策的最大值，而不是最后一个标签的决策"""
+    decision, decision_dict, details = rank_by_normal_rules(make_ctx("test_001", False))
+    assert decision == 50
+    assert details["A.1.2-SAFE"] == {"decision": 50, "words": ["坏人"]}
+
+
+def test_rank_with_custom_rule(data_provider):
+    # test_002 的自定义规则将 A.1.2-SAFE 改为 PASS
+    decision, decision_dict, details = rank_by_normal_rules(make_ctx("test_002", True))
+    assert details["A.1.2-SAFE"]["decision"] == 0
+    assert decision == 50
+    assert decision_dict == {"A.1.5": ["炸弹"]}
+    # 关闭自定义规则时按通用规则
+    _, _, details = rank_by_normal_rules(make_ctx("test_002", False))
+    assert details["A.1.2-SAFE"]["decision"] == 50
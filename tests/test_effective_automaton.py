@@ -0,0 +1,111 @@
+"""租户生效词典：单次扫描与按来源分别扫描（旧的多次扫描流程）结果一致"""
+import pytest
+
+from tools.data_tool.ac_tool import (
+    CustomContainer,
+    CustomVipContainer,
+    EffectiveAutomatonLoader,
+    HitSource,
+    SensitiveAutomatonLoaderByDB,
+)
+
+
+def loader(*entries) -> SensitiveAutomatonLoaderByDB:
+    ac = SensitiveAutomatonLoaderByDB()
+    ac.load_keywords(list(entries))
+    return ac
+
+
+GLOBAL = loader(("坏人", "A.1.2"), ("炸弹", "A.1.5"), ("大坏人", "A.1.2"), ("转账", "A.3.1"))
+CUSTOM = CustomContainer(
+    black_ac=loader(("暗号", "A.1.2"), ("炸弹", "C.1")),
+    white_ac={"转账"},
+)
+VIP = CustomVipContainer(
+    black_ac=loader(("禁语", "A.1.5")),
+    white_ac=loader(("坏人", "A.1.2")),
+)
+
+TEXTS = [
+    "这里有个大坏人在说暗号",
+    "炸弹和禁语以及转账",
+    "没有任何命中的文本",
+    "坏人坏人炸弹炸弹",
+]
+
+
+def normalize(result):
+    return {
+        source: {tag: sorted(words) for tag, words in contains.items()}
+        for source, contains in result.items()
+        if contains
+    }
+
+
+def multi_pass(text: str, sources: int, use_white: bool):
+    """旧流程：各来源分别扫描，白名单以集合差从通用与自定义结果中剔除"""
+    passes = [
+        (HitSource.GLOBAL, GLOBAL),
+        (HitSource.CUSTOM_BLACK, CUSTOM.black_ac),
+        (HitSource.VIP_BLACK, VIP.black_ac),
+        (HitSource.VIP_WHITE, VIP.white_ac),
+    ]
+    results = {}
+    for source, ac in passes:
+        if not source & sources:
+            continue
+        contains = ac.scan(text)
+        if use_white and source in (HitSource.GLOBAL, HitSource.CUSTOM_BLACK):
+            contains = {
+                tag: [w for w in words if w not in CUSTOM.white_ac]
+                for tag, words in contains.items()
+            }
+        contains = {tag: words for tag, words in contains.items() if words}
+        if contains:
+            results[source] = contains
+    return normalize(results)
+
+
+@pytest.fixture(scope="module")
+def effective() -> EffectiveAutomatonLoader:
+    ac = EffectiveAutomatonLoader()
+    ac.load_sources(GLOBAL, CUSTOM, VIP)
+    return ac
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("use_white", [False, True])
+@pytest.mark.parametrize(
+    "sources",
+    [
+        HitSource.GLOBAL,
+        HitSource.GLOBAL | HitSource.CUSTOM_BLACK,
+        HitSource.GLOBAL | HitSource.VIP_BLACK | HitSource.VIP_WHITE,
+        HitSource.GLOBAL | HitSource.CUSTOM_BLACK | HitSource.VIP_BLACK | HitSource.VIP_WHITE,
+    ],
+)
+def test_single_pass_matches_multi_pass(effective, text, sources, use_white):
+    assert normalize(effective.scan(text, sources, use_white)) == multi_pass(text, sources, use_white)
+
+
+def test_same_word_in_several_sources(effective):
+    result = effective.scan("炸弹", HitSource.GLOBAL | HitSource.CUSTOM_BLACK)
+    assert result == {HitSource.GLOBAL: {"A.1.5": ["炸弹"]}, HitSource.CUSTOM_BLACK: {"C.1": ["炸弹"]}}
+
+
+def test_white_list_does_not_affect_vip(effective):
+    # 超白词与租户白名单互不影响；白名单只剔除通用与自定义黑词
+    custom = CustomContainer(black_ac=CUSTOM.black_ac, white_ac={"禁语"})
+    ac = EffectiveAutomatonLoader()
+    ac.load_sources(GLOBAL, custom, VIP)
+    result = ac.scan("禁语", HitSource.VIP_BLACK, use_white=True)
+    assert result == {HitSource.VIP_BLACK: {"A.1.5": ["禁语"]}}
+
+
+def test_global_only():
+    ac = EffectiveAutomatonLoader()
+    ac.load_sources(GLOBAL)
+    all_sources = HitSource.GLOBAL | HitSource.CUSTOM_BLACK | HitSource.VIP_BLACK | HitSource.VIP_WHITE
+    assert normalize(ac.scan("大坏人", all_sources)) == {
+        HitSource.GLOBAL: {"A.1.2": ["坏人", "大坏人"]}
+    }
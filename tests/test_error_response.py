@@ -0,0 +1,38 @@
+"""命中没有规则的标签：抛出 RULE_ENGINE_ERROR，经异常处理返回结构化错误响应"""
+import pytest
+from sanic import Sanic, json
+
+from models import SensitiveContext
+from tools.rule_engine_tools.decision_maker import make_decision
+from utils.error_codes import ErrorCode
+from utils.error_handler import setup_exception_handlers
+from utils.exceptions import AppException
+
+
+def make_ctx() -> SensitiveContext:
+    ctx = SensitiveContext(request_id="r1", app_id="app_test", apikey="k", input_prompt="天目湖")
+    ctx.safety = "SAFE"
+    ctx.final_result = {"A.1": ["天目湖"]}
+    return ctx
+
+
+def test_uncovered_tag_raises(data_provider):
+    with pytest.raises(AppException) as info:
+        make_decision(make_ctx())
+    assert info.value.error_code == ErrorCode.RULE_ENGINE_ERROR
+
+
+def test_uncovered_tag_structured_response(data_provider):
+    app = Sanic("test_error_response")
+    setup_exception_handlers(app)
+
+    @app.post("/decide")
+    async def decide(request):
+        ctx = make_ctx()
+        make_decision(ctx)
+        return json(ctx.final_decision)
+
+    _, response = app.test_client.post("/decide")
+    assert response.status == 500
+    assert response.json["error"]["code"] == ErrorCode.RULE_ENGINE_ERROR
+    assert "A.1-SAFE" in response.json["error"]["message"]
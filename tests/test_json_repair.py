@@ -0,0 +1,50 @@
+"""大模型 JSON 输出的本地修复"""
+import pytest
+
+from models import SafetyRewriteResult
+from tools.intent_tools.json_repair import parse_json_output
+
+VALID = '{"user_intent": "问路", "rewritten_text": "去天目湖怎么走", "is_safe_now": true, "hit_rule": null}'
+
+
+def test_valid_output_not_repaired():
+    result, repaired = parse_json_output(VALID, SafetyRewriteResult)
+    assert not repaired
+    assert result.rewritten_text == "去天目湖怎么走"
+
+
+def test_fenced_output():
+    result, repaired = parse_json_output(f"```json\n{VALID}\n```", SafetyRewriteResult)
+    assert repaired
+    assert result.user_intent == "问路"
+
+
+def test_surrounding_prose():
+    result, repaired = parse_json_output(f"好的，结果如下：\n{VALID}\n以上。", SafetyRewriteResult)
+    assert repaired
+    assert result.is_safe_now is True
+
+
+def test_trailing_comma_and_python_literals():
+    text = '{"user_intent": "问路", "rewritten_text": "去天目湖怎么走", "is_safe_now": True, "hit_rule": None,}'
+    result, repaired = parse_json_output(text, SafetyRewriteResult)
+    assert repaired
+    assert result.is_safe_now is True
+    assert result.hit_rule is None
+
+
+def test_literals_and_commas_inside_strings_kept():
+    text = (
+        '{"user_intent": "答案是 None 或 True", "rewritten_text": "列表 [1, ] 与 \\"False\\", }", '
+        '"is_safe_now": False, "hit_rule": None,}'
+    )
+    result, repaired = parse_json_output(text, SafetyRewriteResult)
+    assert repaired
+    assert result.user_intent == "答案是 None 或 True"
+    assert result.rewritten_text == '列表 [1, ] 与 "False", }'
+    assert result.is_safe_now is False
+
+
+def test_unparseable_output():
+    with pytest.raises(ValueError):
+        parse_json_output("无法处理该请求", SafetyRewriteResult)
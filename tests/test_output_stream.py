@@ -0,0 +1,27 @@
+"""流式输出审核：跨分块命中拦截级规则时截断"""
+import asyncio
+
+from models import SensitiveContext
+from tools.rule_engine_tools import StreamOutputRuleEngineTool
+
+
+def feed_all(chunks):
+    async def run():
+        ctx = SensitiveContext(request_id="r1", app_id="app_test", apikey="k", input_prompt="-")
+        tool = StreamOutputRuleEngineTool(ctx)
+        await tool.open()
+        return [await tool.feed(chunk) for chunk in chunks]
+
+    return asyncio.run(run())
+
+
+def test_keyword_across_chunks_cuts(data_provider):
+    decisions = feed_all(["今天天气很好，然后炸", "弹爆炸了"])
+    assert decisions[0]["cut"] is False
+    assert decisions[1]["cut"] is True
+    assert decisions[1]["score"] >= 100
+
+
+def test_clean_stream_not_cut(data_provider):
+    decisions = feed_all(["今天天气", "很好"])
+    assert not any(d["cut"] for d in decisions)
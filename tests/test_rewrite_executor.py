@@ -0,0 +1,138 @@
+"""改写执行器：相同改写合并、多条合并改写及其降级路径"""
+import asyncio
+
+from models import SafetyRewriteResult
+from tools.intent_tools import RewriteExecutor
+from tools.intent_tools.rewrite_executor import REWRITE_UNAVAILABLE_RULE
+
+
+def ok(text: str) -> SafetyRewriteResult:
+    return SafetyRewriteResult(user_intent="", rewritten_text=f"改写:{text}", is_safe_now=True, hit_rule=None)
+
+
+class FakeIntent:
+    """模拟改写大模型：记录逐条与多条调用；batch 为多条调用的返回方式"""
+
+    def __init__(self, delay: float = 0.02, batch: str = "ok") -> None:
+        self.delay = delay
+        self.batch = batch
+        self.single_calls = []
+        self.batch_calls = []
+
+    async def execute(self, text, words):
+        self.single_calls.append(text)
+        await asyncio.sleep(self.delay)
+        return ok(text)
+
+    async def execute_batch(self, items):
+        self.batch_calls.append([text for text, _ in items])
+        await asyncio.sleep(self.delay)
+        if self.batch == "error":
+            raise RuntimeError("batch failed")
+        results = [ok(text) for text, _ in items]
+        if self.batch == "missing":
+            # 模型漏答第一条
+            results[0] = None
+        return results
+
+
+def make_executor(intent: FakeIntent, **kwargs) -> RewriteExecutor:
+    options = dict(
+        concurrency=1,
+        queue_size=10,
+        queue_timeout=1,
+        timeout=1,
+        fallback="reject",
+        batch_size=8,
+        batch_wait_ms=5,
+        batch_max_chars=100,
+    )
+    options.update(kwargs)
+    executor = RewriteExecutor.__new__(RewriteExecutor)
+    executor.__init__(**options)
+    executor._intent = intent
+    return executor
+
+
+async def busy_then(executor: RewriteExecutor, texts):
+    """先占满执行名额，使后续短文本进入合并窗口"""
+    first = asyncio.ensure_future(executor.rewrite("占位", ["词"]))
+    await asyncio.sleep(0)
+    results = await asyncio.gather(*(executor.rewrite(text, ["词"]) for text in texts))
+    await first
+    return results
+
+
+def test_identical_rewrites_share_one_call():
+    intent = FakeIntent()
+
+    async def main():
+        executor = make_executor(intent, batch_size=1)
+        return await asyncio.gather(*(executor.rewrite("同一段话", ["词", "词"]) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert intent.single_calls == ["同一段话"]
+    assert all(r.rewritten_text == "改写:同一段话" for r in results)
+    # 各调用方拿到独立副本
+    assert len({id(r) for r in results}) == 5
+
+
+def test_short_texts_batched_under_load():
+    intent = FakeIntent()
+
+    async def main():
+        return await busy_then(make_executor(intent), ["甲", "乙", "丙"])
+
+    results = asyncio.run(main())
+    assert intent.batch_calls == [["甲", "乙", "丙"]]
+    assert [r.rewritten_text for r in results] == ["改写:甲", "改写:乙", "改写:丙"]
+
+
+def test_missing_batch_item_retried_alone():
+    intent = FakeIntent(batch="missing")
+
+    async def main():
+        return await busy_then(make_executor(intent), ["甲", "乙"])
+
+    results = asyncio.run(main())
+    assert intent.single_calls == ["占位", "甲"]
+    assert [r.rewritten_text for r in results] == ["改写:甲", "改写:乙"]
+
+
+def test_failed_batch_retried_item_by_item():
+    intent = FakeIntent(batch="error")
+
+    async def main():
+        executor = make_executor(intent)
+        results = await busy_then(executor, ["甲", "乙"])
+        return executor, results
+
+    executor, results = asyncio.run(main())
+    assert sorted(intent.single_calls) == sorted(["占位", "甲", "乙"])
+    assert [r.rewritten_text for r in results] == ["改写:甲", "改写:乙"]
+    assert executor.batch_retries == 2
+
+
+def test_batch_timeout_falls_back():
+    intent = FakeIntent(delay=0.2)
+
+    async def main():
+        executor = make_executor(intent, timeout=0.1, queue_timeout=1)
+        return executor, await busy_then(executor, ["甲", "乙"])
+
+    executor, results = asyncio.run(main())
+    assert all(r.hit_rule == REWRITE_UNAVAILABLE_RULE and not r.is_safe_now for r in results)
+    assert executor.shed["timeout"] >= 2
+
+
+def test_queue_full_falls_back():
+    intent = FakeIntent(delay=0.05)
+
+    async def main():
+        executor = make_executor(intent, queue_size=0, batch_size=1)
+        return executor, await busy_then(executor, ["甲"])
+
+    executor, results = asyncio.run(main())
+    assert results[0].hit_rule == REWRITE_UNAVAILABLE_RULE
+    assert executor.shed["queue_full"] == 1
+    assert intent.single_calls == ["占位"]
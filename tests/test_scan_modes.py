@@ -0,0 +1,68 @@
+"""扫描模式：all / any / first / longest / count"""
+import pytest
+
+from models import ScanMode
+from tools.data_tool.ac_tool import (
+    EffectiveAutomatonLoader,
+    HitSource,
+    SensitiveAutomatonLoaderByDB,
+)
+
+TEXT = "大坏人带着炸弹，坏人又带炸弹"
+
+
+@pytest.fixture(scope="module")
+def effective() -> EffectiveAutomatonLoader:
+    ac = SensitiveAutomatonLoaderByDB()
+    ac.load_keywords([("坏人", "A.1.2"), ("大坏人", "A.1.2"), ("炸弹", "A.1.5")])
+    effective = EffectiveAutomatonLoader()
+    effective.load_sources(ac)
+    return effective
+
+
+def scan(effective, mode: ScanMode):
+    return effective.scan(TEXT, HitSource.GLOBAL, False, mode).get(HitSource.GLOBAL, {})
+
+
+def test_all_keeps_every_overlapping_hit(effective):
+    assert scan(effective, ScanMode.ALL) == {
+        "A.1.2": ["大坏人", "坏人", "坏人"],
+        "A.1.5": ["炸弹", "炸弹"],
+    }
+
+
+def test_any_keeps_first_hit_per_tag(effective):
+    assert scan(effective, ScanMode.ANY) == {"A.1.2": ["大坏人"], "A.1.5": ["炸弹"]}
+
+
+def test_first_stops_at_first_hit(effective):
+    result = scan(effective, ScanMode.FIRST)
+    assert sum(len(words) for words in result.values()) == 1
+    assert result == {"A.1.2": ["大坏人"]}
+
+
+def test_longest_drops_overlaps(effective):
+    assert scan(effective, ScanMode.LONGEST) == {
+        "A.1.2": ["大坏人", "坏人"],
+        "A.1.5": ["炸弹", "炸弹"],
+    }
+
+
+def test_count_dedups_with_spans(effective):
+    result, counts = effective.scan_detail(TEXT, HitSource.GLOBAL, False, ScanMode.COUNT)
+    assert {tag: sorted(words) for tag, words in result[HitSource.GLOBAL].items()} == {
+        "A.1.2": ["坏人", "大坏人"],
+        "A.1.5": ["炸弹"],
+    }
+    words = counts[HitSource.GLOBAL]["A.1.2"]
+    second = TEXT.index("坏人", 3)
+    assert words["坏人"] == {"count": 2, "spans": [(1, 3), (second, second + 2)]}
+    assert words["大坏人"] == {"count": 1, "spans": [(0, 3)]}
+    assert counts[HitSource.GLOBAL]["A.1.5"]["炸弹"]["count"] == 2
+
+
+@pytest.mark.parametrize("mode", [ScanMode.ALL, ScanMode.ANY, ScanMode.FIRST, ScanMode.LONGEST])
+def test_modes_agree_with_single_source_loader(effective, mode):
+    ac = SensitiveAutomatonLoaderByDB()
+    ac.load_keywords([("坏人", "A.1.2"), ("大坏人", "A.1.2"), ("炸弹", "A.1.5")])
+    assert scan(effective, mode) == ac.scan(TEXT, mode)
@@ -0,0 +1,34 @@
+"""改写结果近重复缓存：差异片段出现在缓存结果中时不复用"""
+import pytest
+
+from tools.semantic_cache_tools import SemanticCacheTool, semantic_cache_tool
+
+FIRST = "我叫张三，身份证号码是110101199001011234，请帮我查询一下炸弹相关的新闻报道内容"
+SECOND = "我叫李四，身份证号码是110101199001011234，请帮我查询一下炸弹相关的新闻报道内容"
+
+
+@pytest.fixture(autouse=True)
+def same_fingerprint(monkeypatch):
+    """指纹基于进程内 hash()，距离随 PYTHONHASHSEED 变化；这里固定为近重复，只验证复用判断"""
+    monkeypatch.setattr(semantic_cache_tool, "simhash", lambda text: 0)
+
+
+def make_cache() -> SemanticCacheTool:
+    cache = SemanticCacheTool.__new__(SemanticCacheTool)
+    cache.__init__(max_entries=100, max_mb=1, ttl=60, max_distance=8, min_chars=10)
+    return cache
+
+
+def test_differing_span_in_result_not_reused():
+    cache = make_cache()
+    cache.store("app", FIRST, ["炸弹"], {"rewritten_text": "我叫张三，请帮我查询相关新闻报道"})
+    assert cache.lookup("app", SECOND, ["炸弹"]) is None
+    assert cache.stats()["rejected_diff"] == 1
+    assert cache.lookup("app", FIRST, ["炸弹"]) is not None
+
+
+def test_near_duplicate_reused():
+    cache = make_cache()
+    cache.store("app", FIRST, ["炸弹"], {"rewritten_text": "请帮我查询相关新闻报道"})
+    assert cache.lookup("app", SECOND, ["炸弹"]) == {"rewritten_text": "请帮我查询相关新闻报道"}
+    assert cache.lookup("other", SECOND, ["炸弹"]) is None
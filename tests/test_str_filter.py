@@ -0,0 +1,58 @@
+"""归一化与位置映射：normalize_with_offsets 与 normalize_text 输出一致，命中位置映射回原文"""
+import pytest
+
+from tools.string_filter_tools.str_filter import map_span, normalize_text, normalize_with_offsets
+
+SAMPLES = [
+    "坏人来了",
+    "ascii only",
+    "ｈｅｌｌｏ①坏人",
+    "坏\u200b人",
+    "é坏人",
+    "ﬁ坏人",
+    # 谚文字母跨起始字符组合，分段归一化与整体归一化不同
+    "각坏人",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_same_output_as_normalize_text(text):
+    normalized, offsets = normalize_with_offsets(text)
+    assert normalized == normalize_text(text)
+    if offsets is not None:
+        assert len(offsets) == len(normalized) + 1
+        assert offsets[-1] == len(text)
+        assert offsets == sorted(offsets)
+
+
+def find_in_original(text: str, word: str) -> str:
+    normalized, offsets = normalize_with_offsets(text)
+    start = normalized.index(word)
+    origin_start, origin_end = map_span(offsets, start, start + len(word))
+    return text[origin_start:origin_end]
+
+
+def test_unchanged_text_has_identity_mapping():
+    assert normalize_with_offsets("坏人来了") == ("坏人来了", None)
+    assert map_span(None, 1, 3) == (1, 3)
+
+
+def test_removed_format_chars_map_back():
+    assert find_in_original("前面坏\u200b人后面", "坏人") == "坏\u200b人"
+
+
+def test_width_folding_maps_back():
+    text = "说ＢＡＤ话"
+    assert find_in_original(text, "BAD") == "ＢＡＤ"
+
+
+def test_expanding_char_maps_to_whole_source():
+    # "①" 归一化为 "1"，"ﬁ" 归一化为两个字符 "fi"，均映射回原字符
+    assert find_in_original("第①条", "1") == "①"
+    assert find_in_original("ﬁx", "fi") == "ﬁ"
+    assert find_in_original("ﬁx", "i") == "ﬁ"
+
+
+def test_cross_starter_composition_maps_to_whole_text():
+    text = "각坏人"
+    assert find_in_original(text, "坏人") == text
@@ -0,0 +1,41 @@
+"""租户按需加载：无数据进负缓存，加载失败报错而不按无数据处理"""
+import asyncio
+
+import pytest
+
+from tools.data_tool.tenant_loader import TenantLoader
+from utils.error_codes import ErrorCode
+from utils.exceptions import AppException
+
+GENERATION = object()
+
+
+def test_no_data_is_negative_cached():
+    loader = TenantLoader(negative_ttl=30, error_ttl=5)
+
+    async def fetch():
+        return None
+
+    assert asyncio.run(loader.load("customize", "app", GENERATION, fetch)) is None
+    assert loader.is_negative("customize", "app")
+    loader.raise_if_failed("customize", "app")
+
+
+def test_load_failure_fails_closed():
+    loader = TenantLoader(negative_ttl=30, error_ttl=5)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        raise RuntimeError("db down")
+
+    with pytest.raises(AppException) as info:
+        asyncio.run(loader.load("vip", "app", GENERATION, fetch))
+    assert info.value.error_code == ErrorCode.DATA_LOAD_ERROR
+    assert not loader.is_negative("vip", "app")
+    # error_ttl 内直接报错，不再访问数据源
+    with pytest.raises(AppException):
+        loader.raise_if_failed("vip", "app")
+    assert len(calls) == 1
+    loader.reset()
+    loader.raise_if_failed("vip", "app")
@@ -1,36 +1,121 @@
-from typing import Dict
+import sys
+from enum import IntFlag
+from typing import Dict, Tuple
 import threading
 import ahocorasick
-from models import GlobalKeywords, ScenarioKeywords
-from typing import Any, Union, List, Set
+from models import GlobalKeywords, ScenarioKeywords, ScanMode
+from typing import Any, Iterable, Union, List, Set
 from utils import Promise
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from .decision_table import DecisionTable
 from typing import Optional
 
 
+# 每个词条 payload（元组与字符串等 Python 对象）的估算字节数，get_stats 只统计节点内存
+PAYLOAD_BYTES_ESTIMATE = 200
+
+
+def estimate_automaton_size(automaton: ahocorasick.Automaton | None) -> int:
+    """估算自动机占用内存：节点内存 + 词条 payload 估算"""
+    if automaton is None:
+        return 0
+    stats = automaton.get_stats()
+    return stats["total_size"] + stats["words_count"] * PAYLOAD_BYTES_ESTIMATE
+
+
 class SensitiveAutomatonLoaderByDB:
     def __init__(self) -> None:
         self.automaton = None
         self.lock = threading.Lock()
+        # add_keywords 增量添加中、尚未 finish 的自动机
+        self._building = None
+        self._building_tags: Set[str] = set()
+        # 词典中出现的标签，供决策表校验规则覆盖
+        self._tag_codes: Set[str] | None = None
+
+    def __getstate__(self):
+        # 锁不可序列化，快照中只保存自动机与标签集合
+        return {"automaton": self.automaton, "tag_codes": self._tag_codes}
+
+    def __setstate__(self, state):
+        self.automaton = state["automaton"]
+        self.lock = threading.Lock()
+        self._building = None
+        self._building_tags = set()
+        self._tag_codes = state.get("tag_codes")
+
+    @staticmethod
+    def _to_entry(word) -> Tuple[str, Any]:
+        """兼容 ORM 对象/Row、(keyword, tag_code) 元组以及纯字符串三种词条格式"""
+        if isinstance(word, str):
+            return word, None
+        if isinstance(word, tuple) and not hasattr(word, "keyword"):
+            return word[0], word[1] if len(word) > 1 else None
+        return word.keyword, word.tag_code
 
     def load_keywords(self, word_list: List[Union[GlobalKeywords, ScenarioKeywords]]):
+        self._building = None
+        self.add_keywords(word_list)
+        self.finish()
 
-        A = ahocorasick.Automaton()
-        for idx, word in enumerate(word_list):
-            payload = (word.keyword, word.tag_code)
-            A.add_word(word.keyword, payload)
+    def add_keywords(self, word_list: Iterable[Union[GlobalKeywords, ScenarioKeywords, tuple]]):
+        """增量添加一批词条（流式读取时逐批调用），全部添加后调用 finish"""
+        if self._building is None:
+            self._building = ahocorasick.Automaton()
+            self._building_tags = set()
+        A = self._building
+        tags = self._building_tags
+        for word in word_list:
+            keyword, tag_code = self._to_entry(word)
+            # 标签 intern 后与决策表键为同一对象
+            if isinstance(tag_code, str):
+                tag_code = sys.intern(tag_code)
+            A.add_word(keyword, (keyword, tag_code))
+            tags.add(tag_code)
+
+    def finish(self):
+        """生成自动机并替换当前自动机，此前扫描仍使用旧自动机"""
+        A = self._building if self._building is not None else ahocorasick.Automaton()
+        self._tag_codes = self._building_tags
+        self._building = None
+        self._building_tags = set()
         A.make_automaton()
         self.automaton = A
 
-    def scan(self, text) -> dict:
+    def tag_codes(self) -> Set[str]:
+        if self._tag_codes is None:
+            # 旧版快照未保存标签集合
+            self._tag_codes = {tag_code for _, tag_code in self.items()}
+        return self._tag_codes
+
+    def memory_size(self) -> int:
+        return estimate_automaton_size(self.automaton)
+
+    def items(self):
+        """遍历 (keyword, tag_code)，供合并词典时复用已构建的自动机"""
+        if not self.automaton:
+            return
+        for _, (word, tag_code) in self.automaton.items():
+            yield word, tag_code
+
+    def scan(self, text, mode: ScanMode = ScanMode.ALL) -> dict:
         if not self.automaton:
             raise Exception("NO_WORD_LIST_ERROR")
         contains = {}
-        for _, (word, tag_code) in self.automaton.iter(text):
+        matches = (
+            self.automaton.iter_long(text)
+            if mode is ScanMode.LONGEST
+            else self.automaton.iter(text)
+        )
+        for _, (word, tag_code) in matches:
             if tag_code not in contains:
                 contains[tag_code] = []
             if len(word) > 1:
+                if mode is ScanMode.ANY and contains[tag_code]:
+                    continue
                 contains[tag_code].append(word)
+                if mode is ScanMode.FIRST:
+                    break
         return contains
 
 
@@ -54,4 +139,250 @@ class CustomVipContainer(LoadBase):
     white_ac: SensitiveAutomatonLoaderByDB | None = None
 
 
+@dataclass
+class DataSnapshot:
+    """
+    DataProvider 的全部词典与规则，可整体序列化为快照文件。
+    发布后视为不可变：热更新构建新实例并整体替换引用，进行中的请求继续使用旧实例；
+    租户按需加载、淘汰与运行期缓存同样以写时复制（dataclasses.replace）生成新实例，不修改已发布的字典。
+    effective_ac / global_effective 为运行期按需构建的租户生效词典缓存，
+    decision_tables 为运行期编译的决策表，均不写入快照文件。
+    generation 标识数据的一代：全量加载与热更新产生新的一代，写时复制产生的实例沿用同一代。
+    """
+
+    data_version: str = ""
+    global_ac: SensitiveAutomatonLoaderByDB | None = None
+    global_rules: Dict[str, Any] | None = None
+    custom_ac: Dict[str, CustomContainer] | None = None
+    custom_vip: Dict[str, CustomVipContainer] | None = None
+    effective_ac: Dict[str, "EffectiveAutomatonLoader"] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    global_effective: Optional["EffectiveAutomatonLoader"] = field(
+        default=None, repr=False, compare=False
+    )
+    # app_id -> 编译后的决策表，"" 为仅通用规则的表
+    decision_tables: Dict[str, DecisionTable] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    generation: object = field(default_factory=object, repr=False, compare=False)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("effective_ac", None)
+        state.pop("global_effective", None)
+        state.pop("decision_tables", None)
+        state.pop("generation", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.effective_ac = {}
+        self.global_effective = None
+        self.decision_tables = {}
+        self.generation = object()
+
+
+class HitSource(IntFlag):
+    GLOBAL = 1
+    CUSTOM_BLACK = 2
+    VIP_BLACK = 4
+    VIP_WHITE = 8
+
+
+# 租户白名单只作用于通用词与自定义黑词，超黑/超白不受影响
+WHITE_SCOPE = HitSource.GLOBAL | HitSource.CUSTOM_BLACK
+
+
+class EffectiveAutomatonLoader:
+    """
+    租户生效词典：通用词、自定义黑词、超黑词、超白词合并为一个自动机，一次扫描得到全部命中。
+    payload 为 (word, ((source, tag_code), ...), whitelisted)，
+    白名单在构建时打标，扫描时按请求开关过滤，无需再做集合差。
+    """
+
+    def __init__(self) -> None:
+        self.automaton = None
+        # 各来源的标签数，ANY 模式据此判断能否提前结束
+        self.tag_counts: Dict[HitSource, int] = {}
+
+    def load_sources(
+        self,
+        global_ac: SensitiveAutomatonLoaderByDB | None,
+        custom: CustomContainer | None = None,
+        vip: CustomVipContainer | None = None,
+    ):
+        entries: Dict[str, Dict[HitSource, Any]] = {}
+
+        def _merge(loader: SensitiveAutomatonLoaderByDB | None, source: HitSource):
+            if not loader:
+                return
+            for word, tag_code in loader.items():
+                entries.setdefault(word, {})[source] = tag_code
+
+        _merge(global_ac, HitSource.GLOBAL)
+        if custom:
+            _merge(custom.black_ac, HitSource.CUSTOM_BLACK)
+        if vip:
+            _merge(vip.black_ac, HitSource.VIP_BLACK)
+            _merge(vip.white_ac, HitSource.VIP_WHITE)
+
+        white_set: Set[str] = (custom.white_ac if custom else None) or set()
+
+        tags: Dict[HitSource, Set[Any]] = {}
+        A = ahocorasick.Automaton()
+        for word, sources in entries.items():
+            A.add_word(word, (word, tuple(sources.items()), word in white_set))
+            for source, tag_code in sources.items():
+                tags.setdefault(source, set()).add(tag_code)
+        self.tag_counts = {source: len(codes) for source, codes in tags.items()}
+        if entries:
+            A.make_automaton()
+            self.automaton = A
+
+    def memory_size(self) -> int:
+        return estimate_automaton_size(self.automaton)
+
+    def scan(
+        self,
+        text: str,
+        sources: int = HitSource.GLOBAL,
+        use_white: bool = False,
+        mode: ScanMode = ScanMode.ALL,
+    ) -> Dict[HitSource, Dict[str, List[str]]]:
+        """
+        单次遍历返回 {source: {tag_code: [word, ...]}}
+        :param sources: 本次请求启用的来源（HitSource 按位或）
+        :param use_white: 是否应用租户白名单
+        :param mode: 扫描模式，COUNT 请使用 scan_counts
+        """
+        if not self.automaton:
+            return {}
+        if mode is ScanMode.LONGEST:
+            return self.collect(self.automaton.iter_long(text), sources, use_white)
+        tag_total = 0
+        if mode is ScanMode.ANY:
+            tag_total = sum(
+                count for source, count in self.tag_counts.items() if source & sources
+            )
+        return self.collect(
+            self.automaton.iter(text), sources, use_white, mode, tag_total
+        )
+
+    @staticmethod
+    def collect(
+        matches,
+        sources: int,
+        use_white: bool,
+        mode: ScanMode = ScanMode.ALL,
+        tag_total: int = 0,
+    ) -> Dict[HitSource, Dict[str, List[str]]]:
+        """将自动机命中按来源与标签归类"""
+        results: Dict[HitSource, Dict[str, List[str]]] = {}
+        any_mode = mode is ScanMode.ANY
+        first_mode = mode is ScanMode.FIRST
+        seen = 0
+        for _, (word, hits, whitelisted) in matches:
+            for source, tag_code in hits:
+                if not source & sources:
+                    continue
+                if whitelisted and use_white and source & WHITE_SCOPE:
+                    continue
+                contains = results.setdefault(source, {})
+                if tag_code not in contains:
+                    contains[tag_code] = []
+                words = contains[tag_code]
+                if len(word) > 1:
+                    if any_mode:
+                        if words:
+                            continue
+                        seen += 1
+                    words.append(word)
+                    if first_mode:
+                        return results
+            if any_mode and seen >= tag_total:
+                break
+        return results
+
+    def scan_counts(
+        self, text: str, sources: int = HitSource.GLOBAL, use_white: bool = False
+    ) -> Dict[HitSource, Dict[str, Dict[str, dict]]]:
+        """
+        去重计数：{source: {tag_code: {word: {"count": n, "spans": [[start, end), ...]}}}}
+        位置基于扫描文本（归一化后）的字符下标
+        """
+        results: Dict[HitSource, Dict[str, Dict[str, dict]]] = {}
+        if not self.automaton:
+            return results
+        for end, (word, hits, whitelisted) in self.automaton.iter(text):
+            if len(word) <= 1:
+                continue
+            span = (end - len(word) + 1, end + 1)
+            for source, tag_code in hits:
+                if not source & sources:
+                    continue
+                if whitelisted and use_white and source & WHITE_SCOPE:
+                    continue
+                words = results.setdefault(source, {}).setdefault(tag_code, {})
+                entry = words.get(word)
+                if entry is None:
+                    entry = words[word] = {"count": 0, "spans": []}
+                entry["count"] += 1
+                entry["spans"].append(span)
+        return results
+
+    def scan_detail(
+        self,
+        text: str,
+        sources: int = HitSource.GLOBAL,
+        use_white: bool = False,
+        mode: ScanMode = ScanMode.ALL,
+    ) -> Tuple[Dict[HitSource, Dict[str, List[str]]], Dict[HitSource, dict]]:
+        """按模式扫描，返回 (命中结果, 计数明细)；仅 COUNT 模式有计数明细"""
+        if mode is not ScanMode.COUNT:
+            return self.scan(text, sources, use_white, mode), {}
+        counts = self.scan_counts(text, sources, use_white)
+        result = {
+            source: {tag_code: list(words) for tag_code, words in contains.items()}
+            for source, contains in counts.items()
+        }
+        return result, counts
+
+    def scan_batch(
+        self,
+        texts: List[str],
+        sources: int = HitSource.GLOBAL,
+        use_white: bool = False,
+        mode: ScanMode = ScanMode.ALL,
+    ) -> List[Tuple[Dict[HitSource, Dict[str, List[str]]], Dict[HitSource, dict]]]:
+        return [self.scan_detail(text, sources, use_white, mode) for text in texts]
+
+
+class EffectiveStreamScanner:
+    """
+    流式增量扫描：在分块之间保留自动机状态（AutomatonSearchIter.set(chunk, reset=False)），
+    跨分块的关键词照常命中，已扫描的内容不会重复扫描
+    """
+
+    def __init__(
+        self,
+        effective_ac: EffectiveAutomatonLoader | None,
+        sources: int = HitSource.GLOBAL,
+        use_white: bool = False,
+    ) -> None:
+        self.sources = sources
+        self.use_white = use_white
+        self.scanned_chars = 0
+        self._iter = (
+            effective_ac.automaton.iter("")
+            if effective_ac and effective_ac.automaton
+            else None
+        )
 
+    def feed(self, chunk: str) -> Dict[HitSource, Dict[str, List[str]]]:
+        """返回结束位置落在本分块内的命中"""
+        self.scanned_chars += len(chunk)
+        if self._iter is None or not chunk:
+            return {}
+        self._iter.set(chunk, False)
+        return EffectiveAutomatonLoader.collect(self._iter, self.sources, self.use_white)
@@ -1,27 +1,63 @@
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
-from typing import Any, Dict, List, Union
+from contextvars import ContextVar
+from dataclasses import replace
+from weakref import WeakValueDictionary
+from typing import Any, AsyncIterable, Dict, Iterable, List, Tuple, Union
 from utils import SingleTon, run_in_async
 from tools.db_tools import DBConnectTool
 from .ac_tool import SensitiveAutomatonLoaderByDB
 import asyncio
-from .ac_tool import CustomContainer, CustomVipContainer
+from .tenant_cache import TenantCache
+from .tenant_loader import TenantLoader
+from .decision_table import DecisionTable, compile_decision_table, validate_coverage
+from .ac_tool import (
+    CustomContainer,
+    CustomVipContainer,
+    DataSnapshot,
+    EffectiveAutomatonLoader,
+)
 from models import DecisionClassifyEnum, RuleGlobalDefaults
-import pandas as pd
 from sanic.log import logger
 from utils import Promise
 from models import DECISION_MAPPING, ScenarioKeywords
 from config.data_source_config import get_data_source_config
+from config import Config
 
-_APP_LOCKS: Dict[str, asyncio.Lock] = {}
-_GLOBAL_LOCK = asyncio.Lock()
+# 弱引用：没有协程持有时锁随之回收，不随 app_id 增长常驻
+_APP_LOCKS: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+# 租户级数据在快照上的字段
+TENANT_FIELDS = ("custom_ac", "custom_vip", "effective_ac", "decision_tables")
+
+
+class _Pin:
+    """请求级固定的快照，以及本请求已读取的租户级数据（租户容器、生效词典、决策表）"""
+
+    __slots__ = ("provider", "snapshot", "tenants")
+
+    def __init__(self, provider: Any, snapshot: DataSnapshot) -> None:
+        self.provider = provider
+        self.snapshot = snapshot
+        # (字段, app_id) -> 对象；之后的淘汰或按需加载不影响本请求已读到的数据
+        self.tenants: Dict[Tuple[str, str], Any] = {}
+
+
+# 见 DataProvider.pin；_Pin 为可变对象，派生的子任务共享同一实例
+_PINNED_SNAPSHOT: ContextVar[_Pin | None] = ContextVar(
+    "pinned_data_snapshot", default=None
+)
 
 
 async def get_lock_by_app_id(app_id: str) -> asyncio.Lock:
-    if app_id not in _APP_LOCKS:
-        async with _GLOBAL_LOCK:
-            if app_id not in _APP_LOCKS:
-                _APP_LOCKS[app_id] = asyncio.Lock()
-    return _APP_LOCKS[app_id]
+    lock = _APP_LOCKS.get(app_id)
+    if lock is None:
+        lock = _APP_LOCKS[app_id] = asyncio.Lock()
+    return lock
 
 
 class DataProvider(metaclass=SingleTon):
@@ -42,46 +78,260 @@ class DataProvider(metaclass=SingleTon):
             # 为了兼容性，也设置db_tool属性
             self.db_tool = data_loader if isinstance(data_loader, DBConnectTool) else None
 
-        self._global_ac: SensitiveAutomatonLoaderByDB | None = None
+        # 当前发布的数据快照；热更新时整体替换引用，不原地修改
+        self._snapshot: DataSnapshot = DataSnapshot(
+            global_rules={}, custom_ac={}, custom_vip={}
+        )
+
+        self._app_super_rules: Dict[str, Dict[str, str]] = defaultdict(dict)
 
-        self._custom_ac: Dict[str, CustomContainer] = {}
+        # 是否已在主进程预加载（fork 模式下 worker 直接继承）
+        self.preloaded: bool = False
 
-        self._vip: Dict[str, CustomVipContainer] = {}
+        # 无租户数据时共用的通用生效词典，同一代只构建一次
+        self._global_effective_lock = asyncio.Lock()
 
-        self._app_super_rules: Dict[str, Dict[str, str]] = defaultdict(dict)
-        self._global_rules: Dict[str, DecisionClassifyEnum] = {}
+        # 租户容器内存预算与 LRU 淘汰（通用词典不参与）
+        self.tenant_cache = TenantCache(
+            Config.TENANT_CACHE_BUDGET_MB * 1024 * 1024, Config.TENANT_CACHE_MIN_IDLE
+        )
+
+        # 租户按需加载：并发合并与无数据租户的负缓存
+        self.tenant_loader = TenantLoader(
+            Config.TENANT_NEGATIVE_TTL, Config.TENANT_ERROR_TTL
+        )
+
+        # 全量加载期间的租户构建调度器与最近一次各租户构建耗时
+        self.build_scheduler: TenantBuildScheduler | None = None
+        self.build_report: List[dict] = []
+
+    @classmethod
+    def staging(cls, data_loader) -> "DataProvider":
+        """绕过单例创建暂存实例，用于离线构建新数据后整体替换"""
+        instance = object.__new__(cls)
+        instance.__init__(data_loader)
+        return instance
+
+    def _pinned(self) -> _Pin | None:
+        pin = _PINNED_SNAPSHOT.get()
+        if pin is not None and pin.provider is self:
+            return pin
+        return None
+
+    @property
+    def current(self) -> DataSnapshot:
+        """当前请求读取的快照：已通过 pin 固定时返回固定的版本，否则返回最新发布的版本"""
+        pin = self._pinned()
+        if pin is not None:
+            return pin.snapshot
+        return self._snapshot
+
+    def pin(self) -> DataSnapshot:
+        """
+        固定当前快照到本请求上下文（contextvars，派生的子任务自动继承），
+        请求处理期间发布的新快照不影响本请求，扫描与决策读取同一版本的数据
+        """
+        snapshot = self._snapshot
+        _PINNED_SNAPSHOT.set(_Pin(self, snapshot))
+        return snapshot
+
+    def publish(self, snapshot: DataSnapshot):
+        """发布新一代数据：单次引用替换，租户记账与负缓存随之重置"""
+        self._snapshot = replace(snapshot, generation=object())
+        self.tenant_cache.reset(self._snapshot)
+        self.tenant_loader.reset()
+
+    def _read(self, field: str, app_id: str):
+        """
+        读取租户级数据：本请求已读过的直接返回；固定的快照中没有时，
+        再查同一代的最新快照（其他请求按需加载或构建的结果），读到后记入本请求
+        """
+        pin = self._pinned()
+        if pin is not None and (field, app_id) in pin.tenants:
+            return pin.tenants[(field, app_id)]
+        snapshot = self.current
+        value = (getattr(snapshot, field) or {}).get(app_id)
+        latest = self._snapshot
+        if value is None and latest is not snapshot and latest.generation is snapshot.generation:
+            value = (getattr(latest, field) or {}).get(app_id)
+        if value is not None and pin is not None:
+            pin.tenants[(field, app_id)] = value
+        return value
+
+    def _remember(self, field: str, app_id: str, value: Any):
+        pin = self._pinned()
+        if pin is not None:
+            pin.tenants[(field, app_id)] = value
+
+    def _write(self, base: DataSnapshot, app_id: str, **values) -> bool:
+        """
+        写时复制：在最新快照上复制相应字典、写入（值为 None 时删除）后替换引用，已发布的快照不被修改。
+        base 与最新快照不属于同一代（期间已热更新）时不写入，返回 False
+        """
+        latest = self._snapshot
+        if latest.generation is not base.generation:
+            return False
+        changes = {}
+        for field, value in values.items():
+            table = dict(getattr(latest, field) or {})
+            if value is None:
+                table.pop(app_id, None)
+            else:
+                table[app_id] = value
+            changes[field] = table
+        self._snapshot = replace(latest, **changes)
+        return True
+
+    def _account(self, app_id: str):
+        """租户数据写入最新快照后记账，超出预算时淘汰"""
+        self._evict_tenants(self.tenant_cache.account(self._snapshot, app_id))
+
+    def _evict_tenants(self, app_ids: List[str]):
+        """写时复制发布不含这些租户的快照；固定旧快照或已读取过这些租户的请求不受影响"""
+        if not app_ids:
+            return
+        latest = self._snapshot
+        evicted = set(app_ids)
+        self._snapshot = replace(
+            latest,
+            **{
+                field: {
+                    app_id: value
+                    for app_id, value in (getattr(latest, field) or {}).items()
+                    if app_id not in evicted
+                }
+                for field in TENANT_FIELDS
+            },
+        )
+
+    def sweep_tenants(self):
+        """按内存预算淘汰闲置租户并清理过期负缓存，由后台轮询周期性调用"""
+        self._evict_tenants(self.tenant_cache.sweep())
+        self.tenant_loader.prune()
+
+    def _publish_with(self, **changes):
+        # 整体加载阶段的逐项赋值同样走写时复制，生效词典缓存随之失效
+        self.publish(
+            replace(
+                self._snapshot,
+                effective_ac={},
+                global_effective=None,
+                decision_tables={},
+                **changes,
+            )
+        )
+
+    @property
+    def data_version(self) -> str:
+        """当前数据版本（FILE 模式为文件 mtime 摘要，DB 模式为表版本摘要）"""
+        return self.current.data_version
+
+    @data_version.setter
+    def data_version(self, version: str):
+        self.publish(replace(self._snapshot, data_version=version))
 
     @property
     def global_rules(self):
-        return self._global_rules
+        return self.current.global_rules
 
     @global_rules.setter
     def global_rules(self, rules):
-        self._global_rules = rules
+        self.publish(replace(self._snapshot, global_rules=rules))
 
     @property
     def custom_vip(self):
-        return self._vip
+        return self.current.custom_vip
 
     @custom_vip.setter
     def custom_vip(self, vip):
-        self._vip = vip
+        self._publish_with(custom_vip=vip)
 
     @property
     def custom_ac(self):
-        return self._custom_ac
+        return self.current.custom_ac
 
     @custom_ac.setter
     def custom_ac(self, ac):
-        self._custom_ac = ac
+        self._publish_with(custom_ac=ac)
 
     @property
     def global_ac(self):
-        return self._global_ac
+        return self.current.global_ac
 
     @global_ac.setter
     def global_ac(self, ac):
-        self._global_ac = ac
+        # 通用词变化后所有生效词典都需重建
+        self._publish_with(global_ac=ac)
+
+    @staticmethod
+    def _has_tenant_words(custom: CustomContainer | None, vip: CustomVipContainer | None) -> bool:
+        return bool(
+            (custom and (custom.black_ac or custom.white_ac))
+            or (vip and (vip.black_ac or vip.white_ac))
+        )
+
+    async def get_effective_ac(self, app_id: str) -> EffectiveAutomatonLoader | None:
+        """获取租户生效词典，首次访问时合并构建"""
+        effective = self._read("effective_ac", app_id)
+        if effective:
+            self.tenant_cache.hit(app_id)
+            return effective
+
+        self.tenant_cache.miss()
+        snapshot = self.current
+        custom, vip = await asyncio.gather(
+            self.load_tenant("customize", app_id), self.load_tenant("vip", app_id)
+        )
+
+        if not self._has_tenant_words(custom, vip):
+            # 无租户词的 app_id 不按 app_id 缓存、不记账，由 tenant_loader 负缓存兜底
+            return await self._get_global_effective(snapshot)
+
+        app_id_lock: asyncio.Lock = await get_lock_by_app_id(app_id)
+        async with app_id_lock:
+            effective = self._read("effective_ac", app_id)
+            if effective is None:
+                effective = EffectiveAutomatonLoader()
+                await run_in_async(effective.load_sources, snapshot.global_ac, custom, vip)
+                self._remember("effective_ac", app_id, effective)
+                if self._write(snapshot, app_id, effective_ac=effective):
+                    self._account(app_id)
+        return effective
+
+    def _latest_of(self, snapshot: DataSnapshot) -> DataSnapshot:
+        """同一代的最新快照（含其他请求写入的运行期缓存），已热更新时返回 snapshot 本身"""
+        latest = self._snapshot
+        return latest if latest.generation is snapshot.generation else snapshot
+
+    async def _get_global_effective(self, snapshot: DataSnapshot) -> EffectiveAutomatonLoader | None:
+        """无租户数据时共用的通用生效词典：同一代只构建一次，并发的首次请求等待同一次构建"""
+        effective = snapshot.global_effective or self._latest_of(snapshot).global_effective
+        if effective is not None or not snapshot.global_ac:
+            return effective
+        async with self._global_effective_lock:
+            effective = self._latest_of(snapshot).global_effective
+            if effective is None:
+                effective = EffectiveAutomatonLoader()
+                await run_in_async(effective.load_sources, snapshot.global_ac)
+                if self._snapshot.generation is snapshot.generation:
+                    self._snapshot = replace(self._snapshot, global_effective=effective)
+        return effective
+
+    def export_snapshot(self) -> DataSnapshot:
+        return self._snapshot
+
+    def apply_snapshot(self, snapshot: DataSnapshot):
+        self.publish(
+            DataSnapshot(
+                data_version=snapshot.data_version,
+                global_ac=snapshot.global_ac,
+                global_rules=snapshot.global_rules or {},
+                custom_ac=snapshot.custom_ac or {},
+                custom_vip=snapshot.custom_vip or {},
+                # 暂存实例上已编译的决策表随数据一起替换
+                decision_tables=snapshot.decision_tables,
+            )
+        )
 
     async def init_all_data(self):
         promise = Promise()
@@ -97,70 +347,240 @@ class DataProvider(metaclass=SingleTon):
             except Exception as e:
                 logger.error(f"{str(e)}")
 
+    @staticmethod
+    def _tenant_field(kind: str) -> str:
+        match kind:
+            case "customize":
+                return "custom_ac"
+            case "vip":
+                return "custom_vip"
+            case _:
+                raise Exception("NO_MATCHED_AC_TYPE_ERROR")
+
+    @classmethod
+    def _tenant_containers(cls, snapshot: DataSnapshot, kind: str) -> Dict[str, Any]:
+        return getattr(snapshot, cls._tenant_field(kind))
+
+    def get_tenant(self, kind: str, app_id: str):
+        """只读查找已加载的租户容器（kind 为 customize / vip），未加载返回 None"""
+        return self._read(self._tenant_field(kind), app_id)
+
+    async def load_tenant(self, kind: str, app_id: str):
+        """
+        获取租户容器，未加载时按需加载。
+        已加载时只做一次字典读取，不加锁、不让出事件循环；
+        未命中时经 tenant_loader 合并并发加载，无数据的租户在 TTL 内直接返回 None；
+        加载失败抛出 DATA_LOAD_ERROR，不按无数据回退到通用词典。
+        """
+        container = self.get_tenant(kind, app_id)
+        if container is not None or not app_id:
+            return container
+        self.tenant_loader.raise_if_failed(kind, app_id)
+        if self.tenant_loader.is_negative(kind, app_id):
+            return None
+        snapshot = self.current
+        container = await self.tenant_loader.load(
+            kind, app_id, snapshot.generation, lambda: self._load_tenant(snapshot, kind, app_id)
+        )
+        if container is not None:
+            self._remember(self._tenant_field(kind), app_id, container)
+        return container
+
+    async def _load_tenant(self, snapshot: DataSnapshot, kind: str, app_id: str):
+        """从数据源构建租户容器并写入同一代的最新快照；租户无数据时返回 None"""
+        if kind == "customize":
+            black_list, white_list = await self.data_loader.load_custom_words(app_id)
+            custom_rule_list = await self.data_loader.load_custom_rule(app_id)
+            if not (black_list or white_list or custom_rule_list):
+                return None
+            container = CustomContainer()
+            if black_list:
+                ac = SensitiveAutomatonLoaderByDB()
+                await run_in_async(ac.load_keywords, black_list)
+                container.black_ac = ac
+            if white_list:
+                container.white_ac = set([_.keyword for _ in white_list])
+            if custom_rule_list:
+                container.custom_rule = custom_rule_list
+        else:
+            (
+                vip_black_words,
+                vip_black_rules,
+                vip_white_words,
+                vip_white_rules,
+            ) = await self.data_loader.load_vip_scenario_by_app_id(app_id)
+            if not (vip_black_words or vip_black_rules or vip_white_words or vip_white_rules):
+                return None
+            container = CustomVipContainer()
+            if vip_black_words:
+                ac = SensitiveAutomatonLoaderByDB()
+                await run_in_async(ac.load_keywords, vip_black_words)
+                container.black_ac = ac
+            if vip_black_rules:
+                container.black_rule = vip_black_rules
+            if vip_white_rules:
+                container.white_rule = vip_white_rules
+            if vip_white_words:
+                ac = SensitiveAutomatonLoaderByDB()
+                await run_in_async(ac.load_keywords, vip_white_words)
+                container.white_ac = ac
+        container.loaded = True
+        # 写时复制写入最新快照，并使该租户的生效词典与决策表失效；
+        # 加载期间已热更新（不再是同一代）时结果只返回给等待方，不写入新一代快照
+        if self._write(
+            snapshot,
+            app_id,
+            **{self._tenant_field(kind): container, "effective_ac": None, "decision_tables": None},
+        ):
+            self._account(app_id)
+        return container
+
+    def get_decision_table(self, app_id: str = "") -> DecisionTable:
+        """
+        获取决策表：app_id 为空时为通用规则表，否则为叠加租户自定义规则后的表；
+        首次访问时编译并以写时复制缓存到最新快照，无自定义规则的租户直接复用通用规则表
+        """
+        table = self._read("decision_tables", app_id)
+        if table is not None:
+            return table
+        snapshot = self.current
+        custom = self.get_tenant("customize", app_id) if app_id else None
+        if custom and custom.custom_rule:
+            table = compile_decision_table(snapshot.global_rules, custom.custom_rule)
+        elif app_id:
+            table = self.get_decision_table("")
+        else:
+            table = compile_decision_table(snapshot.global_rules)
+        self._remember("decision_tables", app_id, table)
+        self._write(snapshot, app_id, decision_tables=table)
+        return table
+
+    async def compile_rules(self):
+        """加载或热更新发布快照后调用：预编译通用与各租户决策表，并校验词典标签的规则覆盖"""
+        snapshot = self._snapshot
+        tables = await run_in_async(self._compile_rules, snapshot)
+        latest = self._snapshot
+        if latest.generation is snapshot.generation:
+            self._snapshot = replace(
+                latest, decision_tables={**(latest.decision_tables or {}), **tables}
+            )
+
+    @staticmethod
+    def _compile_rules(snapshot: DataSnapshot) -> Dict[str, DecisionTable]:
+        start = time.perf_counter_ns()
+        global_table = compile_decision_table(snapshot.global_rules)
+        tables: Dict[str, DecisionTable] = {"": global_table}
+        global_tags = snapshot.global_ac.tag_codes() if snapshot.global_ac else set()
+        missing = len(validate_coverage(global_table, global_tags))
+        for app_id, custom in (snapshot.custom_ac or {}).items():
+            table = global_table
+            if custom.custom_rule:
+                table = tables[app_id] = compile_decision_table(
+                    snapshot.global_rules, custom.custom_rule
+                )
+            if custom.black_ac:
+                tags = custom.black_ac.tag_codes() - global_tags
+                missing += len(validate_coverage(table, tags, app_id))
+        logger.info(
+            f"decision tables compiled: tables={len(tables)} missing={missing} "
+            f"cost={(time.perf_counter_ns() - start) / 1e6:.1f} ms"
+        )
+        return tables
+
     async def build_ac(self, ac_type: str, app_id: str = ""):
 
         match ac_type:
             case "global":
-                data = await self.data_loader.load_global_words()
-                self.global_ac = SensitiveAutomatonLoaderByDB()
-                await run_in_async(self.global_ac.load_keywords, data)
-            case "customize":
-                app_id_lock: asyncio.Lock = await get_lock_by_app_id(app_id)
-                async with app_id_lock:
-                    if app_id and app_id not in self.custom_ac:
-                        custom_container = CustomContainer()
-                        black_list, white_list = await self.data_loader.load_custom_words(
-                            app_id
-                        )
-                        if black_list:
-                            ac = SensitiveAutomatonLoaderByDB()
-                            await run_in_async(ac.load_keywords, black_list)
-                            custom_container.black_ac = ac
-                        if white_list:
-                            custom_container.white_ac = set(
-                                [_.keyword for _ in white_list]
-                            )
-
-                        custom_rule_list = await self.data_loader.load_custom_rule(app_id)
-                        if custom_rule_list:
-                            custom_container.custom_rule = custom_rule_list
-
-                        custom_container.loaded = True
-                        self.custom_ac[app_id] = custom_container
-
-            case "vip":
-                app_id_lock: asyncio.Lock = await get_lock_by_app_id(app_id)
-                async with app_id_lock:
-                    if app_id and app_id not in self.custom_vip:
-                        (
-                            vip_black_words,
-                            vip_black_rules,
-                            vip_white_words,
-                            vip_white_rules,
-                        ) = await self.data_loader.load_vip_scenario_by_app_id(app_id)
-                        vip_container = CustomVipContainer()
-                        if vip_black_words:
-                            ac = SensitiveAutomatonLoaderByDB()
-                            await run_in_async(ac.load_keywords, vip_black_words)
-                            vip_container.black_ac = ac
-                        if vip_black_rules:
-                            vip_container.black_rule = vip_black_rules
-                        if vip_white_rules:
-                            vip_container.white_rule = vip_white_rules
-                        if vip_white_words:
-                            ac = SensitiveAutomatonLoaderByDB()
-                            await run_in_async(ac.load_keywords, vip_black_words)
-                            vip_container.white_ac = ac
-                        vip_container.loaded = True
-                        self.custom_vip[app_id] = vip_container
+                self.global_ac = await stream_global_ac(self.data_loader)
+            case "customize" | "vip":
+                await self.load_tenant(ac_type, app_id)
             case _:
                 raise Exception("NO_MATCHED_AC_TYPE_ERROR")
 
 
+def build_custom_container(word_rows: List, rule_rows: List) -> CustomContainer:
+    """
+    由单个租户的自定义词行 (scenario_id, keyword, tag_code, category, risk_level)
+    与规则行 (scenario_id, rule_key, strategy) 构建容器，口径与 load_custom_words 一致
+    """
+    container = CustomContainer()
+    black_list = []
+    white_list = []
+    for row in word_rows:
+        keyword, tag_code, category = row[1], row[2], row[3]
+        # 与全量加载一致：过滤 tag_code 为空的词
+        if not (tag_code or "").strip():
+            continue
+        if category == 1:
+            black_list.append((keyword, tag_code))
+        elif category == 0:
+            white_list.append(keyword)
+    if black_list:
+        ac = SensitiveAutomatonLoaderByDB()
+        ac.load_keywords(black_list)
+        container.black_ac = ac
+    if white_list:
+        container.white_ac = set(white_list)
+    custom_rule = {}
+    for row in rule_rows:
+        decision = DECISION_MAPPING.get(str(row[2]).upper())
+        if decision is not None:
+            custom_rule[row[1]] = decision
+    if custom_rule:
+        container.custom_rule = custom_rule
+    container.loaded = True
+    return container
+
+
+def build_vip_container(vip_rows: List) -> CustomVipContainer:
+    """
+    由单个租户的超黑超白行 (scenario_id, match_value, extra_condition, strategy, match_type) 构建容器：
+    KEYWORD 按策略分入超白/超黑词典，TAG 按策略分入超黑/超白规则
+    """
+    container = CustomVipContainer()
+    black_words = []
+    white_words = []
+    black_rule = {}
+    white_rule = {}
+    for row in vip_rows:
+        match_value, extra_condition, strategy, match_type = row[1], row[2], row[3], row[4]
+        decision = DECISION_MAPPING.get(str(strategy).upper())
+        if match_type == "KEYWORD":
+            if decision == DecisionClassifyEnum.PASS:
+                white_words.append((match_value, extra_condition))
+            else:
+                black_words.append((match_value, extra_condition))
+        elif match_type == "TAG":
+            rule_key = f"{match_value}-{extra_condition or ''}"
+            if decision == DecisionClassifyEnum.REJECT:
+                black_rule[rule_key] = decision
+            elif decision == DecisionClassifyEnum.PASS:
+                white_rule[rule_key] = decision
+    if black_words:
+        ac = SensitiveAutomatonLoaderByDB()
+        ac.load_keywords(black_words)
+        container.black_ac = ac
+    if white_words:
+        ac = SensitiveAutomatonLoaderByDB()
+        ac.load_keywords(white_words)
+        container.white_ac = ac
+    container.black_rule = black_rule or None
+    container.white_rule = white_rule or None
+    container.loaded = True
+    return container
+
+
+async def stream_global_ac(data_loader) -> SensitiveAutomatonLoaderByDB:
+    """流式读取通用词，逐批加入自动机，不保留整表行"""
+    global_ac = SensitiveAutomatonLoaderByDB()
+    async for batch in data_loader.iter_global_words(Config.DB_STREAM_BATCH_SIZE):
+        await run_in_async(global_ac.add_keywords, batch)
+    await run_in_async(global_ac.finish)
+    return global_ac
+
+
 async def load_global_words(ctx: DataProvider):
-    data = await ctx.data_loader.load_global_words()
-    ctx.global_ac = SensitiveAutomatonLoaderByDB()
-    await run_in_async(ctx.global_ac.load_keywords, data)
+    ctx.global_ac = await stream_global_ac(ctx.data_loader)
     logger.info("global sensitive words loaded success!")
 
 
@@ -170,135 +590,190 @@ async def load_global_rules(ctx: DataProvider):
     
 
 
-async def load_custom_words(ctx: DataProvider):
-    result_words = await ctx.data_loader.load_all_custom_words()
-    result_rules = await ctx.data_loader.load_all_custom_rules()
-    df_words = pd.DataFrame(
-        result_words,
-        columns=["scenario_id", "keyword", "tag_code", "category", "risk_level"],
-    )
-
-    df_rules = pd.DataFrame(
-        result_rules,
-        columns=[
-            "scenario_id",
-            "rule_key",
-            "strategy",
-        ],
-    )
-
-    df_rules["strategy"] = df_rules["strategy"].str.upper().map(DECISION_MAPPING)
-
-    # Filter out empty tag_code
-    df_words = df_words[df_words["tag_code"].fillna("").str.strip() != ""]
-
-    all_app_ids = set(df_words["scenario_id"].unique()) | set(
-        df_rules["scenario_id"].unique()
-    )
-    words_grouped = df_words.groupby("scenario_id")
-    rules_grouped = df_rules.groupby("scenario_id")
-    for app_id in all_app_ids:
-
-        if app_id not in ctx.custom_ac:
-            custom = CustomContainer()
-            ctx.custom_ac[app_id] = custom
-        if app_id in words_grouped.groups:
-            group = words_grouped.get_group(app_id)
-            _df = group[group["category"] == 1]
-            # Reconstruct ScenarioKeywords objects
-            black_list = [
-                ScenarioKeywords(keyword=row.keyword, tag_code=row.tag_code)
-                for row in _df.itertuples(index=False)
+def group_by_tenant(rows: Iterable, grouped: Dict[str, List] | None = None) -> Dict[str, List]:
+    """单次遍历按 scenario_id（首列）分桶，行对象原样保留不复制；传入 grouped 时追加到已有分桶"""
+    if grouped is None:
+        grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[0]].append(row)
+    return grouped
+
+
+async def stream_by_tenant(batches: AsyncIterable[List]) -> Dict[str, List]:
+    """流式读取并逐批分桶，不经过整表结果集"""
+    grouped: Dict[str, List] = defaultdict(list)
+    async for batch in batches:
+        group_by_tenant(batch, grouped)
+    return grouped
+
+
+def _peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _build_tenant(kind: str, app_id: str, *rows) -> Tuple[str, str, Any, float]:
+    """可在子进程中执行：构建单个租户容器，容器连同自动机经 pickle 传回"""
+    start = time.perf_counter_ns()
+    if kind == "customize":
+        container = build_custom_container(*rows)
+    else:
+        container = build_vip_container(*rows)
+    return kind, app_id, container, (time.perf_counter_ns() - start) / 1e6
+
+
+def _build_tenant_batch(batch: List[tuple]) -> List[Tuple[str, str, Any, float]]:
+    return [_build_tenant(kind, app_id, *rows) for kind, app_id, rows in batch]
+
+
+class TenantBuildScheduler:
+    """
+    启动期租户自动机构建调度。
+    make_automaton 持有 GIL，线程池无法并行；租户按行数从大到小提交到进程池，
+    先排最大的任务以缩短整体耗时，构建结果序列化传回主进程，并记录每个租户的构建耗时。
+    总行数低于 min_rows 时进程启动与序列化开销大于收益，退回线程池逐个构建。
+    """
+
+    def __init__(
+        self, max_workers: int = 0, min_rows: int = 0, start_method: str = "spawn"
+    ) -> None:
+        self.max_workers = max_workers or len(os.sched_getaffinity(0))
+        self.min_rows = min_rows
+        self.start_method = start_method
+        self.jobs: List[Tuple[str, str, tuple, int]] = []
+        self.report: List[dict] = []
+
+    def add(self, kind: str, app_id: str, *rows: List):
+        self.jobs.append((kind, app_id, rows, sum(map(len, rows))))
+
+    async def run(self) -> List[Tuple[str, str, Any, float]]:
+        jobs = sorted(self.jobs, key=lambda job: job[3], reverse=True)
+        self.jobs = []
+        total_rows = sum(job[3] for job in jobs)
+        parallel = (
+            self.max_workers > 1 and len(jobs) > 1 and total_rows >= self.min_rows
+        )
+        start = time.perf_counter_ns()
+        if parallel:
+            results = await self._run_in_processes(jobs)
+        else:
+            results = [
+                await run_in_async(_build_tenant, kind, app_id, *rows)
+                for kind, app_id, rows, _ in jobs
             ]
-            white_list = group[group["category"] == 0]["keyword"].tolist()
+        wall = (time.perf_counter_ns() - start) / 1e6
+
+        self.report = [
+            {"kind": kind, "app_id": app_id, "rows": size, "cost_ms": round(cost, 3)}
+            for (kind, app_id, _, size), (_, _, _, cost) in zip(jobs, results)
+        ]
+        for item in self.report:
+            logger.debug(f"tenant build {item}")
+        slowest = sorted(self.report, key=lambda item: item["cost_ms"], reverse=True)
+        logger.info(
+            f"tenant build: jobs={len(jobs)} rows={total_rows} "
+            f"workers={self.max_workers if parallel else 1} wall={wall:.1f} ms "
+            f"sum={sum(item['cost_ms'] for item in self.report):.1f} ms "
+            f"slowest={slowest[:5]}"
+        )
+        return results
 
-            if black_list:
-                ac = SensitiveAutomatonLoaderByDB()
-                await run_in_async(ac.load_keywords, black_list)
-                ctx.custom_ac[app_id].black_ac = ac
+    def _batches(self, jobs) -> List[List[tuple]]:
+        """
+        按行数从大到小切分批次：大租户单独成批，小租户合并到约 1/(8*进程数) 总行数，
+        减少进程间往返次数；行转为普通元组后传给子进程
+        """
+        target = max(sum(job[3] for job in jobs) // (self.max_workers * 8), 1)
+        batches: List[List[tuple]] = []
+        batch: List[tuple] = []
+        batch_rows = 0
+        for kind, app_id, rows, size in jobs:
+            batch.append((kind, app_id, tuple([tuple(row) for row in part] for part in rows)))
+            batch_rows += size
+            if batch_rows >= target:
+                batches.append(batch)
+                batch, batch_rows = [], 0
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _run_in_processes(self, jobs) -> List[Tuple[str, str, Any, float]]:
+        loop = asyncio.get_running_loop()
+        batches = self._batches(jobs)
+        pool = ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(batches)),
+            mp_context=multiprocessing.get_context(self.start_method),
+        )
+        try:
+            # 按提交顺序出队，大租户先开始构建
+            futures = [
+                loop.run_in_executor(pool, _build_tenant_batch, batch) for batch in batches
+            ]
+            return [result for batch in await asyncio.gather(*futures) for result in batch]
+        finally:
+            await run_in_async(pool.shutdown)
 
-            if white_list:
-                ctx.custom_ac[app_id].white_ac = set(white_list)
-        if app_id in rules_grouped.groups:
-            group = rules_grouped.get_group(app_id)
-            rules_dict = dict(zip(group["rule_key"], group["strategy"]))
-            ctx.custom_ac[app_id].custom_rule = rules_dict
-        ctx.custom_ac[app_id].loaded = True
-    logger.info("customs sensitive words loaded success!")
 
+async def load_custom_words(ctx: DataProvider):
+    batch_size = Config.DB_STREAM_BATCH_SIZE
+    words_by_tenant = await stream_by_tenant(ctx.data_loader.iter_all_custom_words(batch_size))
+    rules_by_tenant = await stream_by_tenant(ctx.data_loader.iter_all_custom_rules(batch_size))
+
+    for app_id in set(words_by_tenant) | set(rules_by_tenant):
+        # 分桶交给调度器后即从字典移除，构建完成随任务一起释放
+        ctx.build_scheduler.add(
+            "customize",
+            app_id,
+            words_by_tenant.pop(app_id, []),
+            rules_by_tenant.pop(app_id, []),
+        )
 
 
 async def load_custom_words_else(ctx: DataProvider):
-    vip_data = await ctx.data_loader.load_all_vip()
-
-    vip_df = pd.DataFrame(
-        vip_data,
-        columns=[
-            "scenario_id",
-            "match_value",
-            "extra_condition",
-            "strategy",
-            "match_type",
-        ],
+    vip_by_tenant = await stream_by_tenant(
+        ctx.data_loader.iter_all_vip(Config.DB_STREAM_BATCH_SIZE)
     )
 
-    vip_words_df = vip_df[vip_df["match_type"] == "KEYWORD"]
-    vip_words_df["strategy"] = (
-        vip_words_df["strategy"].str.upper().map(DECISION_MAPPING)
-    )
+    for app_id in list(vip_by_tenant):
+        ctx.build_scheduler.add("vip", app_id, vip_by_tenant.pop(app_id))
 
-    vip_tag_df = vip_df[vip_df["match_type"] == "TAG"]
-    vip_tag_df["rule_key"] = (
-        vip_tag_df["match_value"].astype(str) + "-" + vip_tag_df["extra_condition"]
-    )
 
-    all_app_ids = set(vip_df["scenario_id"].unique())
-
-    words_grouped = vip_words_df.groupby("scenario_id")
-    rules_grouped = vip_tag_df.groupby("scenario_id")
-
-    for app_id in all_app_ids:
-        if app_id not in ctx.custom_vip:
-            custom_vip = CustomVipContainer()
-            ctx.custom_vip[app_id] = custom_vip
-        if app_id in rules_grouped:
-            group = rules_grouped.get_group(app_id)
-            if not group.empty:
-                _df = group[group["strategy"] == DecisionClassifyEnum.REJECT]
-                if not _df.empty:
-                    rules_dict = dict(zip(_df["rule_key"], _df["strategy"]))
-                    ctx.custom_vip[app_id].black_rule = rules_dict
-                _df = group[group["strategy"] == DecisionClassifyEnum.PASS]
-                if not _df.empty:
-                    rules_dict = dict(zip(_df["rule_key"], _df["strategy"]))
-                    ctx.custom_vip[app_id].white_rule = rules_dict
-        if app_id in words_grouped:
-            group = words_grouped.get_group(app_id)
-            if not group.empty:
-                _df = group[group["strategy"] == DecisionClassifyEnum.PASS]
-                if not _df.empty:
-                    white_list = list(zip(_df["match_value"], _df["extra_condition"]))
-                    if white_list:
-                        ac = SensitiveAutomatonLoaderByDB()
-                        await run_in_async(ac.load_keywords, white_list)
-                        ctx.custom_vip[app_id].white_ac = ac
-                _df = group[group["strategy"] != DecisionClassifyEnum.PASS]
-                if not _df.empty:
-                    black_list = list(zip(_df["match_value"], _df["extra_condition"]))
-                    if black_list:
-                        ac = SensitiveAutomatonLoaderByDB()
-                        await run_in_async(ac.load_keywords, black_list)
-                        ctx.custom_vip[app_id].black_ac = ac
-
-        ctx.custom_vip[app_id].loaded = True
+async def build_tenants(ctx: DataProvider):
+    # 构建结果收集到新字典后一次发布，已发布快照的字典保持不变
+    custom_ac, custom_vip = dict(ctx.custom_ac), dict(ctx.custom_vip)
+    for kind, app_id, container, _ in await ctx.build_scheduler.run():
+        if kind == "customize":
+            custom_ac[app_id] = container
+        else:
+            custom_vip[app_id] = container
+    ctx._publish_with(custom_ac=custom_ac, custom_vip=custom_vip)
+    logger.info(
+        f"customs sensitive words loaded success! tenants={len(custom_ac)} "
+        f"vip tenants={len(custom_vip)}"
+    )
 
 
 class DataInitPromise(Promise):
 
     def flow(self):
-        self.then(load_global_rules, load_global_words).then(
-            load_custom_words, load_custom_words_else
-        )
+        # 取数与通用词构建并发，租户分桶全部就绪后统一调度构建
+        self.then(
+            load_global_rules, load_global_words, load_custom_words, load_custom_words_else
+        ).then(build_tenants)
 
     async def run(self, ctx: DataProvider):
-        await self.execute(ctx)
+        start = time.perf_counter_ns()
+        rss_before = _peak_rss_mb()
+        ctx.build_scheduler = TenantBuildScheduler(
+            Config.BUILD_WORKERS, Config.BUILD_PARALLEL_MIN_ROWS, Config.BUILD_START_METHOD
+        )
+        try:
+            await self.execute(ctx)
+        finally:
+            ctx.build_report = ctx.build_scheduler.report
+            ctx.build_scheduler = None
+        rss_peak = _peak_rss_mb()
+        logger.info(
+            f"data init finished in {(time.perf_counter_ns() - start) / 1e6} ms, "
+            f"peak rss {rss_peak:.1f} MB (+{rss_peak - rss_before:.1f} MB during load)"
+        )
@@ -0,0 +1,59 @@
+"""
+决策表编译
+规则键为 "{tag_code}-{safety}"，加载时按 safety 拆分为 {safety: {tag_code: (决策值, 规则键)}}，
+租户自定义规则预先覆盖到通用规则之上，请求时按 guard 的 safety 取表、按命中标签逐个查表取最大值。
+标签与规则键统一 intern，自动机 payload 中的 tag_code 与表中键为同一对象，查表时比较走身份快路径。
+"""
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+from sanic.log import logger
+
+# {safety: {tag_code: (decision, label)}}
+DecisionTable = Dict[str, Dict[str, Tuple[int, str]]]
+
+
+def _split_label(label: str) -> Tuple[str, str] | None:
+    tag_code, sep, safety = label.rpartition("-")
+    if not sep or not tag_code:
+        return None
+    return sys.intern(tag_code), sys.intern(safety)
+
+
+def _merge(table: DecisionTable, rules: Dict[str, int] | None):
+    for label, decision in (rules or {}).items():
+        parts = _split_label(label)
+        if parts is None:
+            continue
+        tag_code, safety = parts
+        table.setdefault(safety, {})[tag_code] = (int(decision), sys.intern(label))
+
+
+def compile_decision_table(
+    global_rules: Dict[str, int] | None, custom_rule: Dict[str, int] | None = None
+) -> DecisionTable:
+    """通用规则在前，租户自定义规则覆盖同键"""
+    table: DecisionTable = {}
+    _merge(table, global_rules)
+    _merge(table, custom_rule)
+    return table
+
+
+def missing_rules(table: DecisionTable, tag_codes: Iterable[str]) -> List[str]:
+    """词典中出现、但在某个 safety 下没有规则的标签，返回缺失的规则键"""
+    missing = []
+    for tag_code in tag_codes:
+        for safety, rules in table.items():
+            if tag_code not in rules:
+                missing.append(f"{tag_code}-{safety}")
+    return missing
+
+
+def validate_coverage(table: DecisionTable, tag_codes: Iterable[str], scope: str = "global"):
+    missing = missing_rules(table, tag_codes)
+    if missing:
+        logger.warning(
+            f"decision table [{scope}] missing {len(missing)} rules, "
+            f"hits on them raise KEY_NOT_IN_RULE_ERROR: {missing[:20]}"
+        )
+    return missing
@@ -2,7 +2,9 @@
 文件数据加载器
 使用orjson进行高性能JSON解析，从文件系统加载数据
 """
+import hashlib
 import os
+from collections import defaultdict
 from typing import List, Dict, Any, Tuple
 import orjson
 from config.data_source_config import get_data_source_config
@@ -14,17 +16,43 @@ from models.db_meta import (
     RuleGlobalDefaults,
 )
 from models import DECISION_MAPPING, DecisionClassifyEnum
+from utils import run_in_async
+
+
+DATA_FILES = (
+    "global_keywords.json",
+    "meta_tags.json",
+    "scenario_keywords.json",
+    "scenario_policies.json",
+    "global_defaults.json",
+)
+
+
+class _CachedFile:
+    """单个数据文件的解析结果，文件 (mtime, size) 变化时整体失效"""
+
+    __slots__ = ("stamp", "models", "by_scenario")
+
+    def __init__(self, stamp: Tuple[int, int], models: list) -> None:
+        self.stamp = stamp
+        self.models = models
+        # scenario_id -> 模型列表，首次按租户查询时构建
+        self.by_scenario: Dict[str, list] | None = None
 
 
 class FileDataLoader:
     """文件数据加载器
 
-    从JSON文件加载数据，提供与DAO相同的接口
+    从JSON文件加载数据，提供与DAO相同的接口。
+    开启 file_use_cache 时各文件解析一次并按 scenario_id 建索引，
+    仅在文件 mtime/size 变化时重新解析，按租户查询为 O(1)。
     """
 
     def __init__(self):
         self.config = get_data_source_config()
         self.base_path = self.config.file_base_path
+        self.use_cache = self.config.file_use_cache
+        self._cache: Dict[str, _CachedFile] = {}
 
     def _read_json_file(self, filename: str) -> List[Dict[str, Any]]:
         """读取JSON文件并解析
@@ -70,15 +98,68 @@ class FileDataLoader:
             result.append(obj)
         return result
 
+    def _file_stamp(self, filename: str) -> Tuple[int, int] | None:
+        try:
+            stat = os.stat(os.path.join(self.base_path, filename))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _parse_file(self, filename: str, model_class, stamp: Tuple[int, int]) -> _CachedFile:
+        return _CachedFile(stamp, self._convert_to_model(self._read_json_file(filename), model_class))
+
+    @staticmethod
+    def _group_by_scenario(models: list) -> Dict[str, list]:
+        by_scenario: Dict[str, list] = defaultdict(list)
+        for model in models:
+            by_scenario[model.scenario_id].append(model)
+        return dict(by_scenario)
+
+    async def _get_cached(self, filename: str, model_class) -> _CachedFile | None:
+        stamp = self._file_stamp(filename)
+        if stamp is None:
+            self._cache.pop(filename, None)
+            return None
+        cached = self._cache.get(filename)
+        if cached is None or cached.stamp != stamp:
+            # 文件读取与解析放到线程池，不阻塞事件循环
+            cached = await run_in_async(self._parse_file, filename, model_class, stamp)
+            if self.use_cache:
+                self._cache[filename] = cached
+        return cached
+
+    async def _get_models(self, filename: str, model_class) -> list:
+        """文件全部模型对象；返回缓存列表本身，调用方不得修改"""
+        cached = await self._get_cached(filename, model_class)
+        return cached.models if cached else []
+
+    async def _get_models_by_scenario(self, filename: str, model_class, app_id: str) -> list:
+        cached = await self._get_cached(filename, model_class)
+        if cached is None:
+            return []
+        if cached.by_scenario is None:
+            cached.by_scenario = await run_in_async(self._group_by_scenario, cached.models)
+        return cached.by_scenario.get(app_id, [])
+
+    async def get_data_version(self) -> str:
+        """数据版本：各数据文件的 mtime 与大小摘要"""
+        stamps = []
+        for filename in DATA_FILES:
+            file_path = os.path.join(self.base_path, filename)
+            try:
+                stat = os.stat(file_path)
+                stamps.append((filename, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append((filename, 0, 0))
+        return hashlib.sha1(repr(stamps).encode("utf-8")).hexdigest()
+
     async def get_all_global_keywords(self) -> List[GlobalKeywords]:
         """获取所有全局关键词"""
-        data = self._read_json_file("global_keywords.json")
-        return self._convert_to_model(data, GlobalKeywords)
+        return list(await self._get_models("global_keywords.json", GlobalKeywords))
 
     async def get_all_scenario_keywords(self):
         """获取所有场景关键词，返回元组列表以兼容数据库模式"""
-        data = self._read_json_file("scenario_keywords.json")
-        models = self._convert_to_model(data, ScenarioKeywords)
+        models = await self._get_models("scenario_keywords.json", ScenarioKeywords)
         # 返回元组列表，与数据库模式的 Row 格式一致
         return [
             (m.scenario_id, m.keyword, m.tag_code, m.category, m.risk_level)
@@ -88,14 +169,14 @@ class FileDataLoader:
 
     async def get_scenario_keywords_by_appid(self, app_id: str) -> List[ScenarioKeywords]:
         """根据app_id获取场景关键词，返回 ORM 对象列表"""
-        data = self._read_json_file("scenario_keywords.json")
-        models = self._convert_to_model(data, ScenarioKeywords)
-        return [kw for kw in models if kw.scenario_id == app_id and kw.is_active]
+        models = await self._get_models_by_scenario(
+            "scenario_keywords.json", ScenarioKeywords, app_id
+        )
+        return [kw for kw in models if kw.is_active]
 
     async def get_all_scenario_policies(self):
         """获取所有场景策略，返回元组列表以兼容数据库模式"""
-        data = self._read_json_file("scenario_policies.json")
-        models = self._convert_to_model(data, RuleScenarioPolicy)
+        models = await self._get_models("scenario_policies.json", RuleScenarioPolicy)
         # 返回元组列表，与数据库模式的 Row 格式一致
         # rule 格式: match_value-extra_condition (如果 extra_condition 为空则只有 match_value)
         # 只返回 match_type == "TAG" 且 rule_mode == 1 的记录
@@ -111,38 +192,29 @@ class FileDataLoader:
 
     async def get_scenario_rule_by_appid(self, app_id: str) -> List[RuleScenarioPolicy]:
         """根据app_id获取场景规则，返回 ORM 对象列表"""
-        data = self._read_json_file("scenario_policies.json")
-        models = self._convert_to_model(data, RuleScenarioPolicy)
-        return [
-            policy
-            for policy in models
-            if policy.scenario_id == app_id and policy.is_active and policy.rule_mode == 1
-        ]
+        models = await self._get_models_by_scenario(
+            "scenario_policies.json", RuleScenarioPolicy, app_id
+        )
+        return [policy for policy in models if policy.is_active and policy.rule_mode == 1]
 
     async def get_vip_scenario_by_appid(self, app_id: str) -> List[RuleScenarioPolicy]:
         """根据app_id获取VIP场景规则，返回 ORM 对象列表"""
-        data = self._read_json_file("scenario_policies.json")
-        models = self._convert_to_model(data, RuleScenarioPolicy)
-        return [
-            policy
-            for policy in models
-            if policy.scenario_id == app_id and policy.is_active and policy.rule_mode == 0
-        ]
+        models = await self._get_models_by_scenario(
+            "scenario_policies.json", RuleScenarioPolicy, app_id
+        )
+        return [policy for policy in models if policy.is_active and policy.rule_mode == 0]
 
     async def get_all_global_defaults(self) -> List[RuleGlobalDefaults]:
         """获取所有全局默认规则"""
-        data = self._read_json_file("global_defaults.json")
-        return self._convert_to_model(data, RuleGlobalDefaults)
+        return list(await self._get_models("global_defaults.json", RuleGlobalDefaults))
 
     async def get_all_tags(self) -> List[MetaTags]:
         """获取所有标签"""
-        data = self._read_json_file("meta_tags.json")
-        return self._convert_to_model(data, MetaTags)
+        return list(await self._get_models("meta_tags.json", MetaTags))
 
     async def load_all_vip(self):
         """加载所有VIP规则，返回元组列表以兼容数据库模式"""
-        data = self._read_json_file("scenario_policies.json")
-        models = self._convert_to_model(data, RuleScenarioPolicy)
+        models = await self._get_models("scenario_policies.json", RuleScenarioPolicy)
         # 返回元组列表，与数据库模式的 Row 格式一致
         return [
             (
@@ -174,6 +246,28 @@ class FileDataLoader:
         """加载所有自定义敏感词（与DBConnectTool接口一致）"""
         return await self.get_all_scenario_keywords()
 
+    @staticmethod
+    async def _iter_batches(rows: list, batch_size: int):
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    async def iter_global_words(self, batch_size: int):
+        """按批读取全局敏感词（与DBConnectTool流式接口一致，文件已整体缓存，仅按批切分）"""
+        async for batch in self._iter_batches(await self.get_all_global_keywords(), batch_size):
+            yield batch
+
+    async def iter_all_custom_words(self, batch_size: int):
+        async for batch in self._iter_batches(await self.get_all_scenario_keywords(), batch_size):
+            yield batch
+
+    async def iter_all_custom_rules(self, batch_size: int):
+        async for batch in self._iter_batches(await self.get_all_scenario_policies(), batch_size):
+            yield batch
+
+    async def iter_all_vip(self, batch_size: int):
+        async for batch in self._iter_batches(await self.load_all_vip(), batch_size):
+            yield batch
+
     async def load_custom_words(self, app_id: str) -> Tuple[List[ScenarioKeywords], List[ScenarioKeywords]]:
         """加载指定app_id的自定义敏感词，返回黑名单和白名单
 
@@ -230,27 +324,21 @@ class FileDataLoader:
         vip_black_rules: Dict[str, DecisionClassifyEnum] = {}
         vip_white_rules: Dict[str, DecisionClassifyEnum] = {}
 
+        # 口径与全量加载 build_vip_container 一致：
+        # KEYWORD 非 PASS 即超黑，词条标签取 extra_condition；TAG 按 BLOCK/PASS 分入超黑/超白规则
         for row in result:
-            if row.match_type == "words" and row.strategy == "block":
-                vip_black_words.append(row.match_value)
-            elif row.match_type == "words" and row.strategy == "pass":
-                vip_white_words.append(row.match_value)
-            elif row.match_type == "rule" and row.strategy == "block":
-                vip_black_rules.update(
-                    {
-                        f"{row.match_value}-{row.extra_condition}": DECISION_MAPPING[
-                            row.strategy.upper()
-                        ]
-                    }
-                )
-            elif row.match_type == "rule" and row.strategy == "pass":
-                vip_white_rules.update(
-                    {
-                        f"{row.match_value}-{row.extra_condition}": DECISION_MAPPING[
-                            row.strategy.upper()
-                        ]
-                    }
-                )
+            decision = DECISION_MAPPING.get(str(row.strategy).upper())
+            if row.match_type == "KEYWORD":
+                if decision == DecisionClassifyEnum.PASS:
+                    vip_white_words.append((row.match_value, row.extra_condition))
+                else:
+                    vip_black_words.append((row.match_value, row.extra_condition))
+            elif row.match_type == "TAG":
+                rule_key = f"{row.match_value}-{row.extra_condition or ''}"
+                if decision == DecisionClassifyEnum.REJECT:
+                    vip_black_rules[rule_key] = decision
+                elif decision == DecisionClassifyEnum.PASS:
+                    vip_white_rules[rule_key] = decision
         return vip_black_words, vip_black_rules, vip_white_words, vip_white_rules
 
     async def fetch_full_data_package(self) -> dict:
@@ -0,0 +1,316 @@
+"""
+词典与规则热更新
+按数据版本（FILE 模式为文件 mtime 摘要，DB 模式为表更新时间与行数摘要）判断是否需要更新，
+版本变化时流式重新取数、按租户摘要比对，只在线程池中重建变化的租户与通用词典，
+构建完成后以新快照单次替换引用；进行中的请求仍读取各自 pin 住的旧快照。
+- 轮询默认关闭（reload_interval=0），可通过 POST /api/config/data-reload 手动触发；
+- 多 worker 时手动触发写入共享信号文件（ReloadSignal），各 worker 每 RELOAD_SIGNAL_INTERVAL 秒
+  stat 一次该文件，发现新的触发后各自热更新，所有 worker 收敛到同一数据版本；
+- 启动时不额外取数，启动后的首次热更新按全量重建处理，之后只重建变化部分；
+- DB 模式的版本依赖 information_schema.UPDATE_TIME 与行数，不维护 UPDATE_TIME 的引擎上
+  原地修改（行数不变）无法感知，需以 force 方式手动触发。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import AsyncIterable, Callable, Dict, List, Tuple
+
+from sanic.log import logger
+
+from config import Config
+from utils import run_in_async
+from .ac_tool import DataSnapshot, SensitiveAutomatonLoaderByDB
+from .data_provider import (
+    DataProvider,
+    build_custom_container,
+    build_vip_container,
+)
+
+_DIGEST_MASK = (1 << 128) - 1
+
+
+class RowDigest:
+    """
+    逐行累加的多重集摘要：各行 blake2b 值按 2^128 取模求和，与行的到达顺序无关，
+    流式查询无需 ORDER BY，也无需整表排序或拼接 repr
+    """
+
+    __slots__ = ("value", "count")
+
+    def __init__(self) -> None:
+        self.value = 0
+        self.count = 0
+
+    def update(self, row):
+        digest = hashlib.blake2b(repr(row).encode("utf-8"), digest_size=16).digest()
+        self.value = (self.value + int.from_bytes(digest, "big")) & _DIGEST_MASK
+        self.count += 1
+
+    def hexdigest(self) -> str:
+        return f"{self.count}-{self.value:032x}"
+
+
+class DataRows:
+    """一次流式取数的原始行（按租户分组）及其摘要，每批到达时累加"""
+
+    def __init__(self) -> None:
+        # 通用词逐批加入待生成的自动机，不保留整表行；通用词未变化时丢弃
+        self.global_ac = SensitiveAutomatonLoaderByDB()
+        self.global_rules: Dict | None = None
+        self.custom_words: Dict[str, List] = defaultdict(list)
+        self.custom_rules: Dict[str, List] = defaultdict(list)
+        self.vip_rows: Dict[str, List] = defaultdict(list)
+        self._global = RowDigest()
+        # app_id -> (自定义词与规则摘要, 超黑超白摘要)
+        self._tenants: Dict[str, Tuple[RowDigest, RowDigest]] = {}
+
+    def _tenant(self, app_id: str) -> Tuple[RowDigest, RowDigest]:
+        digests = self._tenants.get(app_id)
+        if digests is None:
+            digests = self._tenants[app_id] = (RowDigest(), RowDigest())
+        return digests
+
+    def add_global_words(self, batch: List):
+        """线程池中执行：累加摘要并加入自动机"""
+        for word in batch:
+            self._global.update(SensitiveAutomatonLoaderByDB._to_entry(word))
+        self.global_ac.add_keywords(batch)
+
+    def _add_tenant_rows(self, batch: List, grouped: Dict[str, List], index: int):
+        # 单次遍历：按 scenario_id（首列）分桶并累加该租户摘要
+        for row in batch:
+            grouped[row[0]].append(row)
+            self._tenant(row[0])[index].update(row)
+
+    def add_custom_words(self, batch: List):
+        self._add_tenant_rows(batch, self.custom_words, 0)
+
+    def add_custom_rules(self, batch: List):
+        self._add_tenant_rows(batch, self.custom_rules, 0)
+
+    def add_vip(self, batch: List):
+        self._add_tenant_rows(batch, self.vip_rows, 1)
+
+    @property
+    def global_digest(self) -> str:
+        return self._global.hexdigest()
+
+    @property
+    def tenant_digests(self) -> Dict[str, Tuple[str, str]]:
+        return {
+            app_id: (custom.hexdigest(), vip.hexdigest())
+            for app_id, (custom, vip) in self._tenants.items()
+        }
+
+
+async def _consume(batches: AsyncIterable[List], add: Callable[[List], None]):
+    async for batch in batches:
+        add(batch)
+
+
+async def _consume_in_executor(batches: AsyncIterable[List], add: Callable[[List], None]):
+    async for batch in batches:
+        await run_in_async(add, batch)
+
+
+class ReloadSignal:
+    """
+    跨 worker 的热更新触发：共享文件记录最近一次触发的 token 与 force，
+    各 worker 先比较文件 mtime，变化时才读取内容，token 与已处理的不同即为新的触发
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._stamp: Tuple[int, int] | None = None
+        # 启动前已存在的触发不再处理，启动时加载的数据已是最新
+        payload = self._read()
+        self._seen: str | None = payload.get("token") if payload else None
+
+    def _read(self) -> dict | None:
+        try:
+            stat = os.stat(self.path)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def send(self, force: bool):
+        """写入新的触发，本 worker 自身随即同步热更新，不再经信号重复处理"""
+        token = uuid.uuid4().hex
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"token": token, "force": force, "pid": os.getpid(), "at": time.time()}, f)
+        os.replace(tmp, self.path)
+        self._seen = token
+
+    def poll(self) -> dict | None:
+        """有未处理的触发时返回其内容，否则返回 None"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) == self._stamp:
+            return None
+        payload = self._read()
+        if not payload or payload.get("token") == self._seen:
+            return None
+        self._seen = payload.get("token")
+        return payload
+
+
+class DataReloader:
+    def __init__(
+        self, data_provider: DataProvider, interval: int, signal: ReloadSignal | None = None
+    ) -> None:
+        self.data_provider = data_provider
+        self.interval = interval
+        self.signal = signal
+        self._lock = asyncio.Lock()
+        # 上次热更新对应的摘要；为空（启动后尚未热更新）时下一次热更新全量重建
+        self._global_digest: str | None = None
+        self._tenant_digests: Dict[str, Tuple[str, str]] = {}
+        self.reload_count = 0
+        self.last_reload: dict = {}
+
+    async def _fetch(self) -> DataRows:
+        loader = self.data_provider.data_loader
+        batch_size = Config.DB_STREAM_BATCH_SIZE
+        rows = DataRows()
+        _, _, _, _, rows.global_rules = await asyncio.gather(
+            _consume_in_executor(loader.iter_global_words(batch_size), rows.add_global_words),
+            _consume(loader.iter_all_custom_words(batch_size), rows.add_custom_words),
+            _consume(loader.iter_all_custom_rules(batch_size), rows.add_custom_rules),
+            _consume(loader.iter_all_vip(batch_size), rows.add_vip),
+            loader.load_global_rules(),
+        )
+        return rows
+
+    def _build(self, old: DataSnapshot, rows: DataRows, data_version: str):
+        """线程池中执行：复用未变化的自动机，仅重建变化部分，返回新快照与变化明细"""
+        global_changed = rows.global_digest != self._global_digest
+        if global_changed:
+            global_ac = rows.global_ac
+            global_ac.finish()
+        else:
+            global_ac = old.global_ac
+
+        custom_ac = dict(old.custom_ac or {})
+        custom_vip = dict(old.custom_vip or {})
+        changed = set()
+        for app_id, (custom_digest, vip_digest) in rows.tenant_digests.items():
+            last = self._tenant_digests.get(app_id)
+            if last is None or last[0] != custom_digest:
+                custom_ac[app_id] = build_custom_container(
+                    rows.custom_words.get(app_id, []), rows.custom_rules.get(app_id, [])
+                )
+                changed.add(app_id)
+            if last is None or last[1] != vip_digest:
+                custom_vip[app_id] = build_vip_container(rows.vip_rows.get(app_id, []))
+                changed.add(app_id)
+        removed = set(self._tenant_digests) - set(rows.tenant_digests)
+        for app_id in removed:
+            custom_ac.pop(app_id, None)
+            custom_vip.pop(app_id, None)
+        changed |= removed
+
+        snapshot = DataSnapshot(
+            data_version=data_version,
+            global_ac=global_ac,
+            global_rules=rows.global_rules,
+            custom_ac=custom_ac,
+            custom_vip=custom_vip,
+        )
+        if not global_changed:
+            # 通用词未变：未变化租户的生效词典直接沿用
+            snapshot.effective_ac = {
+                app_id: effective
+                for app_id, effective in old.effective_ac.items()
+                if app_id not in changed
+            }
+            snapshot.global_effective = old.global_effective
+        return snapshot, global_changed, changed
+
+    async def reload(self, data_version: str) -> dict:
+        start = time.perf_counter_ns()
+        rows = await self._fetch()
+        old = self.data_provider.export_snapshot()
+        snapshot, global_changed, changed = await run_in_async(
+            self._build, old, rows, data_version
+        )
+        self.data_provider.publish(snapshot)
+        await self.data_provider.compile_rules()
+        self._global_digest = rows.global_digest
+        self._tenant_digests = rows.tenant_digests
+
+        self.reload_count += 1
+        self.last_reload = {
+            "data_version": data_version,
+            "global_rebuilt": global_changed,
+            "tenants_rebuilt": len(changed),
+            "tenants_total": len(rows.tenant_digests),
+            "cost_ms": (time.perf_counter_ns() - start) / 1e6,
+            "at": time.time(),
+        }
+        logger.info(f"data reloaded: {self.last_reload}")
+        return self.last_reload
+
+    async def check(self, force: bool = False) -> bool:
+        """版本变化（或 force）时热更新，返回是否发生了更新"""
+        async with self._lock:
+            data_version = await self.data_provider.data_loader.get_data_version()
+            if data_version == self.data_provider.data_version and not force:
+                return False
+            await self.reload(data_version)
+            return True
+
+    async def trigger(self, force: bool = False) -> bool:
+        """手动触发：通知其他 worker 后在本 worker 热更新，返回本 worker 是否发生了更新"""
+        if self.signal is not None:
+            await run_in_async(self.signal.send, force)
+        return await self.check(force)
+
+    async def watch(self, interval: float):
+        """检查其他 worker 写入的触发"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    payload = await run_in_async(self.signal.poll)
+                    if payload is not None:
+                        logger.info(f"data reload signaled by worker {payload.get('pid')}")
+                        await self.check(bool(payload.get("force")))
+                except Exception as e:
+                    logger.error(f"signaled data reload failed: {e}")
+        except asyncio.CancelledError:
+            logger.info("data reload watcher stopped")
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.check()
+                except Exception as e:
+                    logger.error(f"data reload failed: {e}")
+                # 顺带按内存预算淘汰闲置租户
+                self.data_provider.sweep_tenants()
+        except asyncio.CancelledError:
+            # 服务停止时由 before_server_stop 取消
+            logger.info("data reloader stopped")
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "signal": self.signal.path if self.signal else None,
+            "data_version": self.data_provider.data_version,
+            "reload_count": self.reload_count,
+            "last_reload": self.last_reload,
+        }
@@ -0,0 +1,115 @@
+"""
+自动机快照
+将已构建的通用/自定义/超黑超白自动机与规则整体序列化为一个文件，
+启动时直接反序列化，跳过取数与 make_automaton。
+快照使用 pickle，只应加载本服务自己生成的文件。
+"""
+import os
+import pickle
+import time
+from typing import Tuple
+
+from sanic.log import logger
+
+from utils import run_in_async
+from .ac_tool import DataSnapshot
+from .data_provider import DataProvider, DataInitPromise
+
+# 快照结构变化时递增，旧格式文件会被视为过期
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def dump_snapshot(snapshot: DataSnapshot, path: str):
+    """写临时文件后原子替换，避免并发读到半个文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(
+            (SNAPSHOT_FORMAT_VERSION, snapshot), f, protocol=pickle.HIGHEST_PROTOCOL
+        )
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> DataSnapshot | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        format_version, snapshot = pickle.load(f)
+    if format_version != SNAPSHOT_FORMAT_VERSION:
+        logger.warning(
+            f"snapshot format {format_version} != {SNAPSHOT_FORMAT_VERSION}, ignored"
+        )
+        return None
+    return snapshot
+
+
+async def load_snapshot(data_provider: DataProvider, path: str, data_version: str) -> bool:
+    """加载快照；快照不存在、损坏或版本与当前数据不一致时返回 False"""
+    try:
+        snapshot: DataSnapshot | None = await run_in_async(read_snapshot, path)
+    except Exception as e:
+        logger.error(f"read snapshot {path} failed: {e}")
+        return False
+    if not snapshot:
+        return False
+    if snapshot.data_version != data_version:
+        logger.info(
+            f"snapshot stale: {snapshot.data_version} != current {data_version}"
+        )
+        return False
+    data_provider.apply_snapshot(snapshot)
+    return True
+
+
+async def compile_snapshot(data_provider: DataProvider, path: str, data_version: str):
+    """全量构建并写出快照"""
+    data_promise = DataInitPromise()
+    data_promise.flow()
+    await data_promise.run(data_provider)
+    data_provider.data_version = data_version
+    await run_in_async(dump_snapshot, data_provider.export_snapshot(), path)
+
+
+async def load_or_build(
+    data_provider: DataProvider, path: str = "", auto_write: bool = True
+) -> Tuple[str, float]:
+    """
+    优先从快照加载，失败时全量构建（并按需回写快照）。
+    返回 (来源 snapshot/rebuild, 耗时ms)
+    """
+    start = time.perf_counter_ns()
+    # 先取版本再取数：构建期间若数据变化，下次启动会因版本不一致而重建
+    data_version = await data_provider.data_loader.get_data_version()
+
+    if path and await load_snapshot(data_provider, path, data_version):
+        source = "snapshot"
+    elif path and auto_write:
+        await compile_snapshot(data_provider, path, data_version)
+        source = "rebuild"
+    else:
+        data_promise = DataInitPromise()
+        data_promise.flow()
+        await data_promise.run(data_provider)
+        data_provider.data_version = data_version
+        source = "rebuild"
+
+    await data_provider.compile_rules()
+
+    cost = (time.perf_counter_ns() - start) / 1e6
+    logger.info(f"data loaded from {source} version={data_version} in {cost} ms")
+    return source, cost
+
+
+async def reload_data(
+    data_provider: DataProvider, path: str = "", auto_write: bool = False
+) -> Tuple[str, float]:
+    """
+    在暂存实例上加载/构建，完成后一次性替换引用。
+    不原地修改旧字典，fork 模式下 worker 与主进程共享的内存页保持只读。
+    """
+    staging = DataProvider.staging(data_provider.data_loader)
+    result = await load_or_build(staging, path, auto_write)
+    data_provider.apply_snapshot(staging.export_snapshot())
+    return result
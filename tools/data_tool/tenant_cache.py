@@ -0,0 +1,134 @@
+"""
+租户容器的内存预算与 LRU 淘汰
+以租户为单位记账：自定义词典、超黑超白词典与租户生效词典一起计入、一起淘汰，
+通用词典与无租户数据时共用的通用生效词典不参与淘汰。
+本模块只负责记账与选出待淘汰的租户，不修改快照：由 DataProvider 以写时复制发布不含这些租户的新快照，
+已固定旧快照或已读取过租户数据的请求不受影响。
+被淘汰的租户下次访问时经 build_ac / get_effective_ac 的懒加载路径重建。
+"""
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from sanic.log import logger
+
+from .ac_tool import DataSnapshot
+
+
+def estimate_tenant_size(snapshot: DataSnapshot, app_id: str) -> int:
+    size = 0
+    custom = snapshot.custom_ac.get(app_id)
+    if custom:
+        if custom.black_ac:
+            size += custom.black_ac.memory_size()
+        if custom.white_ac:
+            size += sys.getsizeof(custom.white_ac) + sum(
+                sys.getsizeof(word) for word in custom.white_ac
+            )
+    vip = snapshot.custom_vip.get(app_id)
+    if vip:
+        if vip.black_ac:
+            size += vip.black_ac.memory_size()
+        if vip.white_ac:
+            size += vip.white_ac.memory_size()
+    effective = snapshot.effective_ac.get(app_id)
+    if effective and effective is not snapshot.global_effective:
+        size += effective.memory_size()
+    return size
+
+
+class TenantCache:
+    """
+    记录各租户占用与最近访问时间，超出预算时从最久未访问的租户开始淘汰。
+    最近 min_idle 秒内访问过的租户不淘汰，避免活跃租户反复淘汰与重建。
+    """
+
+    def __init__(self, budget_bytes: int = 0, min_idle: float = 60) -> None:
+        # 0 表示不限制
+        self.budget_bytes = budget_bytes
+        self.min_idle = min_idle
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._over_budget = False
+
+    def hit(self, app_id: str):
+        self.hits += 1
+        self._touch(app_id)
+
+    def miss(self):
+        self.misses += 1
+
+    def _touch(self, app_id: str):
+        # 只记录已记账的租户，避免任意 app_id 常驻
+        if app_id in self._sizes:
+            self._sizes.move_to_end(app_id)
+            self._last_access[app_id] = time.monotonic()
+
+    def account(self, snapshot: DataSnapshot, app_id: str) -> List[str]:
+        """租户容器构建完成后记账，返回超出预算需淘汰的租户"""
+        size = estimate_tenant_size(snapshot, app_id)
+        self.total_bytes += size - self._sizes.get(app_id, 0)
+        self._sizes[app_id] = size
+        self._touch(app_id)
+        return self.sweep()
+
+    def reset(self, snapshot: DataSnapshot):
+        """发布新快照后按其中的租户重新记账，保留原有的访问顺序"""
+        app_ids = set(snapshot.custom_ac) | set(snapshot.custom_vip)
+        now = time.monotonic()
+        sizes: OrderedDict[str, int] = OrderedDict()
+        for app_id in sorted(
+            app_ids, key=lambda app_id: self._last_access.get(app_id, now)
+        ):
+            sizes[app_id] = estimate_tenant_size(snapshot, app_id)
+            self._last_access.setdefault(app_id, now)
+        self._sizes = sizes
+        self._last_access = {
+            app_id: self._last_access[app_id] for app_id in sizes
+        }
+        self.total_bytes = sum(sizes.values())
+
+    def sweep(self) -> List[str]:
+        """按预算选出待淘汰的租户并移出记账"""
+        if not self.budget_bytes or self.total_bytes <= self.budget_bytes:
+            self._over_budget = False
+            return []
+        deadline = time.monotonic() - self.min_idle
+        evicted = []
+        for app_id in list(self._sizes):
+            if self.total_bytes <= self.budget_bytes:
+                break
+            if self._last_access.get(app_id, 0) > deadline:
+                # 按访问顺序排列，之后的租户都更“新”
+                break
+            self._evict(app_id)
+            evicted.append(app_id)
+        over_budget = self.total_bytes > self.budget_bytes
+        if over_budget and not self._over_budget:
+            logger.warning(
+                f"tenant cache over budget: {self.total_bytes} > {self.budget_bytes} bytes, "
+                f"remaining tenants accessed within {self.min_idle}s"
+            )
+        self._over_budget = over_budget
+        return evicted
+
+    def _evict(self, app_id: str):
+        self.total_bytes -= self._sizes.pop(app_id, 0)
+        self._last_access.pop(app_id, None)
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "total_bytes": self.total_bytes,
+            "tenants": len(self._sizes),
+            "min_idle": self.min_idle,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
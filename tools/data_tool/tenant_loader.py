@@ -0,0 +1,117 @@
+"""
+租户数据按需加载
+已加载的租户由调用方直接读快照字典，不经过本模块；未命中时：
+- 同一租户（同一代数据）的并发加载合并为一次（single-flight），其余请求等待同一结果；
+- 租户无数据时记入负缓存，TTL 内的请求直接按无数据处理，不再访问数据源；
+- 加载失败不按无数据处理（否则会跳过租户黑名单与超黑规则），向调用方抛出 DATA_LOAD_ERROR，
+  失败记录 error_ttl 秒，期间同一租户的请求直接报错，不再反复访问故障的数据源。
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from sanic.log import logger
+
+from utils.error_codes import ErrorCode
+from utils.exceptions import InternalServerError
+
+
+class TenantLoader:
+    def __init__(self, negative_ttl: float = 30, error_ttl: float = 5) -> None:
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        # (kind, app_id, 数据代 id) -> 进行中的加载任务
+        self._inflight: Dict[Tuple[str, str, int], asyncio.Task] = {}
+        # (kind, app_id) -> 负缓存过期时间
+        self._negative: Dict[Tuple[str, str], float] = {}
+        # (kind, app_id) -> 最近一次加载失败的过期时间
+        self._failed: Dict[Tuple[str, str], float] = {}
+        self.loads = 0
+        self.shared = 0
+        self.negative_hits = 0
+        self.errors = 0
+
+    def is_negative(self, kind: str, app_id: str) -> bool:
+        expire = self._negative.get((kind, app_id))
+        if expire is None:
+            return False
+        if expire <= time.monotonic():
+            self._negative.pop((kind, app_id), None)
+            return False
+        self.negative_hits += 1
+        return True
+
+    def raise_if_failed(self, kind: str, app_id: str):
+        """error_ttl 内加载失败过的租户直接报错"""
+        expire = self._failed.get((kind, app_id))
+        if expire is None:
+            return
+        if expire <= time.monotonic():
+            self._failed.pop((kind, app_id), None)
+            return
+        raise self._error(kind, app_id)
+
+    @staticmethod
+    def _error(kind: str, app_id: str) -> InternalServerError:
+        return InternalServerError(
+            f"load {kind} data of {app_id} failed", ErrorCode.DATA_LOAD_ERROR
+        )
+
+    async def load(
+        self,
+        kind: str,
+        app_id: str,
+        generation: Any,
+        fetch: Callable[[], Awaitable[Any]],
+    ):
+        """
+        合并同一租户的并发加载；fetch 返回 None 表示租户无数据，fetch 异常时抛出 DATA_LOAD_ERROR。
+        等待方被取消时不影响进行中的加载（shield）。
+        """
+        key = (kind, app_id, id(generation))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(kind, app_id, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    async def _run(self, kind: str, app_id: str, fetch: Callable[[], Awaitable[Any]]):
+        self.loads += 1
+        try:
+            container = await fetch()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"load {kind} data of {app_id} failed: {e}")
+            self._failed[(kind, app_id)] = time.monotonic() + self.error_ttl
+            raise self._error(kind, app_id) from e
+        self._failed.pop((kind, app_id), None)
+        if container is None:
+            self._negative[(kind, app_id)] = time.monotonic() + self.negative_ttl
+        return container
+
+    def reset(self):
+        """发布新快照后租户数据可能已变化，清空负缓存与失败记录"""
+        self._negative.clear()
+        self._failed.clear()
+
+    def prune(self):
+        now = time.monotonic()
+        for cache in (self._negative, self._failed):
+            for key in [key for key, expire in cache.items() if expire <= now]:
+                cache.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "negative_ttl": self.negative_ttl,
+            "error_ttl": self.error_ttl,
+            "inflight": len(self._inflight),
+            "negative": len(self._negative),
+            "failed": len(self._failed),
+            "loads": self.loads,
+            "shared": self.shared,
+            "negative_hits": self.negative_hits,
+            "errors": self.errors,
+        }
@@ -1,3 +1,4 @@
+import hashlib
 from contextlib import asynccontextmanager
 from typing import List, Dict
 from unittest import result
@@ -35,6 +36,11 @@ class DBConnectTool:
             except Exception as e:
                 raise e
 
+    async def get_data_version(self) -> str:
+        async with self.get_dao() as dao:
+            versions = await dao.get_table_versions()
+        return hashlib.sha1(repr(versions).encode("utf-8")).hexdigest()
+
     async def load_global_rules(self):
         async with self.get_dao() as dao:
             results = await dao.get_all_global_defaults()
@@ -50,11 +56,22 @@ class DBConnectTool:
             result = await dao.get_all_global_keywords()
         return result
 
+    async def iter_global_words(self, batch_size: int):
+        """流式读取通用敏感词，按批产出 (keyword, tag_code)"""
+        async with self.get_dao() as dao:
+            async for batch in dao.stream_global_keywords(batch_size):
+                yield batch
+
     async def load_all_custom_words(self):
         async with self.get_dao() as dao:
             results = await dao.get_all_scenario_keywords()
         return results
 
+    async def iter_all_custom_words(self, batch_size: int):
+        async with self.get_dao() as dao:
+            async for batch in dao.stream_scenario_keywords(batch_size):
+                yield batch
+
     async def load_custom_words(self, app_id: str):
         async with self.get_dao() as dao:
             result = await dao.get_scenario_keywords_by_appid(app_id)
@@ -77,6 +94,16 @@ class DBConnectTool:
             results = await dao.load_all_vip()
         return results
 
+    async def iter_all_custom_rules(self, batch_size: int):
+        async with self.get_dao() as dao:
+            async for batch in dao.stream_scenario_rules(batch_size):
+                yield batch
+
+    async def iter_all_vip(self, batch_size: int):
+        async with self.get_dao() as dao:
+            async for batch in dao.stream_all_vip(batch_size):
+                yield batch
+
     async def load_custom_rule(self, app_id: str):
         async with self.get_dao() as dao:
             results: List[RuleScenarioPolicy] = await dao.get_scenario_rule_by_appid(
@@ -98,25 +125,19 @@ class DBConnectTool:
         vip_black_rules: Dict[str, DecisionClassifyEnum] = {}
         vip_white_rules: Dict[str, DecisionClassifyEnum] = {}
 
+        # 口径与全量加载 build_vip_container 一致：
+        # KEYWORD 非 PASS 即超黑，词条标签取 extra_condition；TAG 按 BLOCK/PASS 分入超黑/超白规则
         for row in result:
-            if row.match_type == "words" and row.strategy == "block":
-                vip_black_words.append(row.match_value)
-            elif row.match_type == "words" and row.strategy == "pass":
-                vip_white_words.append(row.match_value)
-            elif row.match_type == "rule" and row.strategy == "block":
-                vip_black_rules.update(
-                    {
-                        f"{row.match_value}-{row.extra_condition}": DECISION_MAPPING[
-                            row.strategy.upper()
-                        ]
-                    }
-                )
-            elif row.match_type == "rule" and row.strategy == "pass":
-                vip_white_rules.update(
-                    {
-                        f"{row.match_value}-{row.extra_condition}": DECISION_MAPPING[
-                            row.strategy.upper()
-                        ]
-                    }
-                )
+            decision = DECISION_MAPPING.get(str(row.strategy).upper())
+            if row.match_type == "KEYWORD":
+                if decision == DecisionClassifyEnum.PASS:
+                    vip_white_words.append((row.match_value, row.extra_condition))
+                else:
+                    vip_black_words.append((row.match_value, row.extra_condition))
+            elif row.match_type == "TAG":
+                rule_key = f"{row.match_value}-{row.extra_condition or ''}"
+                if decision == DecisionClassifyEnum.REJECT:
+                    vip_black_rules[rule_key] = decision
+                elif decision == DecisionClassifyEnum.PASS:
+                    vip_white_rules[rule_key] = decision
         return vip_black_words, vip_black_rules, vip_white_words, vip_white_rules
@@ -1,16 +1,20 @@
 from models.request_models import SensitiveContext
-from utils.execute_utils import Promise, async_perf_count
+from utils.execute_utils import Pipeline, async_perf_count
+from utils.public import SingleTon
 from mock_api import mock_guard
 
 
-class GuardTool:
+class GuardTool(metaclass=SingleTon):
 
     def __init__(self) -> None:
-        self.promise: Promise = Promise()
+        self.pipeline: Pipeline = Pipeline("guard")
+        self.flow()
 
     def flow(self):
-        self.promise.then(mock_guard)
+        if self.pipeline.compiled:
+            return
+        self.pipeline.stage(mock_guard).compile()
 
     @async_perf_count
     async def execute(self, ctx: SensitiveContext):
-        return await self.promise.execute(ctx)
+        return await self.pipeline.execute(ctx)
@@ -1 +1,2 @@
-from .intent_tools import IntentService
\ No newline at end of file
+from .intent_tools import IntentService
+from .rewrite_executor import RewriteExecutor, REWRITE_UNAVAILABLE_RULE, REWRITE_DEGRADED_RULES
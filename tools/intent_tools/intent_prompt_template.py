@@ -127,3 +127,19 @@ Output:
 {{"user_intent": "结束计算机进程", "rewritten_text": "我要结束这个进程，它卡住了。", "is_safe_now": true, "hit_rule": null}}
 """
 
+
+# ======================================================
+# 单条改写 - 用户消息模板
+# ======================================================
+TC260_REWRITE_HUMAN = "【系统检测到的敏感词】: {triggered_keywords}\n【用户原始内容】: {user_input}"
+
+# ======================================================
+# 多条合并改写 - 用户消息模板
+# 系统提示词与单条改写完全相同（服务端可复用前缀缓存），批量输出格式放在用户消息中
+# ======================================================
+TC260_REWRITE_BATCH_HUMAN = """以下是 {count} 条相互独立的待处理输入（JSON 数组），每条含 id、系统检测到的敏感词 triggered_keywords 与用户原始内容 user_input。
+请逐条独立完成意图识别与无害化改写，条目之间不得互相参考，每条输入必须对应一条结果并带上原 id。
+只输出一个 JSON 对象，本次输出格式以下面的说明为准，替代 Output Format 中的单条格式：
+{format_instructions}
+待处理输入：
+{items}"""
@@ -1,13 +1,20 @@
-from langchain_core.prompts import ChatPromptTemplate
+import json
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import PydanticOutputParser
 from utils import LLMManager
-from models import VllmType, SafetyRewriteResult
-
-
-from langchain_core.prompts import ChatPromptTemplate
+from utils.metrics import metrics
+from models import VllmType, SafetyRewriteResult, SafetyRewriteBatchResult
 
-from .intent_prompt_template import TC260_REWRITE_PROMPT
-from config import DEEP_SEEK_API_KEY
+from .intent_prompt_template import (
+    TC260_REWRITE_PROMPT,
+    TC260_REWRITE_HUMAN,
+    TC260_REWRITE_BATCH_HUMAN,
+)
+from .json_repair import parse_json_output
+from config import DEEP_SEEK_API_KEY, MODEL_CONFIGS
 
 API_KEY: str | None = DEEP_SEEK_API_KEY
 
@@ -18,42 +25,79 @@ API_KEY: str | None = DEEP_SEEK_API_KEY
 if not API_KEY:
     raise Exception("NO_APIKEY_ERROR")
 
+# 大模型调用或解析失败时的 hit_rule
+REWRITE_ERROR_RULE = "SystemError"
+
 
 # ==========================================
 # 2. 意图识别与改写服务
 # ==========================================
 class IntentService:
+    """
+    每个 VllmType 一个长期实例（get_instance），构建时一次性完成：
+    - 系统提示词连同 JSON 格式说明预先渲染为固定的 SystemMessage，单条与多条改写共用，
+      每次请求的前缀逐字节相同，服务端可复用前缀 KV 缓存；
+    - 模型配置 json_mode 为 true 时以 response_format=json_object 调用；
+    - 模型输出在本地解析，格式瑕疵在本地修复（json_repair），不重新请求模型。
+    """
+
+    _instances: Dict[VllmType, "IntentService"] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, vllm_type: VllmType = VllmType.SAFE_MODEL) -> "IntentService":
+        vllm_type = vllm_type or VllmType.SAFE_MODEL
+        instance = cls._instances.get(vllm_type)
+        if instance is None:
+            with cls._lock:
+                instance = cls._instances.get(vllm_type)
+                if instance is None:
+                    instance = cls._instances[vllm_type] = cls(vllm_type)
+        return instance
+
     def __init__(self, vllm_type: VllmType = VllmType.SAFE_MODEL):
         """
         初始化服务：
-        1. 获取 LLM 实例（从单例管理器）
-        2. 配置 Prompt 模板
-        3. 配置 Pydantic 解析器
+        1. 获取 LLM 实例（从单例管理器），按配置开启 JSON 模式
+        2. 预渲染系统提示词与格式说明
         """
         # 从单例池获取 DeepSeek (响应速度快，适合意图识别)
         if not vllm_type:
             self.vllm_type = VllmType.SAFE_MODEL
         else:
             self.vllm_type = vllm_type
-        self.llm = LLMManager.get_instance().get_model(self.vllm_type)
-
-        self.parser = PydanticOutputParser(pydantic_object=SafetyRewriteResult)
-
-        # 构建 Prompt
-        # system 消息使用我们定义的 TC260_REWRITE_PROMPT
-        self.prompt_template = ChatPromptTemplate.from_messages(
-            [
-                ("system", TC260_REWRITE_PROMPT),
-                # 将上游检测到的敏感词传入，辅助大模型判断
-                (
-                    "human",
-                    "【系统检测到的敏感词】: {triggered_keywords}\n【用户原始内容】: {user_input}",
-                ),
-            ]
+        llm = LLMManager.get_instance().get_model(self.vllm_type)
+        config = MODEL_CONFIGS.get(self.vllm_type, {})
+        self.json_mode = bool(config.get("json_mode"))
+        self.llm = llm.bind(response_format={"type": "json_object"}) if self.json_mode else llm
+
+        # 格式说明只生成一次
+        self.format_instructions = PydanticOutputParser(
+            pydantic_object=SafetyRewriteResult
+        ).get_format_instructions()
+        self.batch_format_instructions = PydanticOutputParser(
+            pydantic_object=SafetyRewriteBatchResult
+        ).get_format_instructions()
+
+        # system 消息使用我们定义的 TC260_REWRITE_PROMPT，渲染后不再变化
+        self.system_message = SystemMessage(
+            content=TC260_REWRITE_PROMPT.format(format_instructions=self.format_instructions)
         )
 
-        # 预编译 Chain (Prompt | LLM | Parser)
-        self.chain = self.prompt_template | self.llm | self.parser
+    async def _invoke(self, human: str) -> str:
+        # 异步调用 (ainvoke) 以利用底层连接池
+        message = await self.llm.ainvoke([self.system_message, HumanMessage(content=human)])
+        return message.content
+
+    @staticmethod
+    def _parse(content: str, model):
+        try:
+            result, repaired = parse_json_output(content, model)
+        except ValueError:
+            metrics.inc("rewrite_parse_total", result="failed")
+            raise
+        metrics.inc("rewrite_parse_total", result="repaired" if repaired else "ok")
+        return result
 
     async def execute(
         self, text: str, sensitive_words: list | None = None
@@ -62,23 +106,16 @@ class IntentService:
         执行改写任务
         :param text: 用户原始输入
         :param sensitive_words: (可选) 上游正则/AC自动机匹配到的敏感词列表
-        :return: 字典格式的结果
+        :return: 改写结果
         """
-        # 处理敏感词列表格式
+        # 处理敏感词列表格式，将上游检测到的敏感词传入，辅助大模型判断
         keywords_str = ", ".join(sensitive_words) if sensitive_words else "无"
 
         try:
-            # 异步调用 (ainvoke) 以利用底层连接池
-            result = await self.chain.ainvoke(
-                {
-                    # 注入 JSON 格式说明
-                    "format_instructions": self.parser.get_format_instructions(),
-                    "triggered_keywords": keywords_str,
-                    "user_input": text,
-                }
+            content = await self._invoke(
+                TC260_REWRITE_HUMAN.format(triggered_keywords=keywords_str, user_input=text)
             )
-
-            return result
+            return self._parse(content, SafetyRewriteResult)
 
         except Exception as e:
             # 生产环境建议结合 logger 记录详细堆栈
@@ -88,5 +125,36 @@ class IntentService:
                 user_intent="Error",
                 rewritten_text="",
                 is_safe_now=False,
-                hit_rule="SystemError",
+                hit_rule=REWRITE_ERROR_RULE,
+            )
+
+    async def execute_batch(
+        self, items: Sequence[Tuple[str, list | None]]
+    ) -> List[SafetyRewriteResult | None]:
+        """
+        多条输入合并为一次大模型调用
+        :param items: [(用户原始输入, 敏感词列表), ...]
+        :return: 与 items 顺序一致的结果列表，模型漏答的条目为 None
+        调用或解析失败直接抛出异常，由调用方决定降级或逐条重试
+        """
+        payload = [
+            {
+                "id": i,
+                "triggered_keywords": ", ".join(words) if words else "无",
+                "user_input": text,
+            }
+            for i, (text, words) in enumerate(items)
+        ]
+        content = await self._invoke(
+            TC260_REWRITE_BATCH_HUMAN.format(
+                count=len(payload),
+                format_instructions=self.batch_format_instructions,
+                items=json.dumps(payload, ensure_ascii=False),
             )
+        )
+        batch = self._parse(content, SafetyRewriteBatchResult)
+        results: List[SafetyRewriteResult | None] = [None] * len(items)
+        for item in batch.results:
+            if 0 <= item.id < len(items) and results[item.id] is None:
+                results[item.id] = SafetyRewriteResult(**item.model_dump(exclude={"id"}))
+        return results
@@ -0,0 +1,74 @@
+"""
+大模型 JSON 输出的本地修复
+模型偶尔输出 Markdown 代码块、JSON 前后夹带说明文字、尾随逗号或 Python 字面量（True/False/None），
+这些都在本地修复后再校验，不重新请求模型。修复只作用于 JSON 字符串之外，字符串值（改写文本等）原样保留；
+修复后仍无法解析或校验失败时抛出 ValueError。
+"""
+import json
+import re
+from typing import List, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S | re.I)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PY_LITERALS = re.compile(r"(?<![\"\w])(True|False|None)(?![\"\w])")
+_PY_TO_JSON = {"True": "true", "False": "false", "None": "null"}
+
+
+def _extract_object(text: str) -> str:
+    """取第一个 { 到最后一个 } 之间的内容"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return text
+    return text[start : end + 1]
+
+
+def _split_strings(text: str) -> List[Tuple[bool, str]]:
+    """切分为 (是否为 JSON 字符串, 片段) 列表，字符串片段含引号并跳过转义字符；未闭合的字符串延续到末尾"""
+    parts: List[Tuple[bool, str]] = []
+    start, n = 0, len(text)
+    while True:
+        begin = text.find('"', start)
+        if begin < 0:
+            break
+        end = begin + 1
+        while end < n and text[end] != '"':
+            end += 2 if text[end] == "\\" else 1
+        end = min(end + 1, n)
+        parts.append((False, text[start:begin]))
+        parts.append((True, text[begin:end]))
+        start = end
+    parts.append((False, text[start:]))
+    return parts
+
+
+def _repair(text: str) -> str:
+    repaired = []
+    for is_string, part in _split_strings(text):
+        if not is_string:
+            part = _TRAILING_COMMA.sub(r"\1", part)
+            part = _PY_LITERALS.sub(lambda m: _PY_TO_JSON[m.group(1)], part)
+        repaired.append(part)
+    return "".join(repaired)
+
+
+def parse_json_output(text: str, model: Type[T]) -> tuple[T, bool]:
+    """
+    解析并校验模型输出
+    :return: (结果, 是否经过修复)
+    """
+    try:
+        return model.model_validate_json(text), False
+    except ValidationError:
+        pass
+    fenced = _FENCE.search(text)
+    candidate = _extract_object(fenced.group(1) if fenced else text)
+    for attempt in (candidate, _repair(candidate)):
+        try:
+            return model.model_validate(json.loads(attempt)), True
+        except (ValueError, ValidationError):
+            continue
+    raise ValueError(f"unparseable model output: {text[:200]!r}")
@@ -0,0 +1,280 @@
+"""
+改写执行器
+REWRITE 决策的大模型改写统一经由本执行器：
+- 同时进行的改写不超过 concurrency，其余请求进入有界等待队列；
+- 队列已满、排队超过 queue_timeout 或改写超过 timeout 时不再等待大模型，按 fallback 策略降级：
+  reject —— 视为改写后仍不安全（rewrite_decision=REJECT）；
+  mask   —— 将命中的敏感词替换为 * 后的文本放入 rewritten_text 供调用方参考；
+           掩码文本未经大模型确认，is_safe_now 仍为 False，决策与 reject 相同；
+- 降级结果 hit_rule 为 REWRITE_UNAVAILABLE_RULE，不写入改写缓存与整体决策缓存。
+并发上限之外的请求在本执行器内等待或被拒绝，不进入 httpx 连接池排队；
+不需要改写的请求不经过本执行器，不受改写拥塞影响。
+- 文本与敏感词集合都相同的并发改写合并为一次调用（single-flight），结果各自复制一份返回；
+- 有请求在排队或已有待合并条目时（即负载较高时），不超过 batch_max_chars 的短文本先进入合并窗口，
+  凑满 batch_size 条或等待 batch_wait_ms 后合并为一次多条改写请求，只占一个执行名额；
+  模型漏答或整批调用失败的条目退回逐条改写，整批超时的条目按 fallback 降级。
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from sanic.log import logger
+
+from config import Config
+from models import DecisionClassifyEnum, SafetyRewriteResult, VllmType
+from utils import SingleTon
+from utils.metrics import metrics
+from .intent_tools import IntentService, REWRITE_ERROR_RULE
+
+REWRITE_UNAVAILABLE_RULE = "RewriteUnavailable"
+# 降级结果的 hit_rule：IntentService 调用失败、改写执行器拒绝或超时；此类结果不写入任何缓存
+REWRITE_DEGRADED_RULES = (REWRITE_ERROR_RULE, REWRITE_UNAVAILABLE_RULE)
+FALLBACK_REJECT = "reject"
+FALLBACK_MASK = "mask"
+
+RewriteKey = Tuple[str, Tuple[str, ...]]
+PendingItem = Tuple[str, List[str], asyncio.Future]
+
+
+def mask_words(text: str, words: Iterable[str]) -> str:
+    """长词优先替换，避免短词先替换后长词无法匹配"""
+    for word in sorted(set(words), key=len, reverse=True):
+        if word:
+            text = text.replace(word, "*" * len(word))
+    return text
+
+
+class RewriteExecutor(metaclass=SingleTon):
+    def __init__(
+        self,
+        concurrency: int = Config.REWRITE_CONCURRENCY,
+        queue_size: int = Config.REWRITE_QUEUE_SIZE,
+        queue_timeout: float = Config.REWRITE_QUEUE_TIMEOUT,
+        timeout: float = Config.REWRITE_TIMEOUT,
+        fallback: str = Config.REWRITE_FALLBACK,
+        batch_size: int = Config.REWRITE_BATCH_SIZE,
+        batch_wait_ms: float = Config.REWRITE_BATCH_WAIT_MS,
+        batch_max_chars: int = Config.REWRITE_BATCH_MAX_CHARS,
+    ) -> None:
+        if fallback not in (FALLBACK_REJECT, FALLBACK_MASK):
+            raise ValueError(f"REWRITE_FALLBACK must be {FALLBACK_REJECT} or {FALLBACK_MASK}")
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.fallback = fallback
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.batch_max_chars = batch_max_chars
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._intent: IntentService | None = None
+        self._inflight: Dict[RewriteKey, asyncio.Task] = {}
+        # 合并窗口内的待改写条目与定时刷新句柄
+        self._pending: List[PendingItem] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._batch_tasks: set = set()
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.shared = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.batch_retries = 0
+        self.shed = {"queue_full": 0, "queue_timeout": 0, "timeout": 0}
+
+    @property
+    def intent(self) -> IntentService:
+        # 模型实例、Prompt 与解析器只构建一次
+        if self._intent is None:
+            self._intent = IntentService.get_instance(VllmType.SAFE_MODEL)
+        return self._intent
+
+    def _gauge(self):
+        metrics.set("rewrite_queue_depth", self.waiting)
+        metrics.set("rewrite_active", self.active)
+
+    def fallback_result(self, text: str, words: Iterable[str], reason: str) -> SafetyRewriteResult:
+        self.shed[reason] += 1
+        metrics.inc("rewrite_shed_total", reason=reason, policy=self.fallback)
+        if self.fallback == FALLBACK_MASK:
+            return SafetyRewriteResult(
+                user_intent="",
+                rewritten_text=mask_words(text, words),
+                is_safe_now=False,
+                hit_rule=REWRITE_UNAVAILABLE_RULE,
+                rewrite_decision=DecisionClassifyEnum.REJECT.value,
+            )
+        return SafetyRewriteResult(
+            user_intent="",
+            rewritten_text="",
+            is_safe_now=False,
+            hit_rule=REWRITE_UNAVAILABLE_RULE,
+            rewrite_decision=DecisionClassifyEnum.REJECT.value,
+        )
+
+    async def _acquire(self) -> str | None:
+        """取得执行名额返回 None，否则返回降级原因"""
+        if not self._semaphore.locked():
+            # 有空闲名额时 acquire 不会挂起
+            await self._semaphore.acquire()
+            metrics.observe("rewrite_queue_wait_ms", 0)
+            return None
+        if self.waiting >= self.queue_size:
+            return "queue_full"
+        self.waiting += 1
+        self._gauge()
+        start = time.perf_counter_ns()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+            metrics.observe("rewrite_queue_wait_ms", (time.perf_counter_ns() - start) / 1e6)
+            self._gauge()
+        return None
+
+    async def rewrite(self, text: str, words: list) -> SafetyRewriteResult:
+        """
+        并发的相同改写等待同一次调用（shield：首个请求被取消不影响其余请求）；
+        调用方会修改返回结果（如 rewrite_decision），因此每个调用方拿到独立副本
+        """
+        key: RewriteKey = (text, tuple(sorted(set(words))))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._dispatch(text, list(key[1])))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+            metrics.inc("rewrite_singleflight_shared_total")
+        result = await asyncio.shield(task)
+        return result.model_copy()
+
+    def _should_batch(self, text: str) -> bool:
+        if self.batch_size <= 1 or len(text) > self.batch_max_chars:
+            return False
+        return bool(self._pending) or self._semaphore.locked()
+
+    async def _dispatch(self, text: str, words: List[str]) -> SafetyRewriteResult:
+        if not self._should_batch(text):
+            return await self._run_single(text, words)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, words, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        items, self._pending = self._pending, []
+        if items:
+            task = asyncio.ensure_future(self._run_batch(items))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_single(self, text: str, words: List[str]) -> SafetyRewriteResult:
+        reason = await self._acquire()
+        if reason is not None:
+            logger.warning(f"rewrite shed: {reason}, waiting={self.waiting}, active={self.active}")
+            return self.fallback_result(text, words, reason)
+        self.active += 1
+        self._gauge()
+        try:
+            return await asyncio.wait_for(self.intent.execute(text, words), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"rewrite timeout after {self.timeout}s")
+            return self.fallback_result(text, words, "timeout")
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+            self._gauge()
+
+    async def _settle_single(self, text: str, words: List[str], future: asyncio.Future):
+        try:
+            result = await self._run_single(text, words)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def _run_batch(self, items: List[PendingItem]):
+        if len(items) == 1:
+            await self._settle_single(*items[0])
+            return
+        reason = await self._acquire()
+        if reason is not None:
+            logger.warning(f"rewrite batch shed: {reason}, items={len(items)}")
+            for text, words, future in items:
+                if not future.done():
+                    future.set_result(self.fallback_result(text, words, reason))
+            return
+        self.active += 1
+        self.batches += 1
+        self.batched_items += len(items)
+        metrics.inc("rewrite_batch_total")
+        metrics.inc("rewrite_batch_items_total", len(items))
+        self._gauge()
+        results: List[SafetyRewriteResult | None] = [None] * len(items)
+        timed_out = False
+        try:
+            results = await asyncio.wait_for(
+                self.intent.execute_batch([(text, words) for text, words, _ in items]),
+                self.timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"rewrite batch timeout after {self.timeout}s, items={len(items)}")
+            timed_out = True
+        except Exception as e:
+            logger.warning(f"rewrite batch failed, retry items one by one: {e}")
+        finally:
+            # 先归还名额，逐条重试时重新排队
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+            self._gauge()
+
+        retries = []
+        for (text, words, future), result in zip(items, results):
+            if future.done():
+                continue
+            if result is not None:
+                future.set_result(result)
+            elif timed_out:
+                future.set_result(self.fallback_result(text, words, "timeout"))
+            else:
+                retries.append(self._settle_single(text, words, future))
+        if retries:
+            self.batch_retries += len(retries)
+            metrics.inc("rewrite_batch_retry_total", len(retries))
+            await asyncio.gather(*retries)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queue_timeout": self.queue_timeout,
+            "timeout": self.timeout,
+            "fallback": self.fallback,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "inflight": len(self._inflight),
+            "shared": self.shared,
+            "batch_size": self.batch_size,
+            "batch_wait_ms": self.batch_wait * 1000,
+            "batch_max_chars": self.batch_max_chars,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch": round(self.batched_items / self.batches, 2) if self.batches else None,
+            "batch_retries": self.batch_retries,
+            "shed": self.shed,
+        }
@@ -1 +1,7 @@
-from .rule_engine_tool import InputRuleEngineTool
\ No newline at end of file
+from .rule_engine_tool import (
+    InputRuleEngineTool,
+    BatchRuleEngineTool,
+    OutputRuleEngineTool,
+    StreamOutputRuleEngineTool,
+)
+from .decision_cache import DecisionCache, decision_cache
@@ -0,0 +1,172 @@
+"""
+整体决策结果缓存
+键为 (app_id, 各 use_* 开关, is_output, scan_mode, 数据版本, 归一化文本摘要)，
+命中时直接复用扫描、guard、决策与改写的结果，不再执行规则引擎流程。
+- 数据版本取自本请求固定的快照，词典或规则热更新后旧条目不再被新版本请求命中；热更新期间新旧快照的请求交替到达，
+  因此不按版本整体清空，旧版本条目随 LRU 与 TTL 淘汰；
+- 条目数超过上限按 LRU 淘汰，超过 TTL 视为未命中；
+- 相同键的并发请求合并为一次计算（single-flight），其余请求等待同一结果；
+- scan_mode=count 的命中位置对应原文，原文不同而归一化文本相同时位置不同，此类请求不缓存；
+- 改写降级（大模型失败、执行器拒绝或超时）的结果不缓存，下一次相同请求重新改写。
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from config import Config
+from models import SensitiveContext, ScanMode
+from ..intent_tools import REWRITE_DEGRADED_RULES
+from utils.metrics import metrics
+
+# 缓存并回填的 ctx 字段
+RESULT_FIELDS = (
+    "customize_result",
+    "vip_black_words_result",
+    "vip_white_words_result",
+    "global_result",
+    "final_result",
+    "safety",
+    "category",
+    "final_decision",
+    "decision_dict",
+    "all_decision_dict",
+    "rewrite_result",
+)
+
+CacheKey = Tuple[Any, ...]
+
+
+class DecisionCache:
+    def __init__(self, max_entries: int = 10000, ttl: float = 300) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (过期时间, 结果字段)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def cacheable(ctx: SensitiveContext) -> bool:
+        return ctx.scan_mode != ScanMode.COUNT
+
+    @staticmethod
+    def make_key(ctx: SensitiveContext, data_version: str) -> CacheKey:
+        """ctx.input_prompt 须已归一化"""
+        digest = hashlib.blake2b(ctx.input_prompt.encode("utf-8"), digest_size=16).digest()
+        return (
+            ctx.app_id,
+            ctx.use_customize_white,
+            ctx.use_customize_words,
+            ctx.use_customize_rule,
+            ctx.use_vip_black,
+            ctx.use_vip_white,
+            ctx.is_output,
+            ctx.scan_mode,
+            data_version,
+            digest,
+        )
+
+    def get(self, key: CacheKey) -> Dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expire, result = entry
+        if expire <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: CacheKey, result: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _restore(ctx: SensitiveContext, result: Dict[str, Any]):
+        for field, value in result.items():
+            setattr(ctx, field, value)
+
+    async def _compute(
+        self,
+        key: CacheKey,
+        ctx: SensitiveContext,
+        compute: Callable[[SensitiveContext], Awaitable[Any]],
+    ) -> Dict[str, Any]:
+        await compute(ctx)
+        result = {field: getattr(ctx, field) for field in RESULT_FIELDS}
+        if result["rewrite_result"].get("hit_rule") in REWRITE_DEGRADED_RULES:
+            self.skipped += 1
+            metrics.inc("decision_cache_total", result="skip_degraded")
+            return result
+        # 计算期间若已发布新版本，结果仍写入旧版本键，不会被新版本请求命中
+        self.put(key, result)
+        return result
+
+    async def run(
+        self,
+        ctx: SensitiveContext,
+        data_version: str,
+        compute: Callable[[SensitiveContext], Awaitable[Any]],
+    ):
+        """
+        命中时回填结果字段；未命中时执行 compute(ctx)。
+        并发的相同请求等待首个请求的计算（shield：首个请求被取消不影响其余请求），
+        计算异常时所有等待方收到同一异常，异常结果不缓存。
+        """
+        key = self.make_key(ctx, data_version)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            metrics.inc("decision_cache_total", result="hit")
+            self._restore(ctx, result)
+            return ctx
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            metrics.inc("decision_cache_total", result="miss")
+            task = asyncio.ensure_future(self._compute(key, ctx, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            await asyncio.shield(task)
+            return ctx
+
+        self.shared += 1
+        metrics.inc("decision_cache_total", result="shared")
+        self._restore(ctx, await asyncio.shield(task))
+        return ctx
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "enabled": self.enabled,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "hit_ratio": round((self.hits + self.shared) / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "skipped_degraded": self.skipped,
+        }
+
+
+decision_cache = DecisionCache(Config.DECISION_CACHE_MAX_ENTRIES, Config.DECISION_CACHE_TTL)
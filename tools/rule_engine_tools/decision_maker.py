@@ -3,6 +3,8 @@ from typing import Any, Dict
 from mock_api.mock_llm import GuardSafetyEnum
 from models import SensitiveContext, DecisionClassifyEnum
 from sanic.log import logger
+from utils.error_codes import ErrorCode
+from utils.exceptions import InternalServerError
 from ..data_tool.data_provider import DataProvider
 
 
@@ -31,40 +33,48 @@ def rank_by_vip_rules(ctx: SensitiveContext, rule_dict: dict):
     return final_decision, decision_dict
 
 
-async def rank_by_normal_rules(ctx: SensitiveContext):
+def rank_by_normal_rules(ctx: SensitiveContext):
+    """
+    按加载时编译的决策表排序：表已按 safety 拆分并叠加租户自定义规则，
+    每个命中标签一次查表，取决策值最大者
+    """
     data_provider: DataProvider = DataProvider.get_instance()
     final_decision: int = -1
-    use_customize: bool = False
-    customize_rule: dict = {}
     decision_dict: dict = {}
     decision_details: Dict[str, Dict[str, Any]] = {}
-    decision: DecisionClassifyEnum = DecisionClassifyEnum.PASS
-    custom = data_provider.custom_ac.get(ctx.app_id, None)
-    if ctx.use_customize_rule and custom:
-        if data_provider.custom_ac[ctx.app_id]:
-            if custom.custom_rule:
-                customize_rule = custom.custom_rule
-        if customize_rule:
-            use_customize = True
+    table = data_provider.get_decision_table(
+        ctx.app_id if ctx.use_customize_rule else ""
+    )
+    rules = table.get(ctx.safety, {})
     for k, v in ctx.final_result.items():
-        _label = f"{k}-{ctx.safety}"
-
-        if not data_provider.global_rules.get(_label):
-            logger.error(f"KEY_NOT_IN_RULE_ERROR -- {_label}")
-            raise Exception("KEY_NOT_IN_RULE_ERROR")
-        else:
-            # decision = RULE_DICT_MOCK[_label]
-            decision = data_provider.global_rules[_label]
-            if use_customize and _label in customize_rule:
-                decision = DecisionClassifyEnum(customize_rule.get(_label))
-            if decision.value > final_decision:
-                final_decision = decision.value
-                decision_dict = {k: v}
-            decision_details[_label] = {"decision": decision.value, "words": v}
-    return decision.value, decision_dict, decision_details
-
-
-async def make_decision(ctx: SensitiveContext):
+        rule = rules.get(k)
+        if rule is None:
+            logger.error(f"KEY_NOT_IN_RULE_ERROR -- {k}-{ctx.safety}")
+            raise InternalServerError(
+                f"KEY_NOT_IN_RULE_ERROR -- {k}-{ctx.safety}", ErrorCode.RULE_ENGINE_ERROR
+            )
+        decision, label = rule
+        if decision > final_decision:
+            final_decision = decision
+            decision_dict = {k: v}
+        decision_details[label] = {"decision": decision, "words": v}
+    return final_decision, decision_dict, decision_details
+
+
+def finalize_by_vip_black(ctx: SensitiveContext) -> bool:
+    """
+    超黑词优先级最高，命中即为最终结果：扫描完成后直接定案，不等待 guard，后续规则排序与处置不再执行。
+    score 与 make_decision 相同（REJECT）；all_decision_dict 中不依赖 guard 的明细（1000/900/800/700）照常给出，
+    普通规则明细（100）与 decision_dict 需按 guard 的 safety 查决策表，guard 已取消，因此不包含
+    """
+    if not (ctx.use_vip_black and ctx.vip_black_words_result):
+        return False
+    rank_decisions(ctx, with_normal_rules=False)
+    ctx.finalize()
+    return True
+
+
+def rank_decisions(ctx: SensitiveContext, with_normal_rules: bool = True):
 
     final_decision_dict = {"score": -1, "priority": -1}
 
@@ -73,7 +83,7 @@ async def make_decision(ctx: SensitiveContext):
 
     data_provider: DataProvider = DataProvider.get_instance()
     # custom = data_provider.custom_ac.get(ctx.app_id)
-    custom_vip = data_provider.custom_vip.get(ctx.app_id)
+    custom_vip = data_provider.get_tenant("vip", ctx.app_id)
 
     def decision_jugde(_decision, priority):
         nonlocal final_decision_dict
@@ -96,9 +106,9 @@ async def make_decision(ctx: SensitiveContext):
         decision_jugde(_final_decision, value)
         decision_details[str(value)] = ctx.vip_white_words_result
 
-    if ctx.final_result:
+    if with_normal_rules and ctx.final_result:
         value = DecisionSource.NORMAL_RULE.value
-        _final_decision, _data, _details = await rank_by_normal_rules(ctx)
+        _final_decision, _data, _details = rank_by_normal_rules(ctx)
         decision_jugde(_final_decision, DecisionSource.NORMAL_RULE)
         decision_details[str(value)] = _details
         decision_dict = _data
@@ -122,3 +132,7 @@ async def make_decision(ctx: SensitiveContext):
     ctx.final_decision = final_decision_dict
     ctx.all_decision_dict = decision_details
     ctx.decision_dict = decision_dict
+
+
+def make_decision(ctx: SensitiveContext):
+    rank_decisions(ctx)
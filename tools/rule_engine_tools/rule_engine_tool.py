@@ -1,29 +1,52 @@
+import asyncio
+from typing import List
 from utils.execute_utils import run_in_async
-from utils import Promise, async_perf_count
+from utils import Pipeline, SingleTon, async_perf_count
 from models import SensitiveContext
+from config import Config
 from ..guard_tools import GuardTool
-from ..sensitive_tools import SensitiveTool
-from .decision_maker import make_decision
-from ..intent_tools import IntentService
-from models import SafetyRewriteResult
-from ..string_filter_tools import remove_control_chars
+from ..sensitive_tools import (
+    SensitiveTool,
+    scan_dispatcher,
+    open_stream_scanner,
+    merge_scan_result,
+    final_filter,
+)
+from .decision_maker import make_decision, finalize_by_vip_black
+from .decision_cache import decision_cache
+from ..intent_tools import RewriteExecutor, REWRITE_DEGRADED_RULES
+from ..semantic_cache_tools import SemanticCacheTool
+from models import SafetyRewriteResult, DecisionClassifyEnum
+from ..string_filter_tools import remove_control_chars, normalize_text
 from ..data_tool.data_provider import DataProvider
 
 
+async def normalize_prompt(ctx: SensitiveContext):
+    """归一化与扫描共用调度器：短输入内联执行，长输入投递线程池；已归一化时跳过"""
+    if ctx.normalized:
+        return
+    await scan_dispatcher.run(remove_control_chars, ctx, size=len(ctx.input_prompt))
+
+
+def _normalize_batch(ctxs: List[SensitiveContext]):
+    for ctx in ctxs:
+        remove_control_chars(ctx)
+
+
 async def custom_vip_load_by_db(ctx: SensitiveContext):
     data_provider: DataProvider = DataProvider.get_instance()
-    custom_vip = data_provider.custom_vip.get(ctx.app_id)
-    if not custom_vip or not custom_vip.loaded:
-        await data_provider.build_ac("vip", ctx.app_id)
+    await data_provider.load_tenant("vip", ctx.app_id)
 
 
+@async_perf_count
 async def rewrite_chat(ctx: SensitiveContext):
     """
     Docstring for rewrite_chat
     1、清洗敏感词数据
-    2、大模型对话
-    3、检查
-    4、赋值
+    2、查近重复缓存，命中则直接复用改写结果
+    3、经改写执行器（限流、排队超时、降级）调用大模型
+    4、检查
+    5、赋值并写入缓存（改写失败的降级结果不写入）
     :param ctx: Description
     :type ctx: SensitiveContext
     """
@@ -33,13 +56,18 @@ async def rewrite_chat(ctx: SensitiveContext):
         for v2 in v1.values()
         for data in v2.get("words", [])
     ]
-    intent_instance: IntentService = IntentService()
-    res: SafetyRewriteResult = await intent_instance.execute(
-        ctx.input_prompt, all_words
-    )
+    semantic_cache: SemanticCacheTool = SemanticCacheTool()
+    cached = semantic_cache.lookup(ctx.app_id, ctx.input_prompt, all_words)
+    if cached is not None:
+        ctx.rewrite_result = cached
+        return
+    executor: RewriteExecutor = RewriteExecutor()
+    res: SafetyRewriteResult = await executor.rewrite(ctx.input_prompt, all_words)
     if not res.is_safe_now:
         res.rewrite_decision = 100
     ctx.rewrite_result = res.model_dump()
+    if res.hit_rule not in REWRITE_DEGRADED_RULES:
+        semantic_cache.store(ctx.app_id, ctx.input_prompt, all_words, ctx.rewrite_result)
 
 
 async def do_action_by_decision(ctx: SensitiveContext):
@@ -58,40 +86,185 @@ async def do_action_by_decision(ctx: SensitiveContext):
             raise Exception("NO_DECISION_FOUND_ERROR")
 
 
-class InputRuleEngineTool:
+class InputRuleEngineTool(metaclass=SingleTon):
+    """
+    阶段图在启动时编译一次，各请求共享：
+    normalize_prompt ─┬─> scan_sensitive ─┬─> make_decision ─> do_action_by_decision
+    custom_vip_load ──┘                   │
+    normalize_prompt ───> guard ──────────┘
+    guard 只依赖归一化结果，不等待超黑超白加载与扫描。
+    流程前置整体决策结果缓存（见 decision_cache），相同租户、开关、数据版本与归一化文本的请求直接复用结果
+    """
+
     def __init__(self) -> None:
-        self.promise = Promise()
+        self.pipeline = Pipeline("input_rule_engine")
+        self.sensitive_tool = SensitiveTool()
+        self.guard_tool = GuardTool()
+        self.flow()
+
+    async def scan_sensitive(self, ctx: SensitiveContext):
+        """扫描完成后命中超黑词即定案，运行中的 guard 调用被取消，决策与处置阶段跳过"""
+        await self.sensitive_tool.execute(ctx)
+        finalize_by_vip_black(ctx)
+
+    async def guard(self, ctx: SensitiveContext):
+        await self.guard_tool.execute(ctx)
 
     def flow(self):
-        guard_tool = GuardTool()
-        sensitive_tool = SensitiveTool()
-        guard_tool.flow()
-        sensitive_tool.flow()
-        self.promise.then(
-            remove_control_chars,
-            custom_vip_load_by_db,
-        ).then(
-            sensitive_tool.execute, guard_tool.execute
-        ).then(make_decision).then(do_action_by_decision)
+        if self.pipeline.compiled:
+            return
+        self.pipeline.stage(normalize_prompt).stage(custom_vip_load_by_db).stage(
+            self.scan_sensitive, after=[normalize_prompt, custom_vip_load_by_db]
+        ).stage(self.guard, after=[normalize_prompt]).stage(
+            make_decision, after=[self.scan_sensitive, self.guard]
+        ).stage(do_action_by_decision, after=[make_decision]).compile()
 
     @async_perf_count
     async def execute(self, ctx: SensitiveContext):
-        await self.promise.execute(ctx)
+        if not (decision_cache.enabled and decision_cache.cacheable(ctx)):
+            await self.pipeline.execute(ctx)
+            return
+        # 先归一化以计算缓存键，未命中时流程中的 normalize_prompt 阶段随之跳过
+        await normalize_prompt(ctx)
+        data_provider: DataProvider = DataProvider.get_instance()
+        await decision_cache.run(ctx, data_provider.data_version, self.pipeline.execute)
 
 
-class OutputRuleEngineTool:
+class BatchRuleEngineTool(metaclass=SingleTon):
+    """
+    批量规则引擎：同一 app_id 的多条输入共享租户数据解析与扫描提交，
+    guard 与决策按条并发，单条失败不影响其他条目
+    """
+
     def __init__(self) -> None:
-        self.promise = Promise()
+        self.guard_tool = GuardTool()
+        self.sensitive_tool = SensitiveTool()
 
     def flow(self):
-        guard_tool = GuardTool()
-        sensitive_tool = SensitiveTool()
-        guard_tool.flow()
-        sensitive_tool.flow()
-        self.promise.then(remove_control_chars).then(
-            sensitive_tool.execute, guard_tool.execute
+        """各子工具在实例化时已编译，保留以兼容旧调用"""
+
+    async def _guard(self, ctx: SensitiveContext, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            await self.guard_tool.execute(ctx)
+
+    async def _decide(self, ctx: SensitiveContext):
+        make_decision(ctx)
+        await do_action_by_decision(ctx)
+
+    @async_perf_count
+    async def execute(self, ctxs: List[SensitiveContext]) -> List[Exception | None]:
+        """返回与 ctxs 等长的错误列表，None 表示该条成功"""
+        errors: List[Exception | None] = [None] * len(ctxs)
+        if not ctxs:
+            return errors
+
+        await scan_dispatcher.run(
+            _normalize_batch, ctxs, size=sum(len(ctx.input_prompt) for ctx in ctxs)
+        )
+        await custom_vip_load_by_db(ctxs[0])
+
+        semaphore = asyncio.Semaphore(Config.BATCH_GUARD_CONCURRENCY)
+        guard_tasks = [
+            asyncio.ensure_future(self._guard(ctx, semaphore)) for ctx in ctxs
+        ]
+        try:
+            await self.sensitive_tool.execute_batch(ctxs)
+        except Exception as e:
+            for task in guard_tasks:
+                task.cancel()
+            await asyncio.gather(*guard_tasks, return_exceptions=True)
+            return [e] * len(ctxs)
+        # 命中超黑词的条目已定案，取消其尚未完成的 guard 调用
+        for ctx, task in zip(ctxs, guard_tasks):
+            if finalize_by_vip_black(ctx):
+                task.cancel()
+        guard_results = await asyncio.gather(*guard_tasks, return_exceptions=True)
+        for i, result in enumerate(guard_results):
+            if ctxs[i].finalized:
+                continue
+            if isinstance(result, Exception):
+                errors[i] = result
+
+        pending = [
+            i for i, error in enumerate(errors) if error is None and not ctxs[i].finalized
+        ]
+        decide_results = await asyncio.gather(
+            *(self._decide(ctxs[i]) for i in pending), return_exceptions=True
         )
+        for i, result in zip(pending, decide_results):
+            if isinstance(result, Exception):
+                errors[i] = result
+        return errors
+
+
+class OutputRuleEngineTool(metaclass=SingleTon):
+    def __init__(self) -> None:
+        self.pipeline = Pipeline("output_rule_engine")
+        self.sensitive_tool = SensitiveTool()
+        self.guard_tool = GuardTool()
+        self.flow()
+
+    async def scan_sensitive(self, ctx: SensitiveContext):
+        await self.sensitive_tool.execute(ctx)
+
+    async def guard(self, ctx: SensitiveContext):
+        await self.guard_tool.execute(ctx)
+
+    def flow(self):
+        if self.pipeline.compiled:
+            return
+        self.pipeline.stage(normalize_prompt).stage(
+            self.scan_sensitive, after=[normalize_prompt]
+        ).stage(self.guard, after=[normalize_prompt]).stage(
+            make_decision, after=[self.scan_sensitive, self.guard]
+        ).compile()
 
     @async_perf_count
     async def execute(self, ctx: SensitiveContext):
-        pass
+        ctx.is_output = True
+        await self.pipeline.execute(ctx)
+
+
+class StreamOutputRuleEngineTool:
+    """
+    流式输出审核：自动机状态跨分块保留，逐块增量扫描并给出当前决策，
+    决策达到 REJECT 及以上时标记截断。
+    guard 模型不参与逐块判定，规则按 Config.STREAM_GUARD_SAFETY 标签取值。
+    """
+
+    def __init__(self, ctx: SensitiveContext) -> None:
+        self.ctx = ctx
+        self.ctx.is_output = True
+        self.scanner = None
+        self.seq = 0
+        self.cut = False
+
+    async def open(self):
+        self.ctx.safety = Config.STREAM_GUARD_SAFETY
+        self.scanner = await open_stream_scanner(self.ctx)
+
+    async def feed(self, chunk: str) -> dict:
+        text = normalize_text(chunk)
+        result = await scan_dispatcher.run(self.scanner.feed, text, size=len(text))
+        if result:
+            merge_scan_result(self.ctx, result)
+            final_filter(self.ctx)
+            make_decision(self.ctx)
+
+        score = self.ctx.final_decision.get("score", DecisionClassifyEnum.PASS.value)
+        self.cut = score >= DecisionClassifyEnum.REJECT.value
+        self.seq += 1
+        return {
+            "seq": self.seq,
+            "score": score,
+            "hits": {source.name.lower(): tags for source, tags in result.items()},
+            "cut": self.cut,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "scanned_chars": self.scanner.scanned_chars if self.scanner else 0,
+            "final_decision": self.ctx.final_decision,
+            "all_decision_dict": self.ctx.all_decision_dict,
+            "cut": self.cut,
+        }
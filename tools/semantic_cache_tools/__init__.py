@@ -0,0 +1 @@
+from .semantic_cache_tool import SemanticCacheTool, simhash
@@ -1,6 +1,230 @@
-from llm_guard_server.utils.execute_utils import Promise
+"""
+改写结果近重复缓存
+REWRITE 决策的改写需要一次大模型调用（秒级），而改写流量大多集中在少数模板上。
+对归一化文本的字符 n-gram 计算 64 位 SimHash，汉明距离不超过 max_distance 的文本视为近重复，复用其改写结果：
+- 按鸽巢原理将指纹切分为 max_distance + 1 段建立 LSH 索引，距离不超过阈值的两个指纹至少有一段完全相同，
+  查询只比较同段候选，不遍历全部条目；
+- 命中范围限定在同一 app_id 与同一触发敏感词集合内，不同租户、不同命中词的改写不互相复用；
+- 近重复文本的差异片段（常为人名、号码等）可能原样出现在缓存的改写结果里，复用前逐段比对，
+  任一差异片段出现在缓存结果的文本字段中即放弃该候选，避免把上一位用户的内容返回给本次请求；
+- 按条目数与估算内存双重上限做 LRU 淘汰，超过 TTL 视为未命中；改写失败的降级结果不缓存。
+指纹使用进程内 hash()，缓存只在本 worker 内有效。
+"""
+import sys
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
 
+from config import Config
+from utils import SingleTon
+from utils.metrics import metrics
 
-class SemanticCacheTool:
-    def __init__(self) -> None:
-        self.promise = Promise()
+NGRAM = 3
+FINGERPRINT_BITS = 64
+_MASK = (1 << FINGERPRINT_BITS) - 1
+# 每个字节展开为 8 个 32 位计数槽，逐字节查表累加即可统计 64 个比特位上的 1 的个数
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_SPREAD = [
+    sum(((byte >> i) & 1) << (i * _LANE_BITS) for i in range(8)) for byte in range(256)
+]
+# 条目固定开销估算（字节）：指纹、键、索引项与 OrderedDict 节点
+_ENTRY_OVERHEAD = 512
+
+GroupKey = Tuple[str, FrozenSet[str]]
+
+
+def ngrams(text: str, n: int = NGRAM) -> set:
+    text = "".join(text.split()).lower()
+    if len(text) <= n:
+        return {text}
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def simhash(text: str) -> int:
+    """n-gram 去重后等权 SimHash：某一位上为 1 的 n-gram 超过半数时该位取 1"""
+    grams = ngrams(text)
+    lanes = [0] * 8
+    for gram in grams:
+        h = hash(gram)
+        for i in range(8):
+            lanes[i] += _SPREAD[(h >> (i * 8)) & 0xFF]
+    half = len(grams) / 2
+    fingerprint = 0
+    for i, lane in enumerate(lanes):
+        for j in range(8):
+            if (lane >> (j * _LANE_BITS)) & _LANE_MASK > half:
+                fingerprint |= 1 << (i * 8 + j)
+    return fingerprint
+
+
+def _bands(max_distance: int) -> List[Tuple[int, int]]:
+    """(偏移, 掩码) 列表，将 64 位切分为 max_distance + 1 段"""
+    count = max_distance + 1
+    width = FINGERPRINT_BITS // count
+    bands = []
+    for i in range(count):
+        start = i * width
+        end = FINGERPRINT_BITS if i == count - 1 else start + width
+        bands.append((start, (1 << (end - start)) - 1))
+    return bands
+
+
+def diff_spans(a: str, b: str) -> List[str]:
+    """两段文本中不相同的片段（双方各自的非空白差异片段）"""
+    spans = []
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        for span in (a[i1:i2].strip(), b[j1:j2].strip()):
+            if span:
+                spans.append(span)
+    return spans
+
+
+class _Entry:
+    __slots__ = ("group", "fingerprint", "text", "result", "expire", "size")
+
+    def __init__(
+        self, group: GroupKey, fingerprint: int, text: str, result: Dict[str, Any], expire: float
+    ) -> None:
+        self.group = group
+        self.fingerprint = fingerprint
+        self.text = text
+        self.result = result
+        self.expire = expire
+        self.size = _ENTRY_OVERHEAD + sys.getsizeof(text) + sum(
+            sys.getsizeof(v) for v in result.values() if isinstance(v, str)
+        )
+
+    def leaks(self, text: str) -> bool:
+        """与 text 的差异片段是否出现在缓存结果中"""
+        values = [v for v in self.result.values() if isinstance(v, str)]
+        return any(span in value for span in diff_spans(self.text, text) for value in values)
+
+
+class SemanticCacheTool(metaclass=SingleTon):
+    def __init__(
+        self,
+        max_entries: int = Config.SEMANTIC_CACHE_MAX_ENTRIES,
+        max_mb: int = Config.SEMANTIC_CACHE_MAX_MB,
+        ttl: int = Config.SEMANTIC_CACHE_TTL,
+        max_distance: int = Config.SEMANTIC_CACHE_MAX_DISTANCE,
+        min_chars: int = Config.SEMANTIC_CACHE_MIN_CHARS,
+    ) -> None:
+        if not 0 <= max_distance < 16:
+            raise ValueError("SEMANTIC_CACHE_MAX_DISTANCE must be in [0, 16)")
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.min_chars = min_chars
+        self._bands = _bands(max_distance)
+        self._next_id = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # (group, 段序号, 段值) -> 条目 id 集合
+        self._index: Dict[Tuple[GroupKey, int, int], set] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    @staticmethod
+    def group_key(app_id: str, words: Iterable[str]) -> GroupKey:
+        return app_id, frozenset(words)
+
+    def _band_keys(self, group: GroupKey, fingerprint: int):
+        for i, (shift, mask) in enumerate(self._bands):
+            yield group, i, (fingerprint >> shift) & mask
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self.bytes -= entry.size
+        for key in self._band_keys(entry.group, entry.fingerprint):
+            ids = self._index.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._index[key]
+
+    def lookup(self, app_id: str, text: str, words: Iterable[str]) -> Dict[str, Any] | None:
+        """返回汉明距离最近、不超过阈值且不含差异片段的改写结果副本，未命中返回 None"""
+        if not self.enabled or len(text) < self.min_chars:
+            return None
+        group = self.group_key(app_id, words)
+        fingerprint = simhash(text)
+        now = time.monotonic()
+        candidates: Dict[int, int] = {}
+        expired = set()
+        for key in self._band_keys(group, fingerprint):
+            for entry_id in self._index.get(key, ()):
+                entry = self._entries[entry_id]
+                if entry.expire <= now:
+                    expired.add(entry_id)
+                    continue
+                distance = (entry.fingerprint ^ fingerprint).bit_count()
+                if distance <= self.max_distance:
+                    candidates[entry_id] = distance
+        for entry_id in expired:
+            self._remove(entry_id)
+        best_id = None
+        for entry_id in sorted(candidates, key=candidates.__getitem__):
+            if not self._entries[entry_id].leaks(text):
+                best_id = entry_id
+                break
+            self.rejected += 1
+            metrics.inc("semantic_cache_total", result="reject_diff")
+        if best_id is None:
+            self.misses += 1
+            metrics.inc("semantic_cache_total", result="miss")
+            return None
+        self.hits += 1
+        metrics.inc("semantic_cache_total", result="hit")
+        self._entries.move_to_end(best_id)
+        return dict(self._entries[best_id].result)
+
+    def store(self, app_id: str, text: str, words: Iterable[str], result: Dict[str, Any]):
+        if not self.enabled or len(text) < self.min_chars:
+            return
+        group = self.group_key(app_id, words)
+        entry = _Entry(group, simhash(text), text, dict(result), time.monotonic() + self.ttl)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self.bytes += entry.size
+        for key in self._band_keys(group, entry.fingerprint):
+            self._index.setdefault(key, set()).add(entry_id)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "max_entries": self.max_entries,
+            "max_mb": self.max_bytes / 1024 / 1024,
+            "ttl": self.ttl,
+            "max_distance": self.max_distance,
+            "entries": len(self._entries),
+            "estimated_mb": round(self.bytes / 1024 / 1024, 3),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "rejected_diff": self.rejected,
+        }
@@ -1,2 +1,8 @@
-from .sensitive_tool import SensitiveTool
+from .sensitive_tool import (
+    SensitiveTool,
+    scan_dispatcher,
+    open_stream_scanner,
+    merge_scan_result,
+    final_filter,
+)
 from .sensitve_maker import SensitiveAutomatonLoader, SensitiveAutomatonLoaderByDB
\ No newline at end of file
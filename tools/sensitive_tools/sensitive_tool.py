@@ -1,5 +1,6 @@
 import asyncio
-from typing import Dict, Optional, Set
+from weakref import WeakValueDictionary
+from typing import Dict, List, Optional, Set
 from .sensitve_maker import SensitiveAutomatonLoader
 # from config import (
     # SENSITIVE_DICT,
@@ -12,23 +13,30 @@ from .sensitve_maker import SensitiveAutomatonLoader
     # CUSTOMIZE_RULE_VIP_WHITE_WORDS_DICT,
     # CUSTOMIZE_RULE_VIP_WHITE_WORDS_PATH,
 # )
-from utils import Promise, run_in_async, async_perf_count
+from utils import Pipeline, SingleTon, run_in_async, async_perf_count, AdaptiveDispatcher
 from models import SensitiveContext
+from config import Config
 from sanic.log import logger
 
 from tools.data_tool import DataProvider
+from tools.data_tool.ac_tool import HitSource, EffectiveStreamScanner
+from tools.string_filter_tools import map_span
 
 
-_APP_LOCKS: Dict[str, asyncio.Lock] = {}
-_GLOBAL_LOCK = asyncio.Lock()
+# 弱引用：没有协程持有时锁随之回收
+_APP_LOCKS: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+# 扫描层统一的内联/线程池调度器，归一化也复用
+scan_dispatcher = AdaptiveDispatcher(
+    "scan", Config.SCAN_INLINE_MAX_CHARS, Config.SCAN_INLINE_BUDGET_US
+)
 
 
 async def _get_lock_by_app_id(app_id: str) -> asyncio.Lock:
-    if app_id not in _APP_LOCKS:
-        async with _GLOBAL_LOCK:
-            if app_id not in _APP_LOCKS:
-                _APP_LOCKS[app_id] = asyncio.Lock()
-    return _APP_LOCKS[app_id]
+    lock = _APP_LOCKS.get(app_id)
+    if lock is None:
+        lock = _APP_LOCKS[app_id] = asyncio.Lock()
+    return lock
 
 
 # async def customize_ac_load(
@@ -59,10 +67,11 @@ async def customize_vip_black_load_and_scan_by_db(ctx: SensitiveContext):
     data_provider: DataProvider = DataProvider.get_instance()
     ctx.vip_black_words_result = {}
     if ctx.use_vip_black:
-        await data_provider.build_ac("vip", ctx.app_id)
-        custom_vip = data_provider.custom_vip.get(ctx.app_id)
+        custom_vip = await data_provider.load_tenant("vip", ctx.app_id)
         if custom_vip and custom_vip.black_ac:
-            result = await run_in_async(custom_vip.black_ac.scan, ctx.input_prompt)
+            result = await scan_dispatcher.run(
+                custom_vip.black_ac.scan, ctx.input_prompt, size=len(ctx.input_prompt)
+            )
             ctx.vip_black_words_result = result
 
 
@@ -70,10 +79,11 @@ async def customize_vip_white_load_and_scan_by_db(ctx: SensitiveContext):
     data_provider: DataProvider = DataProvider.get_instance()
     ctx.vip_white_words_result = {}
     if ctx.use_vip_white:
-        await data_provider.build_ac("vip", ctx.app_id)
-        custom_vip = data_provider.custom_vip.get(ctx.app_id)
+        custom_vip = await data_provider.load_tenant("vip", ctx.app_id)
         if custom_vip and custom_vip.white_ac:
-            result = await run_in_async(custom_vip.white_ac.scan, ctx.input_prompt)
+            result = await scan_dispatcher.run(
+                custom_vip.white_ac.scan, ctx.input_prompt, size=len(ctx.input_prompt)
+            )
             ctx.vip_white_words_result = result
 
 
@@ -162,15 +172,14 @@ async def customize_vip_white_load_and_scan_by_db(ctx: SensitiveContext):
 async def customize_load_and_scan_by_db(ctx: SensitiveContext):
     data_provider: DataProvider = DataProvider.get_instance()
 
-    if ctx.use_customize_words:
-        if ctx.app_id not in data_provider.custom_ac:
-            await data_provider.build_ac("customize", ctx.app_id)
-    else:
+    if not ctx.use_customize_words:
         ctx.customize_result = {}
         return
-    ac_container = data_provider.custom_ac.get(ctx.app_id)
+    ac_container = await data_provider.load_tenant("customize", ctx.app_id)
     if ac_container and ac_container.black_ac:
-        result = await run_in_async(ac_container.black_ac.scan, ctx.input_prompt)
+        result = await scan_dispatcher.run(
+            ac_container.black_ac.scan, ctx.input_prompt, size=len(ctx.input_prompt)
+        )
         ctx.customize_result = result
     else:
         ctx.customize_result = {}
@@ -179,12 +188,125 @@ async def customize_load_and_scan_by_db(ctx: SensitiveContext):
 async def global_load_and_scan_by_db(ctx: SensitiveContext):
     data_provider: DataProvider = DataProvider.get_instance()
     if data_provider.global_ac:
-        result = await run_in_async(data_provider.global_ac.scan, ctx.input_prompt)
+        result = await scan_dispatcher.run(
+            data_provider.global_ac.scan, ctx.input_prompt, size=len(ctx.input_prompt)
+        )
         ctx.global_result = result
     else:
         ctx.global_result = {}
 
 
+def _scan_sources(ctx: SensitiveContext) -> HitSource:
+    sources = HitSource.GLOBAL
+    if ctx.use_customize_words:
+        sources |= HitSource.CUSTOM_BLACK
+    if ctx.use_vip_black:
+        sources |= HitSource.VIP_BLACK
+    if ctx.use_vip_white:
+        sources |= HitSource.VIP_WHITE
+    return sources
+
+
+def _apply_scan_result(ctx: SensitiveContext, result: dict, counts: dict | None = None):
+    ctx.global_result = result.get(HitSource.GLOBAL, {})
+    ctx.customize_result = result.get(HitSource.CUSTOM_BLACK, {})
+    ctx.vip_black_words_result = result.get(HitSource.VIP_BLACK, {})
+    ctx.vip_white_words_result = result.get(HitSource.VIP_WHITE, {})
+    ctx.hit_counts = (
+        {source.name.lower(): contains for source, contains in counts.items()}
+        if counts
+        else {}
+    )
+    if ctx.hit_counts and ctx.original_input_prompt is not None:
+        # spans 基于归一化文本，origin_spans 回映到原始输入
+        for contains in ctx.hit_counts.values():
+            for words in contains.values():
+                for entry in words.values():
+                    entry["origin_spans"] = [
+                        list(map_span(ctx.input_offsets, start, end))
+                        for start, end in entry["spans"]
+                    ]
+
+
+async def effective_load_and_scan_by_db(ctx: SensitiveContext):
+    """
+    通用、自定义、超黑、超白合并为租户生效词典，一次扫描按来源拆分结果
+    """
+    data_provider: DataProvider = DataProvider.get_instance()
+    _apply_scan_result(ctx, {})
+
+    effective_ac = await data_provider.get_effective_ac(ctx.app_id)
+    if not effective_ac:
+        return
+
+    result, counts = await scan_dispatcher.run(
+        effective_ac.scan_detail,
+        ctx.input_prompt,
+        _scan_sources(ctx),
+        ctx.use_customize_white,
+        ctx.scan_mode,
+        size=len(ctx.input_prompt),
+    )
+    _apply_scan_result(ctx, result, counts)
+
+
+def merge_scan_result(ctx: SensitiveContext, result: dict):
+    """流式场景：将分块命中累加到 ctx 各来源结果中"""
+    for source, attr in (
+        (HitSource.GLOBAL, "global_result"),
+        (HitSource.CUSTOM_BLACK, "customize_result"),
+        (HitSource.VIP_BLACK, "vip_black_words_result"),
+        (HitSource.VIP_WHITE, "vip_white_words_result"),
+    ):
+        contains = result.get(source)
+        if not contains:
+            continue
+        merged = getattr(ctx, attr)
+        for tag_code, words in contains.items():
+            merged.setdefault(tag_code, []).extend(words)
+
+
+async def open_stream_scanner(ctx: SensitiveContext) -> EffectiveStreamScanner:
+    data_provider: DataProvider = DataProvider.get_instance()
+    _apply_scan_result(ctx, {})
+    effective_ac = await data_provider.get_effective_ac(ctx.app_id)
+    return EffectiveStreamScanner(
+        effective_ac, _scan_sources(ctx), ctx.use_customize_white
+    )
+
+
+async def effective_batch_scan_by_db(ctxs: List[SensitiveContext]):
+    """
+    批量扫描：同一 app_id 只解析一次生效词典，每 BATCH_CHUNK_SIZE 条整体提交一次调度器
+    """
+    if not ctxs:
+        return
+    data_provider: DataProvider = DataProvider.get_instance()
+    for ctx in ctxs:
+        _apply_scan_result(ctx, {})
+
+    head = ctxs[0]
+    effective_ac = await data_provider.get_effective_ac(head.app_id)
+    if not effective_ac:
+        return
+
+    sources = _scan_sources(head)
+    chunk_size = Config.BATCH_CHUNK_SIZE
+    for i in range(0, len(ctxs), chunk_size):
+        chunk = ctxs[i : i + chunk_size]
+        texts = [ctx.input_prompt for ctx in chunk]
+        results = await scan_dispatcher.run(
+            effective_ac.scan_batch,
+            texts,
+            sources,
+            head.use_customize_white,
+            head.scan_mode,
+            size=sum(map(len, texts)),
+        )
+        for ctx, (result, counts) in zip(chunk, results):
+            _apply_scan_result(ctx, result, counts)
+
+
 # async def global_load_and_scan(ctx: SensitiveContext):
 #     global_ac: SensitiveAutomatonLoader | None = SENSITIVE_DICT.get("global")
 #     if global_ac:
@@ -194,29 +316,21 @@ async def global_load_and_scan_by_db(ctx: SensitiveContext):
 #         ctx.global_result = {}
 
 
-async def final_filter(ctx: SensitiveContext):
+def final_filter(ctx: SensitiveContext):
+    """
+    合并通用与自定义结果。白名单已在构建生效词典时打标并在扫描时剔除，此处不再做集合差。
+    """
     ctx.final_result = {}
 
     merged_keys = ctx.global_result.keys() | ctx.customize_result.keys()
     if not merged_keys:
         return
 
-    data_provider: DataProvider = DataProvider.get_instance()
-    this_data = data_provider.custom_ac.get(ctx.app_id)
-
-    white_set: Set[str] = set()
-
-    if ctx.use_customize_white:
-        if this_data and this_data.white_ac:
-            white_set = this_data.white_ac
     for key in merged_keys:
-        global_words = set(ctx.global_result.get(key, []))
-        customize_words = set(ctx.customize_result.get(key, []))
-        global_words = (
-            global_words - customize_words
-        )  #  防止一个词在两个通用和自定义中都出现，如果出现则只保留自定义
-        merged_words = global_words | customize_words
-        final_words = merged_words - white_set
+        #  同一个词在通用和自定义中都出现时只保留一份
+        final_words = set(ctx.global_result.get(key, [])) | set(
+            ctx.customize_result.get(key, [])
+        )
 
         if final_words:
             ctx.final_result[key] = list(final_words)
@@ -250,7 +364,7 @@ async def white_load_and_filter(ctx: SensitiveContext):
         return
 
     data_provider: DataProvider = DataProvider.get_instance()
-    this_data = data_provider.custom_ac.get(ctx.app_id)
+    this_data = data_provider.get_tenant("customize", ctx.app_id)
 
     white_set: Set[str] = set()
 
@@ -271,32 +385,45 @@ async def white_load_and_filter(ctx: SensitiveContext):
             ctx.final_result[key] = list(final_words)
 
 
-class SensitiveTool:
+class SensitiveTool(metaclass=SingleTon):
     def __init__(self) -> None:
-        self.promise: Promise = Promise()
+        self.pipeline: Pipeline = Pipeline("sensitive")
+        self.flow()
 
     def flow(self):
         """
         Docstring for flow
         超黑超白涉及敏感词的在此处加载。
+        阶段图在实例化时编译一次，重复调用不再重复声明。
         :param self: Description
         """
+        if self.pipeline.compiled:
+            return
         # self.promise.then(
         # customize_vip_black_load_and_scan_by_db,
         # customize_vip_load_black_words_and_scan,
         # customize_vip_white_load_and_scan_by_db,
         # customize_vip_load_white_words_and_scan,
         # )
-        self.promise.then(
-            customize_load_and_scan_by_db,
+        self.pipeline.stage(
+            effective_load_and_scan_by_db,
+            # customize_load_and_scan_by_db,
             # customize_load_and_scan,
-            global_load_and_scan_by_db,
+            # global_load_and_scan_by_db,
             # global_load_and_scan,
-        ).then(
-            final_filter
+        ).stage(
+            final_filter,
             # white_load_and_filter
-        )
+            after=[effective_load_and_scan_by_db],
+        ).compile()
 
     @async_perf_count
     async def execute(self, ctx: SensitiveContext):
-        return await self.promise.execute(ctx)
+        return await self.pipeline.execute(ctx)
+
+    @async_perf_count
+    async def execute_batch(self, ctxs: List[SensitiveContext]):
+        await effective_batch_scan_by_db(ctxs)
+        for ctx in ctxs:
+            final_filter(ctx)
+        return ctxs
@@ -1 +1,6 @@
-from .str_filter import remove_control_chars
+from .str_filter import (
+    remove_control_chars,
+    normalize_text,
+    normalize_with_offsets,
+    map_span,
+)
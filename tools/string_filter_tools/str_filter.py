@@ -1,6 +1,9 @@
+import sys
 import unicodedata
 import re
-from models import SensitiveContext
+from bisect import bisect_right
+from typing import List, Tuple
+from models import SensitiveContext, ScanMode
 
 
 def unicode_input(text: str) -> str:
@@ -16,6 +19,28 @@ def unicode_input(text: str) -> str:
     return clean_text.strip()
 
 
+def _build_cf_pattern() -> re.Pattern:
+    """
+    所有 Unicode 类别为 'Cf' (Format) 的码位，包括零宽空格、双向控制符等，
+    合并为连续区间的字符类，一次 re.sub 删除（ASCII 范围内没有 Cf 字符）。
+    对中文等非 ASCII 文本，区间字符类比逐字符查表的 str.translate 更快。
+    """
+    ranges: List[List[int]] = []
+    for cp in range(sys.maxunicode + 1):
+        if unicodedata.category(chr(cp)) != "Cf":
+            continue
+        if ranges and ranges[-1][1] == cp - 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    return re.compile(
+        "[" + "".join(f"\\U{a:08x}-\\U{b:08x}" for a, b in ranges) + "]"
+    )
+
+
+CF_PATTERN = _build_cf_pattern()
+
+
 def remove_control_chars(ctx: SensitiveContext):
     """
     # 1. Unicode 归一化 (NFKC 模式)
@@ -23,12 +48,64 @@ def remove_control_chars(ctx: SensitiveContext):
     # 例如：'Ｈｅｌｌｏ' -> 'Hello', '①' -> '1'
     # 2.移除所有 Unicode 类别为 'Cf' (Format) 的字符。
     # 包括零宽空格、双向控制符等。
+    # scan_mode=count 时同时保留归一化文本到原文的位置映射，用于回映命中位置
     """
-    normalized_text = unicodedata.normalize("NFKC", ctx.input_prompt)
+    ctx.original_input_prompt = ctx.input_prompt
+    if ctx.scan_mode == ScanMode.COUNT:
+        ctx.input_prompt, ctx.input_offsets = normalize_with_offsets(ctx.input_prompt)
+    else:
+        ctx.input_prompt = normalize_text(ctx.input_prompt)
+    ctx.normalized = True
 
-    normalized_text = "".join(
-        ch for ch in normalized_text if unicodedata.category(ch) != "Cf"
-    )
 
-    ctx.original_input_prompt = ctx.input_prompt
-    ctx.input_prompt = normalized_text
+def normalize_text(text: str) -> str:
+    """NFKC 归一化并移除 Cf 类字符，流式分块等非 ctx 场景直接使用"""
+    # 纯 ASCII 文本 NFKC 不变且不含 Cf 字符
+    if text.isascii():
+        return text
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    return CF_PATTERN.sub("", text)
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int] | None]:
+    """
+    归一化并返回位置映射 offsets：归一化文本第 i 个字符来自原文 offsets[i] 开始的片段，
+    末尾追加 len(text) 作为哨兵。映射为 None 表示与原文逐字对应。
+    按"起始字符 + 后续组合字符"分段归一化；极少数跨起始字符组合（如谚文字母）分段结果与整体归一化不同，
+    此时以整体归一化结果为准，所有字符映射到整段原文，保证与 normalize_text 输出一致。
+    """
+    if text.isascii():
+        return text, None
+    if unicodedata.is_normalized("NFKC", text):
+        if not CF_PATTERN.search(text):
+            return text, None
+        offsets = [i for i, ch in enumerate(text) if not CF_PATTERN.match(ch)]
+        offsets.append(len(text))
+        return CF_PATTERN.sub("", text), offsets
+
+    parts: List[str] = []
+    offsets: List[int] = []
+    start = 0
+    for i in range(1, len(text) + 1):
+        if i < len(text) and unicodedata.combining(text[i]):
+            continue
+        segment = CF_PATTERN.sub("", unicodedata.normalize("NFKC", text[start:i]))
+        parts.append(segment)
+        offsets.extend([start] * len(segment))
+        start = i
+    normalized = normalize_text(text)
+    if "".join(parts) != normalized:
+        return normalized, [0] * len(normalized) + [len(text)]
+    offsets.append(len(text))
+    return normalized, offsets
+
+
+def map_span(offsets: List[int] | None, start: int, end: int) -> Tuple[int, int]:
+    """将归一化文本上的 [start, end) 映射回原文位置"""
+    if offsets is None:
+        return start, end
+    origin_start = offsets[start]
+    # 结束位置取最后一个命中字符所在片段的下一个片段起点
+    origin_end = offsets[bisect_right(offsets, offsets[end - 1], lo=end - 1)]
+    return origin_start, origin_end
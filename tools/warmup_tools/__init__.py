@@ -0,0 +1 @@
+from .warmup_tool import Readiness, Warmup, recent_tenants_from_audit
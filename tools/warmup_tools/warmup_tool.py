@@ -0,0 +1,181 @@
+"""
+就绪状态与冷启动预热
+worker 启动后依次经历 loading（加载词典）→ warming（预热）→ ready，
+负载均衡以 /ready 为探针，预热完成前不接入流量。
+预热：预构建指定租户与审计日志中近期活跃租户的容器与生效词典，
+并以合成请求走一遍完整的 InputRuleEngineTool 流程（线程池、调度器计时、决策等），
+合成请求不写入决策结果缓存。
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List
+
+from sanic.log import logger
+
+from config import Config
+from models import SensitiveContext
+from utils import run_in_async
+from utils.logging_config import AUDIT_LOG_FILE
+from ..data_tool import DataProvider
+from ..data_tool.ac_tool import EffectiveAutomatonLoader
+from ..rule_engine_tools import InputRuleEngineTool
+
+
+WARMUP_PLACEHOLDER_APP_ID = "_warmup_"
+
+
+class Readiness:
+    STARTING = "starting"
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self) -> None:
+        self.stage = self.STARTING
+        self.started_at = time.time()
+        self._stage_start = time.perf_counter_ns()
+        # 各阶段耗时（ms）
+        self.stage_cost: Dict[str, float] = {}
+        self.error: str | None = None
+        self.warmup: "Warmup | None" = None
+
+    @property
+    def ready(self) -> bool:
+        return self.stage == self.READY
+
+    def enter(self, stage: str):
+        now = time.perf_counter_ns()
+        self.stage_cost[self.stage] = round((now - self._stage_start) / 1e6, 3)
+        self.stage = stage
+        self._stage_start = now
+        logger.info(f"worker {os.getpid()} enter stage {stage}, cost {self.stage_cost}")
+
+    def fail(self, error: Exception):
+        self.error = str(error)
+        self.enter(self.FAILED)
+
+    def stats(self, data_provider: DataProvider) -> dict:
+        snapshot = data_provider.export_snapshot()
+        return {
+            "ready": self.ready,
+            "stage": self.stage,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 3),
+            "stage_cost_ms": self.stage_cost,
+            "data_version": snapshot.data_version,
+            "global_loaded": snapshot.global_ac is not None,
+            "tenants": {
+                "custom": len(snapshot.custom_ac or {}),
+                "vip": len(snapshot.custom_vip or {}),
+                "effective": len(snapshot.effective_ac),
+            },
+            "warmup": self.warmup.stats() if self.warmup else None,
+            "error": self.error,
+        }
+
+
+def recent_tenants_from_audit(path: str, limit: int, tail_bytes: int) -> List[str]:
+    """读取审计日志末尾 tail_bytes 字节，按请求次数从多到少返回 app_id"""
+    if limit <= 0 or not os.path.exists(path):
+        return []
+    counter: Counter = Counter()
+    with open(path, "rb") as f:
+        f.seek(max(os.path.getsize(path) - tail_bytes, 0))
+        for line in f:
+            start = line.find(b"{")
+            if start < 0 or b'"app_id"' not in line:
+                continue
+            try:
+                request = json.loads(line[start:]).get("request")
+            except ValueError:
+                # 首行可能被截断
+                continue
+            if isinstance(request, dict) and isinstance(request.get("app_id"), str):
+                counter[request["app_id"]] += 1
+    return [app_id for app_id, _ in counter.most_common(limit)]
+
+
+class Warmup:
+    def __init__(self, data_provider: DataProvider) -> None:
+        self.data_provider = data_provider
+        self.app_ids: List[str] = []
+        self.done = 0
+        self.failed = 0
+        self.scans = 0
+
+    async def collect_app_ids(self) -> List[str]:
+        """配置的租户在前，其后补充审计日志中的活跃租户"""
+        app_ids = [app_id.strip() for app_id in Config.WARMUP_APP_IDS.split(",") if app_id.strip()]
+        recent = await run_in_async(
+            recent_tenants_from_audit,
+            str(AUDIT_LOG_FILE),
+            Config.WARMUP_AUDIT_TENANTS,
+            Config.WARMUP_AUDIT_TAIL_MB * 1024 * 1024,
+        )
+        return list(dict.fromkeys(app_ids + recent))
+
+    def _prompts(self, effective: EffectiveAutomatonLoader | None) -> List[str]:
+        """短文本走内联扫描，长文本走线程池；另取几个词典词条，让命中与决策路径也被执行"""
+        words: List[str] = []
+        if effective and effective.automaton:
+            for word in effective.automaton.keys():
+                if len(word) > 1:
+                    words.append(word)
+                if len(words) >= 5:
+                    break
+        prompts = ["你好，请介绍一下你自己。", "预热" * (Config.SCAN_INLINE_MAX_CHARS + 1)]
+        if words:
+            prompts.append("，".join(words))
+        return prompts
+
+    async def _scan(self, app_id: str, prompt: str):
+        # 合成请求按输出审核处理，不触发改写，不调用改写大模型
+        ctx = SensitiveContext(
+            request_id=f"warmup-{uuid.uuid4()}",
+            app_id=app_id,
+            apikey="warmup",
+            is_output=True,
+            use_customize_white=True,
+            use_customize_words=True,
+            use_customize_rule=True,
+            use_vip_black=True,
+            use_vip_white=True,
+            input_prompt=prompt,
+        )
+        # 直接执行流程，绕过整体决策结果缓存与请求级耗时统计，合成请求不占缓存、不计入统计
+        tool = InputRuleEngineTool()
+        await tool.pipeline.execute(ctx)
+        self.scans += 1
+
+    async def _warm_tenant(self, app_id: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                effective = await self.data_provider.get_effective_ac(app_id)
+                for prompt in self._prompts(effective):
+                    await self._scan(app_id, prompt)
+                self.done += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"warmup {app_id} failed: {e}")
+
+    async def run(self):
+        # 没有可预热的租户时以占位租户预热通用词典流程
+        self.app_ids = await self.collect_app_ids() or [WARMUP_PLACEHOLDER_APP_ID]
+        semaphore = asyncio.Semaphore(Config.WARMUP_CONCURRENCY)
+        await asyncio.gather(
+            *[self._warm_tenant(app_id, semaphore) for app_id in self.app_ids]
+        )
+        logger.info(f"warmup finished: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "total": len(self.app_ids),
+            "done": self.done,
+            "failed": self.failed,
+            "scans": self.scans,
+        }
@@ -1,3 +1,3 @@
-from .execute_utils import Promise, run_in_async, async_perf_count
+from .execute_utils import Promise, Pipeline, run_in_async, async_perf_count, AdaptiveDispatcher
 from .llm_chat import LLMManager
 from .public import SingleTon
@@ -1,30 +1,37 @@
 import asyncio
-from typing import Any, List, Callable, Any, TypeVar
+from collections import deque
+from typing import Any, Dict, Iterable, List, Callable, Any, Tuple, TypeVar
 from functools import partial
 from functools import wraps
 from sanic.log import logger
+from config import Config
+from .metrics import metrics
 import time
 
 T = TypeVar("T")
 
 
 def async_perf_count(func):
+    """记录耗时直方图（stage 为函数限定名）；异常计数后原样抛出"""
+    stage = func.__qualname__
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        instance_name: str = ''
-        if args:
-            self_obj = args[0]
-            instance_name = getattr(self_obj, 'name', self_obj.__class__.__name__)
         start = time.perf_counter_ns()
-        func_name = func.__name__
         try:
-            result = await func(*args, **kwargs)
-            return result
-        except Exception as e:
-            print(e)
+            return await func(*args, **kwargs)
+        except BaseException:
+            metrics.inc("stage_errors_total", stage=stage)
+            raise
         finally:
-            cost = time.perf_counter_ns() - start
-            logger.info(f"{instance_name} {func_name} takes {cost/1e6} ms to execute")
+            cost = (time.perf_counter_ns() - start) / 1e6
+            metrics.observe("stage_latency_ms", cost, stage=stage)
+            if Config.PERF_LOG_ENABLED:
+                instance_name: str = ''
+                if args:
+                    self_obj = args[0]
+                    instance_name = getattr(self_obj, 'name', self_obj.__class__.__name__)
+                logger.info(f"{instance_name} {func.__name__} takes {cost} ms to execute")
 
     return wrapper
 
@@ -48,23 +55,219 @@ class Promise:
         self._chains.append(funcs)
         return self
 
-    async def async_run_with_wraps(self, func: Callable):
+    async def async_run_with_wraps(self, func: Callable, ctx: Any = None):
+        # ctx 显式传递，同一条链可被并发执行（self.ctx 仅保留最近一次，兼容旧用法）
+        ctx = self.ctx if ctx is None else ctx
         if asyncio.iscoroutinefunction(func):
-            await func(self.ctx)
+            await func(ctx)
         else:
-            await run_in_async(func, self.ctx)
+            await run_in_async(func, ctx)
+
+    @staticmethod
+    def is_finalized(ctx: Any) -> bool:
+        return bool(getattr(ctx, "finalized", False))
+
+    async def _run_layer(self, chain, ctx: Any):
+        """
+        并发执行同一层的各阶段。任一阶段完成后 ctx 已定案时，
+        取消仍在运行的兄弟阶段（如 guard 模型调用）；任一阶段异常时同样取消其余阶段后抛出。
+        """
+        pending = {
+            asyncio.ensure_future(self.async_run_with_wraps(func, ctx)) for func in chain
+        }
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    task.result()
+                if self.is_finalized(ctx):
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
 
     async def execute(self, ctx: Any):
+        """逐层执行；某一阶段将 ctx 定案（ctx.finalized）后跳过剩余各层"""
         self.ctx = ctx
         for chain in self._chains:
+            if self.is_finalized(ctx):
+                break
             if len(chain) == 1:
                 func = chain[0]
-                await self.async_run_with_wraps(func)
+                await self.async_run_with_wraps(func, ctx)
             else:
-                tasks = [self.async_run_with_wraps(func) for func in chain]
-                await asyncio.gather(*tasks)
+                await self._run_layer(chain, ctx)
+
+        return ctx
+
+
+class Stage:
+    __slots__ = ("name", "func", "after", "is_async", "blocking")
+
+    def __init__(self, name: str, func: Callable, after: Tuple[str, ...], blocking: bool) -> None:
+        self.name = name
+        self.func = func
+        self.after = after
+        self.is_async = asyncio.iscoroutinefunction(func)
+        # 同步且耗时的阶段投递线程池，其余同步阶段直接调用
+        self.blocking = blocking and not self.is_async
+
+    async def run_blocking(self, ctx: Any):
+        await run_in_async(self.func, ctx)
+
+    async def run_timed(self, ctx: Any, label: str):
+        start = time.perf_counter_ns()
+        try:
+            if self.blocking:
+                await self.run_blocking(ctx)
+            else:
+                await self.func(ctx)
+        finally:
+            metrics.observe("stage_latency_ms", (time.perf_counter_ns() - start) / 1e6, stage=label)
+
+
+class Pipeline:
+    """
+    编译后的阶段 DAG，启动时构建一次，各请求并发共享。
+    阶段以 stage(func, after=[...]) 声明依赖，compile() 校验并拓扑排序；
+    执行状态（剩余依赖计数、运行中任务）均为 execute 的局部变量，实例本身不保存请求上下文。
+    执行时依赖就绪即启动，不按层等待：
+    - 同步阶段直接调用，不创建任务、不进线程池（blocking=True 的除外）；
+    - 各阶段耗时记入 stage_latency_ms 直方图；
+    - 只有一个可运行的异步阶段时直接 await，多个时才创建任务并发执行；
+    - 任一阶段后 ctx 已定案（ctx.finalized）时跳过其余阶段并取消运行中的阶段，异常时同样取消后抛出。
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self._stages: List[Stage] = []
+        self._compiled = False
+        self._order: Tuple[int, ...] = ()
+        self._indegree: Tuple[int, ...] = ()
+        self._children: Tuple[Tuple[int, ...], ...] = ()
+        self._roots: Tuple[int, ...] = ()
+        # 指标标签 "{pipeline}.{stage}"，编译时生成，执行时不再拼接
+        self._labels: Tuple[str, ...] = ()
+
+    def stage(
+        self,
+        func: Callable,
+        after: Iterable[Callable | str] = (),
+        name: str | None = None,
+        blocking: bool = False,
+    ) -> "Pipeline":
+        if self._compiled:
+            raise RuntimeError(f"pipeline {self.name} already compiled")
+        name = name or getattr(func, "__name__", repr(func))
+        after = tuple(dep if isinstance(dep, str) else dep.__name__ for dep in after)
+        self._stages.append(Stage(name, func, after, blocking))
+        return self
+
+    def compile(self) -> "Pipeline":
+        index = {}
+        for i, stage in enumerate(self._stages):
+            if stage.name in index:
+                raise ValueError(f"pipeline {self.name}: duplicate stage {stage.name}")
+            index[stage.name] = i
+        indegree = [0] * len(self._stages)
+        children: List[List[int]] = [[] for _ in self._stages]
+        for i, stage in enumerate(self._stages):
+            for dep in stage.after:
+                if dep not in index:
+                    raise ValueError(f"pipeline {self.name}: {stage.name} depends on unknown stage {dep}")
+                children[index[dep]].append(i)
+                indegree[i] += 1
+
+        # Kahn 拓扑排序，校验无环
+        remaining = list(indegree)
+        queue = [i for i, degree in enumerate(remaining) if degree == 0]
+        order = []
+        while queue:
+            i = queue.pop(0)
+            order.append(i)
+            for child in children[i]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    queue.append(child)
+        if len(order) != len(self._stages):
+            raise ValueError(f"pipeline {self.name}: dependency cycle detected")
 
-        return self.ctx
+        self._order = tuple(order)
+        self._indegree = tuple(indegree)
+        self._children = tuple(tuple(c) for c in children)
+        self._roots = tuple(i for i in order if indegree[i] == 0)
+        self._labels = tuple(
+            f"{self.name}.{stage.name}" if self.name else stage.name for stage in self._stages
+        )
+        self._compiled = True
+        return self
+
+    @property
+    def compiled(self) -> bool:
+        return self._compiled
+
+    @property
+    def stages(self) -> List[str]:
+        """按拓扑序的阶段名"""
+        return [self._stages[i].name for i in self._order]
+
+    async def execute(self, ctx: Any):
+        if not self._compiled:
+            self.compile()
+        stages = self._stages
+        labels = self._labels
+        children = self._children
+        indegree = list(self._indegree)
+        ready = deque(self._roots)
+        running: Dict[asyncio.Future, int] = {}
+
+        def complete(i: int):
+            for child in children[i]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+
+        try:
+            while ready or running:
+                while ready:
+                    if Promise.is_finalized(ctx):
+                        return ctx
+                    i = ready.popleft()
+                    stage = stages[i]
+                    if not stage.is_async and not stage.blocking:
+                        start = time.perf_counter_ns()
+                        stage.func(ctx)
+                        metrics.observe(
+                            "stage_latency_ms", (time.perf_counter_ns() - start) / 1e6, stage=labels[i]
+                        )
+                        complete(i)
+                        continue
+                    coro = stage.run_timed(ctx, labels[i])
+                    if not ready and not running:
+                        # 唯一可运行的阶段：直接 await，不创建任务
+                        await coro
+                        complete(i)
+                    else:
+                        running[asyncio.ensure_future(coro)] = i
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    i = running.pop(task)
+                    task.result()
+                    complete(i)
+                if Promise.is_finalized(ctx):
+                    return ctx
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return ctx
 
 
 async def run_in_async(func: Callable[..., T], *args: Any, **kwargs: Any):
@@ -75,3 +278,64 @@ async def run_in_async(func: Callable[..., T], *args: Any, **kwargs: Any):
         return await loop.run_in_executor(None, func_call)
     else:
         return await loop.run_in_executor(None, func, *args)
+
+
+class AdaptiveDispatcher:
+    """
+    按输入长度与实测单字符耗时，逐次决定内联执行还是投递到线程池。
+    短输入的计算耗时往往低于线程切换、Future 创建与 GIL 交接的开销，直接内联；
+    超过 inline_max_chars 或预估耗时超过 inline_budget_us 的长输入仍投递线程池，保证事件循环不被阻塞。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        inline_max_chars: int = 2000,
+        inline_budget_us: int = 200,
+        alpha: float = 0.1,
+    ) -> None:
+        self.name = name
+        self.inline_max_chars = inline_max_chars
+        self.inline_budget_ns = inline_budget_us * 1000
+        self.alpha = alpha
+        # 各函数的单字符耗时 EWMA (ns)
+        self.per_char_ns: Dict[str, float] = {}
+        self.inline_count = 0
+        self.executor_count = 0
+
+    def _observe(self, key: str, size: int, cost_ns: int):
+        per_char = cost_ns / max(size, 1)
+        last = self.per_char_ns.get(key)
+        self.per_char_ns[key] = (
+            per_char if last is None else last + self.alpha * (per_char - last)
+        )
+
+    def _timed_call(self, key: str, size: int, func: Callable[..., T], *args: Any) -> T:
+        start = time.perf_counter_ns()
+        result = func(*args)
+        self._observe(key, size, time.perf_counter_ns() - start)
+        return result
+
+    def should_inline(self, key: str, size: int) -> bool:
+        if size > self.inline_max_chars:
+            return False
+        per_char = self.per_char_ns.get(key)
+        return per_char is None or size * per_char <= self.inline_budget_ns
+
+    async def run(self, func: Callable[..., T], *args: Any, size: int) -> T:
+        key = getattr(func, "__qualname__", repr(func))
+        if self.should_inline(key, size):
+            self.inline_count += 1
+            return self._timed_call(key, size, func, *args)
+        self.executor_count += 1
+        return await run_in_async(self._timed_call, key, size, func, *args)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "inline_max_chars": self.inline_max_chars,
+            "inline_budget_us": self.inline_budget_ns / 1000,
+            "inline_count": self.inline_count,
+            "executor_count": self.executor_count,
+            "per_char_ns": {k: round(v, 3) for k, v in self.per_char_ns.items()},
+        }
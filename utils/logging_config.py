@@ -71,6 +71,18 @@ def setup_async_logging():
 
     return log_queue
 
+def restart_async_logging():
+    """fork 出的 worker 不会继承监听线程，需在子进程内基于同一队列重新启动"""
+    global _queue_listener
+    if _queue_listener is None:
+        return
+    _queue_listener = logging.handlers.QueueListener(
+        _queue_listener.queue,
+        *_queue_listener.handlers,
+        respect_handler_level=True
+    )
+    _queue_listener.start()
+
 def stop_async_logging():
     """Stop the async logging queue listener"""
     global _queue_listener
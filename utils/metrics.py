@@ -0,0 +1,289 @@
+"""
+进程内指标
+各阶段、各决策结果、各租户的耗时直方图、计数器与瞬时值（gauge），只在事件循环线程内更新，无需加锁：
+一次记录为一次二分查找与两次整数加法，不格式化字符串、不写日志。
+多 worker 时各 worker 定期将快照写入 METRICS_DIR/worker-{pid}.json，
+/metrics 合并本 worker 的实时数据与其他 worker 的快照，输出 Prometheus 文本格式。
+"""
+import json
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from sanic.log import logger
+
+from config import Config
+
+PREFIX = "guardrails_"
+# 桶上界（ms），最后一个桶为 +Inf
+BUCKETS_MS: Tuple[float, ...] = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)
+# 租户数超过上限后其余租户合并到该标签，避免标签基数无限增长
+OTHER_TENANT = "_other_"
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(BUCKETS_MS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.sum += value_ms
+
+
+def quantile(counts: List[int], q: float) -> float | None:
+    """按桶线性插值估算分位数（与 Prometheus histogram_quantile 一致）"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if seen + count >= rank and count:
+            if i >= len(BUCKETS_MS):
+                return BUCKETS_MS[-1]
+            lower = BUCKETS_MS[i - 1] if i else 0.0
+            return round(lower + (BUCKETS_MS[i] - lower) * (rank - seen) / count, 3)
+        seen += count
+    return BUCKETS_MS[-1]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    return ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+
+
+def _series(metric: str, labels: str) -> str:
+    return f"{metric}{{{labels}}}" if labels else metric
+
+
+class Metrics:
+    def __init__(self, max_tenants: int = 200) -> None:
+        self.max_tenants = max_tenants
+        self._histograms: Dict[LabelKey, Histogram] = {}
+        self._counters: Dict[LabelKey, int] = {}
+        self._gauges: Dict[LabelKey, float] = {}
+        self._tenants: set = set()
+
+    def tenant(self, app_id: str) -> str:
+        if app_id in self._tenants:
+            return app_id
+        if len(self._tenants) >= self.max_tenants:
+            return OTHER_TENANT
+        self._tenants.add(app_id)
+        return app_id
+
+    def observe(self, name: str, value_ms: float, **labels: str):
+        key = (name, tuple(labels.items()))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value_ms)
+
+    def inc(self, name: str, value: int = 1, **labels: str):
+        key = (name, tuple(labels.items()))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str):
+        """瞬时值（如队列深度），多 worker 合并时求和"""
+        self._gauges[(name, tuple(labels.items()))] = value
+
+    def snapshot(self) -> dict:
+        """在事件循环线程内复制当前数据，可安全交给其他线程序列化"""
+        return {
+            "pid": os.getpid(),
+            "at": time.time(),
+            "buckets": list(BUCKETS_MS),
+            "histograms": [
+                {"name": name, "labels": dict(labels), "counts": list(h.counts), "sum": h.sum}
+                for (name, labels), h in self._histograms.items()
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ],
+            "gauges": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._gauges.items()
+            ],
+        }
+
+    def reset(self):
+        self._histograms.clear()
+        self._counters.clear()
+        self._gauges.clear()
+        self._tenants.clear()
+
+
+def dump_snapshot(snapshot: dict, metrics_dir: str):
+    """先写临时文件再替换，读取方不会读到半个文件"""
+    path = Path(metrics_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    target = path / f"worker-{snapshot['pid']}.json"
+    tmp = path / f".worker-{snapshot['pid']}.json.tmp"
+    tmp.write_text(json.dumps(snapshot), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_worker_snapshots(metrics_dir: str, exclude_pid: int) -> List[dict]:
+    """读取其他 worker 的快照；已退出的 worker 的快照文件直接删除"""
+    path = Path(metrics_dir)
+    if not path.is_dir():
+        return []
+    snapshots = []
+    for file in path.glob("worker-*.json"):
+        try:
+            pid = int(file.stem.split("-", 1)[1])
+        except ValueError:
+            continue
+        if pid == exclude_pid:
+            continue
+        if not _pid_alive(pid):
+            file.unlink(missing_ok=True)
+            continue
+        try:
+            snapshot = json.loads(file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"read metrics snapshot {file} failed: {e}")
+            continue
+        if snapshot.get("buckets") != list(BUCKETS_MS):
+            continue
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def clear_worker_snapshots(metrics_dir: str):
+    path = Path(metrics_dir)
+    if path.is_dir():
+        for file in path.glob("worker-*.json"):
+            file.unlink(missing_ok=True)
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    histograms: Dict[LabelKey, dict] = {}
+    counters: Dict[LabelKey, int] = {}
+    gauges: Dict[LabelKey, float] = {}
+    for snapshot in snapshots:
+        for item in snapshot["histograms"]:
+            key = (item["name"], tuple(sorted(item["labels"].items())))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = {"counts": list(item["counts"]), "sum": item["sum"]}
+            else:
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], item["counts"])]
+                merged["sum"] += item["sum"]
+        for item in snapshot["counters"]:
+            key = (item["name"], tuple(sorted(item["labels"].items())))
+            counters[key] = counters.get(key, 0) + item["value"]
+        for item in snapshot.get("gauges", ()):
+            key = (item["name"], tuple(sorted(item["labels"].items())))
+            gauges[key] = gauges.get(key, 0) + item["value"]
+    return {
+        "workers": len(snapshots),
+        "histograms": histograms,
+        "counters": counters,
+        "gauges": gauges,
+    }
+
+
+def render_prometheus(merged: dict) -> str:
+    lines: List[str] = []
+    typed = set()
+    for (name, labels), item in sorted(merged["histograms"].items()):
+        metric = PREFIX + name
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        base = _format_labels(labels)
+        sep = "," if base else ""
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS + (None,), item["counts"]):
+            cumulative += count
+            le = "+Inf" if bound is None else f"{bound:g}"
+            lines.append(f'{metric}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+        lines.append(f"{_series(metric + '_sum', base)} {item['sum']:.3f}")
+        lines.append(f"{_series(metric + '_count', base)} {cumulative}")
+    for (name, labels), value in sorted(merged["counters"].items()):
+        metric = PREFIX + name
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{_series(metric, _format_labels(labels))} {value}")
+    for (name, labels), value in sorted(merged["gauges"].items()):
+        metric = PREFIX + name
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{_series(metric, _format_labels(labels))} {value:g}")
+    lines.append(f"{PREFIX}workers {merged['workers']}")
+    return "\n".join(lines) + "\n"
+
+
+def summarize(merged: dict) -> dict:
+    """JSON 视图：各序列的请求数、均值与 p50/p90/p99 估算"""
+    histograms = []
+    for (name, labels), item in sorted(merged["histograms"].items()):
+        count = sum(item["counts"])
+        histograms.append(
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": count,
+                "avg": round(item["sum"] / count, 3) if count else None,
+                "p50": quantile(item["counts"], 0.5),
+                "p90": quantile(item["counts"], 0.9),
+                "p99": quantile(item["counts"], 0.99),
+            }
+        )
+    counters = [
+        {"name": name, "labels": dict(labels), "value": value}
+        for (name, labels), value in sorted(merged["counters"].items())
+    ]
+    gauges = [
+        {"name": name, "labels": dict(labels), "value": value}
+        for (name, labels), value in sorted(merged["gauges"].items())
+    ]
+    return {
+        "workers": merged["workers"],
+        "histograms": histograms,
+        "counters": counters,
+        "gauges": gauges,
+    }
+
+
+metrics = Metrics(Config.METRICS_MAX_TENANTS)
+
+
+def record_decision(endpoint: str, app_id: str, score: int):
+    metrics.inc("decision_total", endpoint=endpoint, app_id=metrics.tenant(app_id), score=str(score))
+
+
+def record_request(endpoint: str, app_id: str, start_ns: int, score: int | None = None, items: int = 1):
+    """接口级耗时与决策结果；逐次日志仅在 PERF_LOG_ENABLED 时输出"""
+    cost = (time.perf_counter_ns() - start_ns) / 1e6
+    metrics.observe("request_latency_ms", cost, endpoint=endpoint, app_id=metrics.tenant(app_id))
+    if score is not None:
+        record_decision(endpoint, app_id, score)
+    if Config.PERF_LOG_ENABLED:
+        logger.info(f"【{endpoint}】 {items} items {cost} ms")
@@ -3,7 +3,8 @@ import threading
 
 class SingleTon(type):
     _instances = {}
-    _lock = threading.Lock()
+    # 可重入：单例的构造过程中可能再创建其他单例（如规则引擎持有的子工具）
+    _lock = threading.RLock()
 
     def __call__(cls, *args, **kwargs):
         # 第一次检查：如果实例已存在，直接返回，避开锁开销